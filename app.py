@@ -2,18 +2,24 @@ import streamlit as st
 import json
 import time
 import copy
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 from pathlib import Path
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
+from data import profiler
+profiler.instrument_storage()  #no-op unless profiling is on, must come before the storage import
+
 from data.storage import (
     load_passages, lookup_annotator, get_assignments,
-    save_annotation, load_annotations, get_completed_passage_ids,
-    load_all_annotations, add_bonus_passages
+    save_annotation, iter_latest_annotations, get_completed_passage_ids,
+    load_all_annotations, add_bonus_passages, allocate_expert_bonus
 )
-from data import prod_config
+from data import prod_config, work_queue
 from data.common import EXCLUSION_IDS, is_annotation_complete
 st.set_page_config(
     page_title="Philosophical Presupposition Annotator",
@@ -31,157 +37,84 @@ CATEGORIES = load_categories()
 
 CATEGORY_MAP = {}
 DOMAIN_MAP = {}
+DOMAIN_SLUGS = {}  #domain name -> css class suffix
 for domain in CATEGORIES["domains"]:
+    DOMAIN_SLUGS[domain["name"]] = re.sub(r"[^a-z0-9]+", "-", domain["name"].lower()).strip("-")
     for cat in domain["categories"]:
         CATEGORY_MAP[cat["id"]] = cat
         DOMAIN_MAP[cat["id"]] = domain
 
 # CSS ==========================================================================
-def inject_css():
-    st.markdown("""
-    <style>
-    .block-container { padding-top: 3rem; max-width: 1400px; }
-
-    .entry-container {
-        max-width: 480px; margin: 8vh auto; padding: 3rem 2.5rem;
-        border: 1px solid #e2e8f0; border-radius: 16px;
-        background: #ffffff; box-shadow: 0 15px 55px rgba(0,0,0,0.3);
-    }
-                
-
-
-    .entry-title {
-        font-size: 1.6rem; font-weight: 700; color: #1e293b;
-        margin-bottom: 1.0rem; text-align: center;
-    }
-    .entry-subtitle {
-        font-size: 0.95rem; color: #64748b; text-align: center;
-        margin-bottom: -0.5rem; line-height: 1.5;
-    }
-
-                
-
-    .passage-box {
-        background: #ffffff; border: 1px solid #e2e8f0; border-radius: 12px;
-        padding: 1.5rem 1.75rem; line-height: 1.85; font-size: 1.05rem;
-        color: #1e293b; margin-bottom: 0.75rem;
-    }
-    .passage-meta {
-        font-size: 0.8rem; color: #94a3b8; margin-bottom: 0.75rem;
-        padding: 0.4rem 0.75rem; background: #f8fafc; border-radius: 6px;
-        border: 1px solid #f1f5f9;
-    }
-    .sentence {
-        cursor: default; padding: 2px 1px; border-radius: 3px;
-        transition: background 0.15s ease;
-    }
-    .sentence-selectable { cursor: pointer; }
-    .sentence-selectable:hover {
-        text-decoration: underline; text-decoration-style: dotted;
-        text-decoration-color: #94a3b8; text-underline-offset: 3px;
-    }
-
-                
-                
-    .domain-header {
-        font-size: 0.8rem; font-weight: 600; color: #64748b;
-        text-transform: uppercase; letter-spacing: 0.05em;
-        margin: 0.4rem 0 0.3rem 0; padding-bottom: 0.25rem;
-        border-bottom: 2px solid #f1f5f9;
-    }
-                
-
-                
-
-    .cat-info {
-        font-size: 0.78rem; color: #64748b; line-height: 1.4;
-        padding: 0.5rem 0.75rem; background: #f8fafc; border-radius: 6px;
-        margin: 0.25rem 0 0.5rem 0; border-left: 3px solid #e2e8f0;
-    }
-
-    .save-success {
-        padding: 0.5rem 1rem; background: #f0fdf4; border: 1px solid #bbf7d0;
-        border-radius: 8px; color: #166534; font-size: 0.85rem; text-align: center;
-    }
-    .save-warning {
-        padding: 0.5rem 1rem; background: #fffbeb; border: 1px solid #fde68a;
-        border-radius: 8px; color: #92400e; font-size: 0.85rem; text-align: center;
-    }
-
-    .progress-text { font-size: 0.85rem; color: #64748b; margin-bottom: 0.25rem; }
+# static/base.css is hand written, static/categories.css is generated from categories.json
+# both served by streamlit static serving so browser caches them, each rerun only ships a <link>
+STATIC_DIR = Path(__file__).parent / "static"
+
+
+def build_category_css(categories):
+    #class based rules per domain, replaces the inline/per category <style> blocks
+    rules = ["/* GENERATED from config/categories.json by app.py, do not edit */"]
+    for domain in categories["domains"]:
+        slug = DOMAIN_SLUGS[domain["name"]]
+        bg, border = domain["colour"], domain["border_colour"]
+        rules.append(f".domain-header.domain-{slug} {{ border-bottom-color: {border}; }}")
+        rules.append(f".hl-{slug} {{ background: {bg}; border-left: 3px solid {border}; }}")
+        rules.append(f".swatch-{slug} {{ background: {bg}; }}")
+        rules.append(
+            f'[class*="st-key-catbox-{slug}-"] {{\n'
+            f"    background: {bg} !important;\n"
+            f"    border-left: 4px solid {border} !important;\n"
+            f"    border-radius: 8px !important;\n"
+            f"    padding: 0.75rem 1rem !important;\n"
+            f"    margin: -2.0rem 0 0.75rem 0 !important;\n"
+            f"}}"
+        )
+    return "\n".join(rules) + "\n"
+
+
+@st.cache_resource
+def publish_stylesheets():
+    # runs once per server process, rewrites categories.css only if it changed
+    # returns hrefs with a content hash so browser cache busts when css changes
+    generated = build_category_css(CATEGORIES)
+    gen_path = STATIC_DIR / "categories.css"
+    try:
+        if not gen_path.exists() or gen_path.read_text(encoding="utf-8") != generated:
+            gen_path.write_text(generated, encoding="utf-8")
+    except OSError as e:
+        print(f"Could not write {gen_path}: {e}")
+    hrefs = []
+    for name in ("base.css", "categories.css"):
+        digest = hashlib.sha1((STATIC_DIR / name).read_bytes()).hexdigest()[:10]
+        hrefs.append(f"app/static/{name}?v={digest}")
+    return hrefs
+
+
+def static_css_served():
+    # tornado based streamlit serves app/static files outside a small extension allow list as text/plain
+    # with nosniff, browsers then drop the stylesheet. the starlette server sends text/css
+    if not st.get_option("server.enableStaticServing"):
+        return False
+    try:
+        from streamlit.web.server.app_static_file_handler import SAFE_APP_STATIC_FILE_EXTENSIONS
+    except ImportError:
+        return True  #no tornado static handler, static files get their real mimetype
+    return ".css" in SAFE_APP_STATIC_FILE_EXTENSIONS
 
-    .completion-card {
-        max-width: 580px; margin: 4vh auto; padding: 2.5rem;
-        border: 1px solid #bbf7d0; border-radius: 16px;
-        background: #f0fdf4; text-align: center;
-    }
-    .completion-card h2 { color: #166534; margin-bottom: 0.5rem; }
-    .completion-card p { color: #15803d; line-height: 1.6; }
 
-    .explicit-flag {
-        padding: 0.5rem 0.75rem; background: #fefce8; border: 1px solid #fde68a;
-        border-radius: 8px; margin-bottom: 0.75rem;
-    }
+@st.cache_resource
+def inline_stylesheets():
+    # fallback when app/static cant serve css, built once per process, still sent every rerun
+    css = "".join((STATIC_DIR / name).read_text(encoding="utf-8") for name in ("base.css", "categories.css"))
+    return f"<style>\n{css}</style>"
 
-    /* hiding Ctrl+Enter streamlit text  for notes box*/
-    .stTextArea [data-testid="InputInstructions"] {
-        display: none !important;
-    }
-    .stTextArea [data-baseweb="textarea"] [data-testid="InputInstructions"] {
-        display: none !important;
-    }
-    .stTextArea textarea::placeholder {
-        opacity: 0.6;
-    }
-    /* alt selector for the instructions */
-    [data-testid="stTextArea"] [data-testid="InputInstructions"] {
-        display: none !important;
-    }
-    .stCheckbox label p {
-        font-size: 1.1rem !important;
-        font-weight: 500;
-    }
-/* INCOMPLETE BANNERS HERE ------------------------------ */
-    .incomplete-banner {
-        padding: 0.75rem 1.25rem;
-        background: #fffbeb;
-        border: 1px solid #fde68a;
-        border-left: 4px solid #f59e0b;
-        border-radius: 8px;
-        margin-bottom: 0.75rem;
-    }
-    .incomplete-banner-title {
-        font-size: 0.95rem;
-        font-weight: 600;
-        color: #92400e;
-        margin-bottom: 0.25rem;
-    }
-    .incomplete-banner-text {
-        font-size: 0.85rem;
-        color: #a16207;
-        line-height: 1.5;
-    }
 
-    .all-complete-banner {
-        padding: 0.75rem 1.25rem;
-        background: #f0fdf4;
-        border: 1px solid #bbf7d0;
-        border-left: 4px solid #22c55e;
-        border-radius: 8px;
-        margin-bottom: 0.75rem;
-    }
-    .all-complete-banner-title {
-        font-size: 0.95rem;
-        font-weight: 600;
-        color: #166534;
-        margin-bottom: 0.25rem;
-    }
-    .all-complete-banner-text {
-        font-size: 0.85rem;
-        color: #15803d;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+def inject_css():
+    hrefs = publish_stylesheets()  #also (re)generates categories.css for the fallback
+    if static_css_served():
+        html = "".join(f'<link rel="stylesheet" href="{h}">' for h in hrefs)
+    else:
+        html = inline_stylesheets()
+    st.markdown(html, unsafe_allow_html=True)
 
 inject_css()
 
@@ -203,6 +136,11 @@ def init_session():
         "annotation_history": {},
         "bonus_rounds": 0,
         "incomplete_check_active": False,
+        "completed_ids": set(),
+        "complete_ids": set(),
+        "pending_indices": [],
+        "incomplete_indices": [],
+        "lease_renewed_at": 0.0,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -235,7 +173,12 @@ def show_entry_screen():
                     st.session_state.annotator = annotator
                     st.session_state.passages = load_passages()
                     st.session_state.assignments = get_assignments(annotator["annotator_id"])
-                    st.session_state.current_index = 0
+                    if work_queue.QUEUE_MODE:
+                        _restore_queued_passages(annotator)
+                    #one log read at login, kept up to date by do_save after that
+                    _load_progress(annotator["annotator_id"])
+                    _rebuild_resume_index()
+                    st.session_state.current_index = _resume_position()
                     _load_or_init_annotation()
                     st.rerun()
                 else:
@@ -275,38 +218,149 @@ def get_current_passage():
     return st.session_state.passages.get(passage_id)
 
 
+# RESUME CURSOR + INCOMPLETE INDEX ===========================
+# pending_indices = sorted assignment indexes not yet saved
+# incomplete_indices = sorted assignment indexes whose latest annotation fails is_annotation_complete
+# both built once in O(assignments) from one log read at login, then kept up to date by do_save
+def _load_progress(annotator_id):
+    completed = set()
+    complete = set()
+    for record in iter_latest_annotations(annotator_id):
+        completed.add(record["passage_id"])
+        if is_annotation_complete(record):
+            complete.add(record["passage_id"])
+    st.session_state.completed_ids = completed
+    st.session_state.complete_ids = complete
+
+
+def _rebuild_resume_index():
+    completed = st.session_state.completed_ids
+    complete = st.session_state.complete_ids
+    assignments = st.session_state.assignments or []
+    st.session_state.pending_indices = [
+        idx for idx, a in enumerate(assignments) if a["passage_id"] not in completed
+    ]
+    st.session_state.incomplete_indices = [
+        idx for idx, a in enumerate(assignments) if a["passage_id"] not in complete
+    ]
+
+
+def _index_discard(index, idx):
+    pos = bisect_left(index, idx)
+    if pos < len(index) and index[pos] == idx:
+        index.pop(pos)
+
+
+def _index_add(index, idx):
+    pos = bisect_left(index, idx)
+    if pos == len(index) or index[pos] != idx:
+        index.insert(pos, idx)
+
+
+def _record_saved(idx, passage_id, complete):
+    st.session_state.completed_ids.add(passage_id)
+    _index_discard(st.session_state.pending_indices, idx)
+    if complete:
+        st.session_state.complete_ids.add(passage_id)
+        _index_discard(st.session_state.incomplete_indices, idx)
+    else:
+        st.session_state.complete_ids.discard(passage_id)
+        _index_add(st.session_state.incomplete_indices, idx)
 
-#then find and return incomplete passages for incomplete banner
-#  (assignment_index, passage_id)
-def get_incomplete_passages():
-    annotator = st.session_state.annotator
-    assignments = st.session_state.assignments
 
-    #Loading latest saved annotations from prewrite storage
-    saved = load_annotations(annotator["annotator_id"])
-    saved_by_passage = {}
-    for record in saved:
-        saved_by_passage[record["passage_id"]] = record  #latest update bu user is saved 
+def _record_queued_saved(record):
+    # a retried save finally stored, its passage gets the progress/incomplete update it missed
+    for idx, a in enumerate(st.session_state.assignments or []):
+        if a["passage_id"] == record["passage_id"]:
+            _record_saved(idx, record["passage_id"], is_annotation_complete(record))
+            return
+
+
+def _resume_position():
+    #first unannotated passage, or past the end if everything has been saved
+    pending = st.session_state.pending_indices
+    if pending:
+        return pending[0]
+    return len(st.session_state.assignments or [])
+
+
+def _next_pending_after(idx):
+    # next unannotated passage after idx, wrapping round to the start
+    pending = st.session_state.pending_indices
+    if not pending:
+        return None
+    pos = bisect_right(pending, idx)
+    return pending[pos] if pos < len(pending) else pending[0]
+
+
+def _go_to_passage(idx):
+    if st.session_state.has_unsaved_changes:
+        do_save()
+    st.session_state.current_index = idx
+    _load_or_init_annotation()
+    st.rerun()
+
+
+# WORK QUEUE MODE ===========================
+# assignment_mode = "queue": on top of the static list annotators lease batches from a shared
+# queue (data/work_queue.py), one queue per role so primary and experts dont block each other
+LEASE_RENEW_EVERY = work_queue.LEASE_TTL / 3  # seconds between lease renewals while active
+
 
-    incomplete = []
-    for idx, assignment in enumerate(assignments):
-        pid = assignment["passage_id"]
-        #prefer pre-write in-session history 
-        ann = st.session_state.annotation_history.get(pid)
-        if ann is None:
-            ann = saved_by_passage.get(pid)
-        if not is_annotation_complete(ann):
-            incomplete.append((idx, pid))
-    return incomplete
+def _queue_name(annotator):
+    return annotator.get("role", "primary")
 
 
+def _renew_leases(annotator, force=False):
+    # every rerun is an interaction (navigating, ticking a category, picking evidence), so reading
+    # and filling in a passage keeps the leases alive too, not just saving. throttled so most
+    # reruns dont touch the queue db
+    now = time.time()
+    if not force and now - st.session_state.lease_renewed_at < LEASE_RENEW_EVERY:
+        return
+    work_queue.renew(_queue_name(annotator), annotator["annotator_id"])
+    st.session_state.lease_renewed_at = now
+
+
+def _restore_queued_passages(annotator):
+    # put passages this annotator holds or finished via the queue back after the static ones
+    have = {a["passage_id"] for a in st.session_state.assignments}
+    queued = work_queue.annotator_passages(_queue_name(annotator), annotator["annotator_id"])
+    st.session_state.assignments = st.session_state.assignments + [
+        {"passage_id": pid, "set": "queue"} for pid in queued if pid not in have
+    ]
+
+
+def _lease_more(annotator, all_ids, count):
+    # experts only get passages primary has finished, primary gets anything not yet theirs
+    have = {a["passage_id"] for a in st.session_state.assignments}
+    if annotator.get("role") == "expert":
+        pool = get_completed_passage_ids("primary_rafuh")
+        candidates = [pid for pid in all_ids if pid in pool and pid not in have]
+    else:
+        candidates = [pid for pid in all_ids if pid not in have]
+    return work_queue.lease_next(_queue_name(annotator), annotator["annotator_id"], candidates, batch=count)
+
+
+# incomplete banner, paged so widget count stays constant however many are incomplete
+BANNER_ROW_SIZE = 6
+BANNER_PAGE_SIZE = 12
+
+@profiler.timed()
 def render_incomplete_banner(incomplete):
     count = len(incomplete)
-    passage_nums = [str(idx + 1) for idx, _ in incomplete]
+    pages = (count - 1) // BANNER_PAGE_SIZE + 1
+    page = min(st.session_state.get("incomplete_page", 0), pages - 1)
+    page_items = incomplete[page * BANNER_PAGE_SIZE:(page + 1) * BANNER_PAGE_SIZE]
+
+    passage_nums = [str(idx + 1) for idx in page_items]
+    remaining = count - len(page_items)
     if count == 1:
         passage_list = f"Passage {passage_nums[0]}"
     elif count == 2:
         passage_list = f"Passages {passage_nums[0]} and {passage_nums[1]}"
+    elif remaining:
+        passage_list = f"Passages {', '.join(passage_nums)} and {remaining} more"
     else:
         passage_list = (
             f"Passages {', '.join(passage_nums[:-1])}, and {passage_nums[-1]}"
@@ -329,11 +383,10 @@ def render_incomplete_banner(incomplete):
         unsafe_allow_html=True,
     )
 
-    ROW_SIZE = 6
-    for row_start in range(0, count, ROW_SIZE):
-        row_items = incomplete[row_start : row_start + ROW_SIZE]
-        cols = st.columns(len(row_items))
-        for i, (idx, _pid) in enumerate(row_items):
+    for row_start in range(0, len(page_items), BANNER_ROW_SIZE):
+        row_items = page_items[row_start : row_start + BANNER_ROW_SIZE]
+        cols = st.columns(BANNER_ROW_SIZE)
+        for i, idx in enumerate(row_items):
             with cols[i]:
                 is_current = idx == st.session_state.current_index
                 label = (
@@ -343,16 +396,25 @@ def render_incomplete_banner(incomplete):
                 )
                 if st.button(
                     label,
-                    key=f"incomplete_nav_{idx}",
+                    key=f"incomplete_nav_{i + row_start}",
                     use_container_width=True,
                     type="primary" if is_current else "secondary",
                     disabled=is_current,
                 ):
-                    if st.session_state.has_unsaved_changes:
-                        do_save()
-                    st.session_state.current_index = idx
-                    _load_or_init_annotation()
-                    st.rerun()
+                    _go_to_passage(idx)
+
+    if pages > 1:
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("Previous page", key="incomplete_prev_page", use_container_width=True, disabled=page == 0):
+                st.session_state.incomplete_page = page - 1
+                st.rerun()
+        with p2:
+            st.caption(f"Page {page + 1} of {pages}")
+        with p3:
+            if st.button("Next page", key="incomplete_next_page", use_container_width=True, disabled=page >= pages - 1):
+                st.session_state.incomplete_page = page + 1
+                st.rerun()
 
 
 # Passage rendering
@@ -366,6 +428,7 @@ def _striped_gradient(colours):
     for i, c in enumerate(colours):
         parts.append(f"{c} {i*stripe}px, {c} {(i+1)*stripe}px")
     return f"repeating-linear-gradient(135deg, {', '.join(parts)})"
+@profiler.timed()
 def render_passage(passage):
     """Render passage with color-coded evidence highlighting."""
     ann = st.session_state.annotation_state
@@ -381,32 +444,31 @@ def render_passage(passage):
                     (domain["colour"], domain["border_colour"], cat_id)
                 )
 
-    # Build HTML spans with highlighting
+    # Build HTML spans, single domain highlights use the static hl-<domain> classes
     spans = []
     for i, sent in enumerate(sentences):
         highlights = highlight_map.get(i, [])
-        style_parts = []
+        if not highlights:
+            spans.append(f'<span>{sent}</span>')
+            continue
 
-        if highlights:
-            unique_bg = list(dict.fromkeys(h[0] for h in highlights))
-            unique_border = list(dict.fromkeys(h[1] for h in highlights))
+        unique_bg = list(dict.fromkeys(h[0] for h in highlights))
+        unique_border = list(dict.fromkeys(h[1] for h in highlights))
 
-            if len(unique_bg) == 1:
-                style_parts.append(f"background: {unique_bg[0]}")
-                style_parts.append(f"border-left: 3px solid {unique_border[0]}")
-                style_parts.append("padding-left: 4px")
-            else:
-                style_parts.append(f"background: {_striped_gradient(unique_bg)}")
-                h = len(unique_border)
-                bp = []
-                for j, bc in enumerate(unique_border):
-                    bp.append(f"{bc} {(j/h)*100}%, {bc} {((j+1)/h)*100}%")
-                style_parts.append("border-left: 4px solid transparent")
-                style_parts.append(f"border-image: linear-gradient(to bottom, {', '.join(bp)}) 1")
-                style_parts.append("padding-left: 4px")
-
-        style = "; ".join(style_parts) if style_parts else ""
-        spans.append(f'<span style="{style}">{sent}</span>')
+        if len(unique_bg) == 1:
+            slug = DOMAIN_SLUGS[DOMAIN_MAP[highlights[0][2]]["name"]]
+            spans.append(f'<span class="hl hl-{slug}">{sent}</span>')
+        else:
+            #stripe combos arent worth precomputing so these stay inline
+            h = len(unique_border)
+            bp = []
+            for j, bc in enumerate(unique_border):
+                bp.append(f"{bc} {(j/h)*100}%, {bc} {((j+1)/h)*100}%")
+            style = (
+                f"background: {_striped_gradient(unique_bg)}; "
+                f"border-image: linear-gradient(to bottom, {', '.join(bp)}) 1"
+            )
+            spans.append(f'<span class="hl-multi" style="{style}">{sent}</span>')
 
     prose = " ".join(spans)
 
@@ -423,18 +485,18 @@ def render_passage(passage):
     if highlight_map:
         seen = {}
         for hl_list in highlight_map.values():
-            for bg, _, cid in hl_list:
-                dname = DOMAIN_MAP[cid]["name"].replace(" Presuppositions", "")
-                if dname not in seen:
-                    seen[dname] = bg
+            for _, _, cid in hl_list:
+                dname = DOMAIN_MAP[cid]["name"]
+                label = dname.replace(" Presuppositions", "")
+                if label not in seen:
+                    seen[label] = DOMAIN_SLUGS[dname]
         if seen:
             items = " ".join(
-                f'<span style="display:inline-block;width:12px;height:12px;'
-                f'background:{c};border-radius:2px;margin-right:3px;vertical-align:middle;"></span>'
-                f'<span style="font-size:0.75rem;color:#64748b;margin-right:12px;">{n}</span>'
-                for n, c in seen.items()
+                f'<span class="legend-swatch swatch-{slug}"></span>'
+                f'<span class="legend-label">{n}</span>'
+                for n, slug in seen.items()
             )
-            legend = f'<div style="margin-top:0.25rem;">{items}</div>'
+            legend = f'<div class="legend">{items}</div>'
 
     html_content = f'''
 {meta}
@@ -477,6 +539,7 @@ def render_sentence_selection(passage, cat_id):
 
 
 # CATEGORY SIDE ----------------------------------------------------------------------------
+@profiler.timed()
 def render_annotation_panel(passage):
     ann = st.session_state.annotation_state
     passage_id = passage["id"]
@@ -487,7 +550,7 @@ def render_annotation_panel(passage):
 
     for domain in CATEGORIES["domains"]:
         st.markdown(
-            f'<div class="domain-header" style="border-bottom-color:{domain["border_colour"]}">'
+            f'<div class="domain-header domain-{DOMAIN_SLUGS[domain["name"]]}">'
             f'{domain["name"]}</div>',
             unsafe_allow_html=True
         )
@@ -520,22 +583,9 @@ def render_annotation_panel(passage):
 
             if is_selected and not is_excl:
                 cat_data = ann["categories"][cat_id]
-                border_color = domain["border_colour"]
-                bg_color = domain["colour"]
- 
-                # Style keyed container
-                container_key = f"catbox_{cat_id}_{passage_id}"
-                st.markdown(f"""
-                <style>
-                .st-key-{container_key} {{
-                    background: {bg_color} !important;
-                    border-left: 4px solid {border_color} !important;
-                    border-radius: 8px !important;
-                    padding: 0.75rem 1rem !important;
-                    margin: -2.0rem 0 0.75rem 0 !important;
-                }}
-                </style>
-                """, unsafe_allow_html=True)
+
+                # keyed container, styled by the st-key-catbox-<domain>- rule in categories.css
+                container_key = f"catbox-{DOMAIN_SLUGS[domain['name']]}-{cat_id}_{passage_id}"
 
                 with st.container(key=container_key):
                     with st.expander("Category Definition and Markers", expanded=False):
@@ -569,6 +619,7 @@ def render_annotation_panel(passage):
 
 # Logic for technics ------------------------------------------------------------------------
 # save
+@profiler.timed()
 def do_save():
     ann = st.session_state.annotation_state
     passage = get_current_passage()
@@ -597,12 +648,18 @@ def do_save():
     # Layer 1: persistent storage
     success = save_annotation(annotator["annotator_id"], record)
 
+    stored_ids = []  #passages actually written this call, only their leases are completed
     if success:
+        # progress only moves once the record is actually stored, a failed save stays pending
+        _record_saved(st.session_state.current_index, passage["id"], is_annotation_complete(ann))
+        stored_ids.append(passage["id"])
         saved_from_queue = 0
         new_queue = []
         for queued in st.session_state.retry_queue:
             if save_annotation(annotator["annotator_id"], queued):
                 saved_from_queue += 1
+                _record_queued_saved(queued)
+                stored_ids.append(queued["passage_id"])
             else:
                 new_queue.append(queued)
         st.session_state.retry_queue = new_queue
@@ -613,10 +670,19 @@ def do_save():
         st.session_state.retry_queue.append(record)
         st.session_state.save_status = "warning"
 
+    if work_queue.QUEUE_MODE:
+        # a save stuck in the retry queue keeps its lease, if the session ends before it is
+        # flushed the lease expires and the passage goes out again instead of being lost
+        queue = _queue_name(annotator)
+        for pid in stored_ids:
+            work_queue.complete(queue, annotator["annotator_id"], pid)
+        _renew_leases(annotator, force=True)
+
     st.session_state.has_unsaved_changes = False
     return success
 
 
+@profiler.timed()
 def render_sidebar(annotator, done=None, total=None):
     """Shared sidebar: annotator info, progress, backup download, sign out."""
     with st.sidebar:
@@ -625,6 +691,7 @@ def render_sidebar(annotator, done=None, total=None):
             st.caption(f"Role: {annotator['role'].title()}")
             st.markdown("---")
             st.markdown(f"**Progress:** {done}/{total} passages")
+            render_navigator(total)
         else:
             st.markdown(f"**Completed:** {done} passages" if done is not None else "")
 
@@ -639,13 +706,89 @@ def render_sidebar(annotator, done=None, total=None):
                 mime="application/json", use_container_width=True,
             )
 
+        if profiler.ENABLED and annotator.get("role") == "primary":
+            render_profiler_panel()
+
         st.markdown("---")
         if st.button("Sign out", use_container_width=True):
+            if work_queue.QUEUE_MODE:
+                work_queue.release(_queue_name(annotator), annotator["annotator_id"])
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
 
 
+# admin only, shows per operation latency from data.profiler
+def render_profiler_panel():
+    with st.expander("Profiler", expanded=False):
+        stats = profiler.summary()
+        if not stats:
+            st.caption("No samples yet.")
+            return
+        rows = [
+            {
+                "operation": op,
+                "calls": s["count"],
+                "p50 ms": round(s["p50"] * 1000, 1),
+                "p95 ms": round(s["p95"] * 1000, 1),
+                "p99 ms": round(s["p99"] * 1000, 1),
+                "total s": round(s["total"], 2),
+            }
+            for op, s in sorted(stats.items(), key=lambda kv: -kv[1]["total"])
+        ]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            if st.button("Write metrics", key="profiler_write", use_container_width=True):
+                profiler.write_prometheus(force=True)
+        with c2:
+            if st.button("Reset", key="profiler_reset", use_container_width=True):
+                profiler.reset()
+                st.rerun()
+
+
+# passage navigator, sits in sidebar under progress
+NAV_PAGE_SIZE = 10
+
+def render_navigator(total):
+    pending = st.session_state.pending_indices
+    current = st.session_state.current_index
+    with st.sidebar:
+        st.markdown("**Navigate**")
+        target = st.number_input(
+            "Jump to passage", min_value=1, max_value=max(total, 1),
+            value=min(current + 1, max(total, 1)), step=1,
+        )
+        j1, j2 = st.columns(2)
+        with j1:
+            if st.button("Go", use_container_width=True, disabled=target - 1 == current):
+                _go_to_passage(int(target) - 1)
+        with j2:
+            nxt = _next_pending_after(current)
+            if st.button("Next incomplete", use_container_width=True,
+                         disabled=nxt is None or nxt == current):
+                _go_to_passage(nxt)
+
+        if pending:
+            #page through unannotated passages, fixed number of buttons per page
+            pages = (len(pending) - 1) // NAV_PAGE_SIZE + 1
+            page = min(st.session_state.get("nav_page", 0), pages - 1)
+            st.caption(f"{len(pending)} not yet annotated (page {page + 1} of {pages})")
+            for idx in pending[page * NAV_PAGE_SIZE:(page + 1) * NAV_PAGE_SIZE]:
+                if st.button(f"Passage {idx + 1}", key=f"nav_pending_{idx}",
+                             use_container_width=True, disabled=idx == current):
+                    _go_to_passage(idx)
+            p1, p2 = st.columns(2)
+            with p1:
+                if st.button("Prev page", key="nav_prev_page", use_container_width=True, disabled=page == 0):
+                    st.session_state.nav_page = page - 1
+                    st.rerun()
+            with p2:
+                if st.button("Next page", key="nav_next_page", use_container_width=True, disabled=page >= pages - 1):
+                    st.session_state.nav_page = page + 1
+                    st.rerun()
+
+
 # Tutorial  
 def show_tutorial_section():
     with st.expander("How do I use this Site?", expanded=False):
@@ -668,18 +811,22 @@ def show_tutorial_section():
 
 
 # Main logic for annotation interface -------------------------------------
+@profiler.timed()
 def show_annotation_interface():
     annotator = st.session_state.annotator
     assignments = st.session_state.assignments
-    completed_ids = get_completed_passage_ids(annotator["annotator_id"])
+    completed_ids = st.session_state.completed_ids
     total = len(assignments)
     done = sum(1 for a in assignments if a["passage_id"] in completed_ids)
+    if work_queue.QUEUE_MODE:
+        _renew_leases(annotator)
 
     if done >= total and st.session_state.current_index >= total:
-        incomplete = get_incomplete_passages()
+        incomplete = st.session_state.incomplete_indices
         if incomplete:
             st.session_state.incomplete_check_active = True
-            st.session_state.current_index = incomplete[0][0]
+            st.session_state.incomplete_page = 0
+            st.session_state.current_index = incomplete[0]
             _load_or_init_annotation()
             st.rerun()
         else:
@@ -703,7 +850,7 @@ def show_annotation_interface():
         st.progress(progress)
     with h2:
         st.markdown(
-            f'<div style="text-align:center;font-size:0.85rem;color:#64748b;padding-top:0.5rem;">'
+            f'<div class="progress-name">'
             f'{annotator["display_name"]}</div>',
             unsafe_allow_html=True
         )
@@ -742,7 +889,7 @@ def show_annotation_interface():
 
     # Incomplete passages banner
     if st.session_state.get("incomplete_check_active"):
-        incomplete = get_incomplete_passages()
+        incomplete = st.session_state.incomplete_indices
         if incomplete:
             render_incomplete_banner(incomplete)
         else:
@@ -801,6 +948,7 @@ def show_annotation_interface():
 
 
 # END screen
+@profiler.timed()
 def show_completion_screen(annotator, total, done):
     rounds = st.session_state.bonus_rounds
 
@@ -839,7 +987,7 @@ def show_completion_screen(annotator, total, done):
     <div class="completion-card">
         <h2>{title}</h2>
         <p>{body}</p>
-        <p style="font-size:0.9rem; margin-top:1rem;">{extra}</p>
+        <p class="completion-extra">{extra}</p>
     </div>
     """, unsafe_allow_html=True)
 
@@ -847,21 +995,24 @@ def show_completion_screen(annotator, total, done):
     with col2:
         if st.button("Request more passages", use_container_width=True, type="primary"):
             all_ids = list(st.session_state.passages.keys())
-            if annotator.get("role") == "expert":
+            if work_queue.QUEUE_MODE:
+                bonus = _lease_more(annotator, all_ids, count=5 if annotator.get("role") == "expert" else 10)
+            elif annotator.get("role") == "expert":
                 # Pool = primary's completed passages, minus any already assigned to any expert
-                primary_done = get_completed_passage_ids("primary_rafuh")
-                all_expert_assignments = []
-                for a in prod_config.PRODUCTION_ANNOTATORS:
-                    if a["role"] == "expert":
-                        all_expert_assignments += get_assignments(a["annotator_id"])
-                already_expert = {a["passage_id"] for a in all_expert_assignments}
-                pool = primary_done - already_expert
-                bonus = add_bonus_passages(annotator["annotator_id"], all_ids, count=5, pool_ids=pool)
+                expert_ids = [
+                    a["annotator_id"] for a in prod_config.PRODUCTION_ANNOTATORS if a["role"] == "expert"
+                ]
+                bonus = allocate_expert_bonus(annotator["annotator_id"], all_ids, expert_ids, count=5)
             else:
                 bonus = add_bonus_passages(annotator["annotator_id"], all_ids, count=10)
             if bonus:
                 st.session_state.bonus_rounds += 1
-                st.session_state.assignments = get_assignments(annotator["annotator_id"])
+                # bonus rows are appended at the end so no need to re-read assignments
+                set_type = "queue" if work_queue.QUEUE_MODE else "bonus"
+                st.session_state.assignments = st.session_state.assignments + [
+                    {"passage_id": pid, "set": set_type} for pid in bonus
+                ]
+                _rebuild_resume_index()
                 st.session_state.current_index = total
                 _load_or_init_annotation()
                 st.rerun()
@@ -873,7 +1024,9 @@ def show_completion_screen(annotator, total, done):
 
 
 #session state main login
-if not st.session_state.authenticated:
-    show_entry_screen()
-else:
-    show_annotation_interface()
+with profiler.timer("rerun"):
+    if not st.session_state.authenticated:
+        show_entry_screen()
+    else:
+        show_annotation_interface()
+profiler.write_prometheus()
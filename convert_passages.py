@@ -1,99 +1,339 @@
-
 #converts JSONL passages file to app compatible JSON format
+# streams the input in bounded chunks, sentence splitting runs on a process pool and
+# output is written as results come back so memory stays flat however big the corpus is
+# segmentations are cached by content hash so re-runs only split new/changed passages
+# a MinHash/LSH pass first drops near duplicate passages (keeps the best of each cluster)
+# also writes passages.jsonl + passages.idx.json, the indexed copy local storage memory maps
+#python convert_passages.py  (--workers 8 --chunk-size 256 --no-cache --dedup-threshold 0.8 --no-dedup)
+import argparse
+import hashlib
 import json
-import re
-import nltk
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-# download NLTK punkt tokenizer (only needed once)
-nltk.download('punkt_tab', quiet=True)
+from data import dedup
+from data.passage_index import PassageFileWriter
+from data.segmenter import SPLITTER_VERSION, get_tokenizer, split_batch
 
 #paths
 input_file = Path(__file__).parent / "data" / "annotations" / "filtered_passages_deduplicated.jsonl"
 output_file = Path(__file__).parent / "data" / "passages.json"
+indexed_file = Path(__file__).parent / "data" / "passages.jsonl"
+cache_file = Path(__file__).parent / "data" / ".sentence_cache.sqlite"
+dedup_report_file = Path(__file__).parent / "data" / "dedup_report.json"
+
+CHUNK_SIZE = 256  # lines per pool task
+PROGRESS_EVERY = 1000  # passages between progress lines
+
+
+# SEGMENTATION CACHE ===========================
+# sqlite table text_hash -> sentences, readers are the worker processes, only main writes
+# last_run marks which entries this run used so unused ones can be dropped at the end
+_cache_conn = None  #per worker read connection
+
+
+def cache_key(text):
+    return hashlib.sha256(f"{SPLITTER_VERSION}\0{text}".encode("utf-8")).hexdigest()
+
+
+def open_cache(path):
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS segments ("
+        "key TEXT PRIMARY KEY, sentences TEXT NOT NULL, last_run INTEGER NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+
+def _init_worker(cache_path):
+    global _cache_conn
+    if cache_path is not None:
+        _cache_conn = sqlite3.connect(str(cache_path), timeout=30)
+
+
+def _cached_sentences(key):
+    if _cache_conn is None:
+        return None
+    row = _cache_conn.execute("SELECT sentences FROM segments WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
 
-def split_into_sentences(text):
-    #split text into sentences with NLTK then reattach citations to preceeding sentence
-    raw_sentences = nltk.tokenize.sent_tokenize(text)
-
-    # NLTK puts citation brackets at start of next sentence sometimes
-    # eg "[116] However ..." should be "...loneliness.[116]" + "However ..."
-    merged = []
-    for sent in raw_sentences:
-        #if sentence is JUST citation brackets attach to previous
-        if merged and re.fullmatch(r'[\[\]\d\s]+', sent.strip()):
-            merged[-1] = merged[-1] + ' ' + sent
-        else:
-            #check for citations with square brackets in passage like [117]
-            match = re.match(r'^((?:\[\d+\]\s*)+)(.*)', sent)
-            if match and merged and match.group(2).strip():
-                citations = match.group(1).rstrip()
-                remainder = match.group(2).strip()
-                merged[-1] = merged[-1] + ' ' + citations
-                merged.append(remainder)
-            else:
-                merged.append(sent)
-
-    return merged
-# read JSONL and convert
-passages = []
-errors = []
-
-print(f"Reading from: {input_file}")
-with open(input_file, 'r', encoding='utf-8') as f:
-    for line_num, line in enumerate(f, 1):
-        if not line.strip():
-            continue
 
+def convert_line(line_num, line):
+    # one JSONL line -> (passage, cache_key, cache_hit, None) or (None, None, False, error message)
+    # on a cache miss passage['sentences'] is None, convert_chunk splits those in one batch
+    try:
+        item = json.loads(line)
+
+        #reuse sentences if this exact text was split before
+        text = item['text']
+        key = cache_key(text)
+        sentences = _cached_sentences(key)
+        hit = sentences is not None
+
+        # create passage in app format
+        passage = {
+            'id': item['id'],
+            "text": text,
+            'sentences': sentences,
+            "source": item.get("source_name", 'Unknown'),
+            'article_title': item.get('article_title', 'Untitled'),
+            'date': 'N/A',  #not available in source
+            "word_count": item.get("word_count"),
+            'article_url': item.get('article_url'),
+            'score': item.get('score'),
+            "priority": item.get("priority", 'MEDIUM')
+        }
+        return passage, key, hit, None
+
+    except json.JSONDecodeError as e:
+        return None, None, False, f"Line {line_num}: {e}"
+    except Exception as e:
+        return None, None, False, f"Line {line_num}: Unexpected error: {e}"
+
+
+def convert_chunk(chunk):
+    #runs in a worker process, chunk = [(line_num, line), ...]
+    results = [convert_line(line_num, line) for line_num, line in chunk]
+    misses = [passage for passage, _, hit, error in results if not error and not hit]
+    for passage, sentences in zip(misses, split_batch([p['text'] for p in misses])):
+        passage['sentences'] = sentences
+    return results
+
+
+# NEAR DUPLICATES ===========================
+
+def signature_chunk(job):
+    #runs in a worker process, [(line_num, line), ...] -> [(meta, minhash signature), ...]
+    # unparseable lines are skipped here, the conversion pass reports them
+    chunk, num_perm = job
+    out = []
+    for line_num, line in chunk:
         try:
             item = json.loads(line)
+            sig = dedup.signature(item['text'], num_perm)
+        except Exception:
+            continue
+        meta = {
+            "id": item.get('id'),
+            "line": line_num,
+            "order": line_num,
+            "priority": item.get("priority", 'MEDIUM'),
+            "score": item.get('score'),
+        }
+        out.append((meta, sig))
+    return out
+
+
+def find_near_duplicates(pool, args):
+    # one streaming pass building signatures on the pool, LSH index lives in the main process
+    index = dedup.NearDuplicateIndex(args.dedup_threshold, args.num_perm, args.bands)
+    jobs = ((chunk, args.num_perm) for chunk in read_chunks(args.input, args.chunk_size))
+    for results in bounded_map(pool, signature_chunk, jobs, max_in_flight=args.workers * 2):
+        for meta, sig in results:
+            index.add(meta, sig)
+    return index
+
 
-            #split text into sentences
-            text = item['text']
-            sentences = split_into_sentences(text)
-
-            # create passage in app format
-            passage = {
-                'id': item['id'],
-                "text": text,
-                'sentences': sentences,
-                "source": item.get("source_name", 'Unknown'),
-                'article_title': item.get('article_title', 'Untitled'),
-                'date': 'N/A',  #not available in source
-                "word_count": item.get("word_count"),
-                'article_url': item.get('article_url'),
-                'score': item.get('score'),
-                "priority": item.get("priority", 'MEDIUM')
+def write_dedup_report(path, index, clusters):
+    report = {
+        "threshold": index.threshold,
+        "num_perm": index.num_perm,
+        "bands": index.bands,
+        "passages_checked": len(index.meta),
+        "comparisons": index.comparisons,
+        "clusters": len(clusters),
+        "removed": sum(len(c["removed"]) for c in clusters),
+        "removed_clusters": [
+            {
+                "kept": c["kept"]["id"],
+                "removed": [
+                    {"id": meta["id"], "line": meta["line"], "similarity": round(sim, 3)}
+                    for meta, sim in c["removed"]
+                ],
             }
-            passages.append(passage)
+            for c in clusters
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def read_chunks(path, chunk_size):
+    # yields lists of (line_num, line), skipping blank lines, never holds more than one chunk
+    with open(path, 'r', encoding='utf-8') as f:
+        numbered = ((n, line) for n, line in enumerate(f, 1) if line.strip())
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def bounded_map(pool, fn, chunks, max_in_flight):
+    # like pool.map but only keeps max_in_flight chunks queued so the reader cant run ahead
+    # results come back in input order
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class JsonArrayWriter:
+    # writes a JSON array one item at a time, byte for byte what json.dump(items, f, indent=2) gives
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def write(self, item):
+        body = json.dumps(item, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        self.f.write(('[\n  ' if self.count == 0 else ',\n  ') + body)
+        self.count += 1
+
+    def close(self):
+        self.f.write('\n]' if self.count else '[]')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JSONL passages to app JSON")
+    parser.add_argument("--input", type=Path, default=input_file)
+    parser.add_argument("--output", type=Path, default=output_file)
+    parser.add_argument("--indexed-output", type=Path, default=indexed_file,
+                        help="jsonl + .idx.json copy for lazy loading")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--cache", type=Path, default=cache_file)
+    parser.add_argument("--no-cache", action="store_true", help="re-split every passage, cache untouched")
+    parser.add_argument("--no-dedup", action="store_true", help="skip near duplicate removal")
+    parser.add_argument("--dedup-threshold", type=float, default=dedup.THRESHOLD,
+                        help="estimated jaccard over sentence shingles counted as duplicate")
+    parser.add_argument("--num-perm", type=int, default=dedup.NUM_PERM, help="minhash functions")
+    parser.add_argument("--bands", type=int, default=dedup.BANDS, help="LSH bands (must divide --num-perm)")
+    parser.add_argument("--dedup-report", type=Path, default=dedup_report_file)
+    args = parser.parse_args()
+
+    # make sure the punkt model is installed before the pool so workers dont each try to download
+    # (no network call when it already is)
+    get_tokenizer()
+
+    errors = []  #first few only, error_count has the total
+    error_count = 0
+    sample = None
+    start = time.perf_counter()
+    next_report = PROGRESS_EVERY
+
+    cache = None if args.no_cache else open_cache(args.cache)
+    run_id = time.time_ns()
+    reused = added = 0
+
+    print(f"Reading from: {args.input}")
+    print(f"  {args.workers} worker(s), {args.chunk_size} lines per chunk")
+    # write to a temp file and swap in at the end so a failed run never leaves half a passages.json
+    tmp_output = args.output.with_suffix(args.output.suffix + ".tmp")
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(None if cache is None else args.cache,),
+    )
+    indexed = None
+    try:
+        with open(tmp_output, 'w', encoding='utf-8') as out, pool:
+            skip_lines = set()
+            clusters = []
+            if not args.no_dedup:
+                index = find_near_duplicates(pool, args)
+                clusters = index.clusters()
+                skip_lines = {meta["line"] for c in clusters for meta, _ in c["removed"]}
+                write_dedup_report(args.dedup_report, index, clusters)
+                print(f"  Near duplicates: {len(skip_lines)} passages in {len(clusters)} clusters "
+                      f"({index.comparisons} comparisons for {len(index.meta)} passages)")
+
+            writer = JsonArrayWriter(out)
+            indexed = PassageFileWriter(args.indexed_output)
+            chunks = read_chunks(args.input, args.chunk_size)
+            if skip_lines:
+                chunks = ([(n, line) for n, line in chunk if n not in skip_lines] for chunk in chunks)
+            for results in bounded_map(pool, convert_chunk, chunks, max_in_flight=args.workers * 2):
+                new_entries = []
+                used_keys = []
+                for passage, key, hit, error in results:
+                    if error:
+                        error_count += 1
+                        if len(errors) < 5:
+                            errors.append(error)
+                        continue
+                    writer.write(passage)
+                    indexed.write(passage)
+                    if sample is None:
+                        sample = passage
+                    if hit:
+                        reused += 1
+                        used_keys.append((run_id, key))
+                    else:
+                        added += 1
+                        new_entries.append((key, json.dumps(passage['sentences'], ensure_ascii=False), run_id))
+
+                if cache is not None:
+                    cache.executemany("INSERT OR REPLACE INTO segments VALUES (?, ?, ?)", new_entries)
+                    cache.executemany("UPDATE segments SET last_run = ? WHERE key = ?", used_keys)
+                    cache.commit()
+
+                if writer.count >= next_report:
+                    elapsed = time.perf_counter() - start
+                    print(f"  {writer.count} passages ({writer.count / elapsed:.0f}/s)")
+                    next_report += PROGRESS_EVERY
+            writer.close()
+        os.replace(tmp_output, args.output)
+        indexed.close()  #after passages.json so storage sees the index as current
+    except BaseException:
+        # failed or interrupted, no half written .tmp files left next to the real ones
+        if indexed is not None:
+            indexed.abort()
+        tmp_output.unlink(missing_ok=True)
+        raise
+    elapsed = time.perf_counter() - start
+
+    dropped = 0
+    if cache is not None:
+        #anything not touched this run belongs to a passage that was removed or edited
+        dropped = cache.execute("DELETE FROM segments WHERE last_run != ?", (run_id,)).rowcount
+        cache.commit()
+        cache.close()
+
+    print(f"\nConversion complete:")
+    print(f"  Converted {writer.count} passages in {elapsed:.1f}s ({writer.count / max(elapsed, 1e-9):.0f}/s)")
+    if cache is not None:
+        print(f"  Sentence cache: {reused} reused, {added} added, {dropped} dropped")
+    if not args.no_dedup:
+        print(f"  Near duplicates removed: {len(skip_lines)} (report: {args.dedup_report})")
+    if error_count:
+        print(f"  {error_count} errors")
+        for err in errors:  #show first 5
+            print(f"    - {err}")
+
+    print(f"\nSaved to: {args.output}")
+    print(f"Indexed copy: {args.indexed_output} (+ {indexed.index_path.name})")
+
+    # show sample
+    if sample:
+        print(f"\nSample passage:")
+        print(f"  ID: {sample['id']}")
+        print(f"  Source: {sample['source']}")
+        print(f"  Sentences: {len(sample['sentences'])}")
+        print(f"  First sentence: {sample['sentences'][0][:80]}...")
+
+    print(f"\nTotal passages available: {writer.count}")
+    print(f"Ready for production use!")
 
-        except json.JSONDecodeError as e:
-            errors.append(f"Line {line_num}: {e}")
-            continue
-        except Exception as e:
-            errors.append(f"Line {line_num}: Unexpected error: {e}")
-            continue
 
-print(f"\nConversion complete:")
-print(f"  Converted {len(passages)} passages")
-if errors:
-    print(f"  {len(errors)} errors")
-    for err in errors[:5]:  #show first 5
-        print(f"    - {err}")
-
-#save as JSON
-print(f"\nSaving to: {output_file}")
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(passages, f, indent=2, ensure_ascii=False)
-
-# show sample
-if passages:
-    sample = passages[0]
-    print(f"\nSample passage:")
-    print(f"  ID: {sample['id']}")
-    print(f"  Source: {sample['source']}")
-    print(f"  Sentences: {len(sample['sentences'])}")
-    print(f"  First sentence: {sample['sentences'][0][:80]}...")
-
-print(f"\nTotal passages available: {len(passages)}")
-print(f"Ready for production use!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+# INTER-ANNOTATOR AGREEMENT ===========================
+# per category agreement between annotators, from load_all_annotations() output
+#   pairs: Cohen's kappa + sentence level evidence F1 for every annotator pair
+#   group: Fleiss' kappa + Krippendorff's alpha (nominal, missing data allowed) + pooled evidence F1
+# every category is a binary label per (passage, annotator): marked or not, only complete latest
+# annotations count, a passage nobody else saw just doesnt contribute
+# labels live in a passage x category x annotator int8 array, evidence as sentence bitmasks, and
+# every statistic is built from sums over passages, so update() with new annotations only takes out
+# and puts back the rows that changed instead of recomputing everything
+
+from itertools import combinations
+
+import numpy as np
+
+from .common import is_annotation_complete, load_categories
+from .resolver import parse_timestamp
+
+MISSING = -1  # annotator has no complete annotation for the passage
+_INITIAL_ROWS = 256
+_ROW_BLOCK = 2048  # passage rows per _contributions call, bounds the temporaries
+
+
+def category_ids(categories=None):
+    # every category id in config order, exclusions included
+    categories = categories or load_categories()
+    return [cat["id"] for domain in categories["domains"] for cat in domain["categories"]]
+
+
+def _popcount(words):
+    # set bits summed over the last axis (uint64 words)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    bits = np.unpackbits(np.ascontiguousarray(words).view(np.uint8), axis=-1)
+    return bits.sum(axis=-1, dtype=np.int64)
+
+
+def _ratio(num, den):
+    # num / den with nan where den is 0
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+# every running sum AgreementTable keeps, statistics below only ever read these
+SUMS = ("pair_counts", "pair_tp", "pair_marked", "pair_both",
+        "units", "fleiss_p", "ratings", "ratings_pos", "coinc")
+
+
+# STATISTICS ===========================
+# from a dict of SUMS, any leading axes (eg bootstrap replicates) broadcast through
+
+def _cohen(sums):
+    # (..., pairs, categories) Cohen's kappa
+    counts = sums["pair_counts"].astype(float)
+    n = counts.sum(axis=(-2, -1))
+    p_o = _ratio(counts[..., 0, 0] + counts[..., 1, 1], n)
+    p_a = _ratio(counts[..., 1, 0] + counts[..., 1, 1], n)
+    p_b = _ratio(counts[..., 0, 1] + counts[..., 1, 1], n)
+    p_e = p_a * p_b + (1 - p_a) * (1 - p_b)
+    return _ratio(p_o - p_e, 1 - p_e)
+
+
+def _fleiss(sums):
+    # (..., categories) Fleiss' kappa, the varying raters per passage form
+    p_bar = _ratio(sums["fleiss_p"], sums["units"])
+    p1 = _ratio(sums["ratings_pos"], sums["ratings"])
+    p_e = p1 * p1 + (1 - p1) * (1 - p1)
+    return _ratio(p_bar - p_e, 1 - p_e)
+
+
+def _krippendorff(sums):
+    # (..., categories) nominal alpha = 1 - (n - 1) * o01 / (n0 * n1) from the coincidence sums
+    coinc = sums["coinc"]
+    o00, o11, o01 = coinc[..., 0], coinc[..., 1], coinc[..., 2]
+    n0 = o00 + o01
+    n1 = o11 + o01
+    n = n0 + n1
+    return 1 - _ratio((n - 1) * o01, n0 * n1)
+
+
+def _evidence_f1(sums):
+    # (..., pairs, categories) sentence F1 over passages both marked the category on
+    return _ratio(2 * sums["pair_tp"], sums["pair_marked"])
+
+
+def _group_evidence_f1(sums):
+    # (..., categories) every pair pooled
+    return _ratio(2 * sums["pair_tp"].sum(axis=-2), sums["pair_marked"].sum(axis=-2))
+
+
+STATISTICS = {
+    "cohen":             _cohen,
+    "evidence_f1":       _evidence_f1,
+    "fleiss":            _fleiss,
+    "krippendorff":      _krippendorff,
+    "group_evidence_f1": _group_evidence_f1,
+}
+
+
+class AgreementTable:
+    def __init__(self, annotators, categories=None):
+        self.categories = list(categories or category_ids())
+        self.cat_index = {c: i for i, c in enumerate(self.categories)}
+        self.annotators = []
+        self.ann_index = {}
+        self.rows = {}  #passage_id -> row
+        self.passage_ids = []
+        self.words = 1  #uint64 words per evidence mask
+        self.labels = np.full((_INITIAL_ROWS, len(self.categories), 0), MISSING, dtype=np.int8)
+        self.evidence = np.zeros((_INITIAL_ROWS, len(self.categories), 0, self.words), dtype=np.uint64)
+        self.ts = np.full((_INITIAL_ROWS, 0), -np.inf)
+        self.pairs = []
+        self._pa = self._pb = np.empty(0, dtype=np.intp)
+        self._reset_sums()
+        self._add_annotators(annotators)
+
+    @classmethod
+    def from_annotations(cls, all_annotations, exclude=(), categories=None):
+        # all_annotations = {annotator_id: [records]} like storage.load_all_annotations()
+        annotators = [a for a in all_annotations if a not in exclude]
+        table = cls(annotators, categories)
+        table.update({a: all_annotations[a] for a in annotators})
+        return table
+
+    # storage ===========================
+
+    def _add_annotators(self, new):
+        new = [a for a in new if a not in self.ann_index]
+        if not new:
+            return
+        for a in new:
+            self.ann_index[a] = len(self.annotators)
+            self.annotators.append(a)
+        n, c, extra = self.labels.shape[0], len(self.categories), len(new)
+        self.labels = np.concatenate([self.labels, np.full((n, c, extra), MISSING, dtype=np.int8)], axis=2)
+        self.evidence = np.concatenate(
+            [self.evidence, np.zeros((n, c, extra, self.words), dtype=np.uint64)], axis=2)
+        self.ts = np.concatenate([self.ts, np.full((n, extra), -np.inf)], axis=1)
+        a = len(self.annotators)
+        self.pairs = list(combinations(range(a), 2))
+        self._pa = np.array([p[0] for p in self.pairs], dtype=np.intp)
+        self._pb = np.array([p[1] for p in self.pairs], dtype=np.intp)
+        # pair set changed, every sum is rebuilt from the arrays
+        self._reset_sums()
+        self._accumulate(np.arange(len(self.passage_ids)), 1)
+
+    def _row(self, passage_id):
+        row = self.rows.get(passage_id)
+        if row is None:
+            row = self.rows[passage_id] = len(self.passage_ids)
+            self.passage_ids.append(passage_id)
+            if row >= self.labels.shape[0]:
+                grow = self.labels.shape[0]
+                self.labels = np.concatenate([self.labels, np.full_like(self.labels[:grow], MISSING)])
+                self.evidence = np.concatenate([self.evidence, np.zeros_like(self.evidence[:grow])])
+                self.ts = np.concatenate([self.ts, np.full_like(self.ts[:grow], -np.inf)])
+        return row
+
+    def _ensure_words(self, sentence_index):
+        needed = sentence_index // 64 + 1
+        if needed > self.words:
+            pad = np.zeros(self.evidence.shape[:3] + (needed - self.words,), dtype=np.uint64)
+            self.evidence = np.concatenate([self.evidence, pad], axis=3)
+            self.words = needed
+
+    def _reset_sums(self):
+        p, c = len(self.pairs), len(self.categories)
+        self.pair_counts = np.zeros((p, c, 2, 2), dtype=np.int64)  # [pair, cat, label a, label b]
+        self.pair_tp = np.zeros((p, c), dtype=np.int64)  # evidence sentences both picked
+        self.pair_marked = np.zeros((p, c), dtype=np.int64)  # evidence sentences picked, both sides added
+        self.pair_both = np.zeros((p, c), dtype=np.int64)  # passages both marked the category on
+        # group sums per category, over passages with 2+ annotators
+        self.units = np.zeros(c, dtype=np.int64)
+        self.fleiss_p = np.zeros(c)  # sum of per passage agreement P_i
+        self.ratings = np.zeros(c, dtype=np.int64)
+        self.ratings_pos = np.zeros(c, dtype=np.int64)
+        self.coinc = np.zeros((c, 3))  # krippendorff coincidences o00, o11, o01
+
+    # incremental sums ===========================
+
+    def _contributions(self, rows):
+        # {sum name: what each of these passage rows adds to it}, leading axis = rows
+        labels = self.labels[rows]  # (r, c, a)
+        seen = labels >= 0
+        pos = labels == 1
+        out = {}
+
+        la, lb = labels[:, :, self._pa], labels[:, :, self._pb]  # (r, c, p)
+        both = seen[:, :, self._pa] & seen[:, :, self._pb]
+        counts = np.zeros((len(rows), len(self.pairs), len(self.categories), 2, 2), dtype=np.int64)
+        for x in (0, 1):
+            for y in (0, 1):
+                counts[:, :, :, x, y] = (both & (la == x) & (lb == y)).transpose(0, 2, 1)
+        out["pair_counts"] = counts
+        marked = pos[:, :, self._pa] & pos[:, :, self._pb]
+        ev = self.evidence[rows]
+        ea, eb = ev[:, :, self._pa], ev[:, :, self._pb]  # (r, c, p, w)
+        out["pair_tp"] = np.where(marked, _popcount(ea & eb), 0).transpose(0, 2, 1)
+        out["pair_marked"] = np.where(marked, _popcount(ea) + _popcount(eb), 0).transpose(0, 2, 1)
+        out["pair_both"] = marked.astype(np.int64).transpose(0, 2, 1)
+
+        m = seen.sum(axis=2)  # (r, c) annotators per passage
+        n1 = pos.sum(axis=2)
+        n0 = m - n1
+        unit = m >= 2
+        mm = np.where(unit, m, 2)  #avoids 0 division, masked out anyway
+        out["units"] = unit.astype(np.int64)
+        out["ratings"] = np.where(unit, m, 0)
+        out["ratings_pos"] = np.where(unit, n1, 0)
+        out["fleiss_p"] = np.where(unit, (n1 * n1 + n0 * n0 - mm) / (mm * (mm - 1)), 0.0)
+        out["coinc"] = np.where(
+            unit[:, :, None],
+            np.stack([n0 * (n0 - 1), n1 * (n1 - 1), n1 * n0], axis=2) / (mm - 1)[:, :, None],
+            0.0,
+        )
+        return out
+
+    def _accumulate(self, rows, sign):
+        # add (sign=1) or take out (sign=-1) what these passage rows contribute to every sum
+        if len(rows) == 0 or not self.annotators:
+            return
+        for start in range(0, len(rows), _ROW_BLOCK):
+            for name, values in self._contributions(rows[start:start + _ROW_BLOCK]).items():
+                getattr(self, name)[...] += sign * values.sum(axis=0)
+
+    def update(self, annotations):
+        # fold {annotator_id: [records]} in, latest record per (annotator, passage) wins
+        # returns the passage ids whose labels changed
+        self._add_annotators(annotations)
+        winners = {}  #(row, annotator col) -> (ts, record)
+        for annotator_id, records in annotations.items():
+            col = self.ann_index[annotator_id]
+            for record in records:
+                pid = record.get("passage_id")
+                if not pid:
+                    continue
+                ts = parse_timestamp(record.get("timestamp"))
+                row = self._row(pid)
+                key = (row, col)
+                if ts >= self.ts[row, col] and (key not in winners or ts >= winners[key][0]):
+                    winners[key] = (ts, record)
+        if not winners:
+            return set()
+
+        rows = np.array(sorted({row for row, _ in winners}), dtype=np.intp)
+        self._accumulate(rows, -1)
+        for (row, col), (ts, record) in winners.items():
+            self.ts[row, col] = ts
+            self.labels[row, :, col] = MISSING
+            self.evidence[row, :, col] = 0
+            if not is_annotation_complete(record):
+                continue
+            self.labels[row, :, col] = 0
+            for cat_id, cat_data in record.get("categories", {}).items():
+                c = self.cat_index.get(cat_id)
+                if c is None:
+                    continue
+                self.labels[row, c, col] = 1
+                for s in (cat_data or {}).get("evidence") or []:
+                    s = int(s)
+                    if s < 0:
+                        continue
+                    self._ensure_words(s)
+                    self.evidence[row, c, col, s // 64] |= np.uint64(1 << (s % 64))
+        self._accumulate(rows, 1)
+        return {self.passage_ids[r] for r in rows}
+
+    # statistics ===========================
+
+    def sums(self):
+        return {name: getattr(self, name) for name in SUMS}
+
+    def cohen(self):
+        # (pairs, categories) Cohen's kappa, nan where it isnt defined (no shared passages, or
+        # both annotators used a single label throughout so chance agreement is 1)
+        return _cohen(self.sums())
+
+    def shared(self):
+        # (pairs, categories) passages both annotators completed
+        return self.pair_counts.sum(axis=(2, 3))
+
+    def fleiss(self):
+        return _fleiss(self.sums())
+
+    def krippendorff(self):
+        return _krippendorff(self.sums())
+
+    def evidence_f1(self):
+        return _evidence_f1(self.sums())
+
+    def group_evidence_f1(self):
+        return _group_evidence_f1(self.sums())
+
+    def report(self):
+        # plain dicts (nan -> None) for printing or json
+        def clean(values):
+            return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+        cohen, f1, shared = self.cohen(), self.evidence_f1(), self.shared()
+        pairs = {}
+        for i, (a, b) in enumerate(self.pairs):
+            if not shared[i].any():
+                continue
+            pairs[f"{self.annotators[a]}|{self.annotators[b]}"] = {
+                "passages": int(shared[i].max()),
+                "cohen": dict(zip(self.categories, clean(cohen[i]))),
+                "evidence_f1": dict(zip(self.categories, clean(f1[i]))),
+            }
+        return {
+            "annotators": list(self.annotators),
+            "passages": len(self.passage_ids),
+            "group": {
+                "units": dict(zip(self.categories, map(int, self.units))),
+                "fleiss": dict(zip(self.categories, clean(self.fleiss()))),
+                "krippendorff": dict(zip(self.categories, clean(self.krippendorff()))),
+                "evidence_f1": dict(zip(self.categories, clean(self.group_evidence_f1()))),
+            },
+            "pairs": pairs,
+        }
+
+
+# BOOTSTRAP ===========================
+# confidence intervals by resampling passages (those with 2+ annotators) with replacement
+# a replicate's sums are just a weighted sum of the per passage contributions, so a whole chunk of
+# replicates is one (replicates x passages) @ (passages x sums) product, chunks spread over a
+# process pool. chunk k always gets the k-th seed spawned from `seed`, so the intervals dont
+# depend on how many workers ran them
+
+BOOT_CHUNK = 250  # replicates per task
+
+_boot_ctx = None  #set in each worker process by _init_boot
+
+
+def _init_boot(ctx):
+    global _boot_ctx
+    _boot_ctx = ctx
+
+
+def _boot_chunk(job):
+    # {statistic: (n, ...)} for n replicates
+    n, seed_seq = job
+    flat, shapes = _boot_ctx
+    rng = np.random.default_rng(seed_seq)
+    units = flat.shape[0]
+    weights = rng.multinomial(units, np.full(units, 1.0 / units), size=n).astype(float)
+    summed = weights @ flat
+    sums, col = {}, 0
+    for name, shape in shapes.items():
+        size = int(np.prod(shape))
+        sums[name] = summed[:, col:col + size].reshape((n,) + shape)
+        col += size
+    return {stat: fn(sums) for stat, fn in STATISTICS.items()}
+
+
+def unit_rows(table):
+    # rows of the passages 2+ annotators completed, the only ones any statistic uses
+    seen = (table.labels[:len(table.passage_ids)] >= 0).any(axis=1)
+    return np.flatnonzero(seen.sum(axis=1) >= 2)
+
+
+def bootstrap(table, replicates=2000, seed=0, workers=1):
+    # {statistic: (replicates, ...) array}, same statistics and shapes as the table methods
+    # None if no passage has 2+ annotators yet
+    rows = unit_rows(table)
+    if len(rows) == 0:
+        return None
+    contributions = table._contributions(rows)
+    shapes = {name: values.shape[1:] for name, values in contributions.items()}
+    flat = np.concatenate(
+        [values.reshape(len(rows), -1).astype(float) for values in contributions.values()], axis=1)
+    del contributions
+
+    sizes = [min(BOOT_CHUNK, replicates - i) for i in range(0, replicates, BOOT_CHUNK)]
+    jobs = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_boot,
+                                 initargs=((flat, shapes),)) as pool:
+            chunks = list(pool.map(_boot_chunk, jobs))
+    else:
+        _init_boot((flat, shapes))
+        chunks = [_boot_chunk(job) for job in jobs]
+    return {stat: np.concatenate([c[stat] for c in chunks]) for stat in STATISTICS}
+
+
+def interval(replicates, level=0.95, min_defined=0.9):
+    # (low, high) percentile interval over the first axis, nan where the statistic was undefined in
+    # more than 1 - min_defined of the replicates (a category nobody marked in most resamples)
+    defined = (~np.isnan(replicates)).mean(axis=0)
+    tail = (1 - level) / 2 * 100
+    low = np.full(replicates.shape[1:], np.nan)
+    high = np.full(replicates.shape[1:], np.nan)
+    ok = defined >= min_defined
+    if ok.any():
+        low[ok], high[ok] = np.nanpercentile(replicates[:, ok], [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def units_needed(units, width, target):
+    # passages needed for an interval `target` wide, given one `width` wide from `units` passages
+    # (interval width shrinks with 1 / sqrt(passages)), nan where width is
+    return np.ceil(np.asarray(units, dtype=float) * (np.asarray(width) / target) ** 2)
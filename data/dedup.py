@@ -0,0 +1,148 @@
+# NEAR DUPLICATE DETECTION ===========================
+# MinHash signatures over sentence shingles + LSH banding, so only passages that share a band
+# bucket ever get compared (roughly linear instead of every pair)
+# overlapping excerpts of the same article share most of their sentences, which is what this catches
+# used by convert_passages before sentence splitting, signatures are cheap enough to build in the workers
+
+import hashlib
+import re
+from array import array
+
+from .prod_config import PRIORITY_RANK, passage_score
+
+NUM_PERM = 128  # hash functions per signature
+BANDS = 32  # LSH bands, rows per band = NUM_PERM // BANDS
+THRESHOLD = 0.8  # estimated jaccard at or above this = duplicate
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# rough sentence boundaries, only used to build shingles so it doesnt need punkt quality
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+_perm_cache = {}
+
+
+def _permutations(num_perm):
+    # fixed seed so signatures are comparable across runs and worker processes
+    perms = _perm_cache.get(num_perm)
+    if perms is None:
+        perms = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "little") % (_MERSENNE - 1) + 1
+            b = int.from_bytes(digest[8:], "little") % _MERSENNE
+            perms.append((a, b))
+        perms = _perm_cache[num_perm] = perms
+    return perms
+
+
+def shingles(text):
+    # set of normalised sentences, citation brackets/punctuation/case/spacing ignored
+    out = set()
+    for sent in _SENTENCE_END.split(text):
+        norm = _SPACES.sub(' ', _NON_WORD.sub(' ', sent.lower())).strip()
+        if norm:
+            out.add(norm)
+    return out
+
+
+def signature(text, num_perm=NUM_PERM):
+    # minhash signature as array of uint32, empty text gets an all max signature
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles(text)
+    ]
+    sig = array("I", [_MAX_HASH]) * num_perm
+    if not hashes:
+        return sig
+    for i, (a, b) in enumerate(_permutations(num_perm)):
+        sig[i] = min(((a * h + b) % _MERSENNE) & _MAX_HASH for h in hashes)
+    return sig
+
+
+def similarity(sig_a, sig_b):
+    # estimated jaccard = fraction of matching minhash slots
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / len(sig_a)
+
+
+def _keep_key(meta):
+    # best passage first: priority tier, then score, then whoever came first in the file
+    tier = PRIORITY_RANK.get(str(meta.get("priority", "")).upper(), len(PRIORITY_RANK))
+    return (tier, -passage_score(meta), meta["order"])
+
+
+class NearDuplicateIndex:
+    # add() passages one by one (any order), clusters() at the end
+    # meta per passage = {"id", "priority", "score", "order"}
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.meta = []
+        self.sigs = []
+        self.parent = []
+        self.buckets = {}  #(band, band hash) -> [passage index]
+        self.comparisons = 0
+
+    def _find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _union(self, i, j):
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+    def add(self, meta, sig):
+        idx = len(self.meta)
+        self.meta.append(meta)
+        self.sigs.append(sig)
+        self.parent.append(idx)
+
+        checked = set()
+        for band in range(self.bands):
+            start = band * self.rows
+            key = (band, hash(tuple(sig[start:start + self.rows])))
+            members = self.buckets.setdefault(key, [])
+            for other in members:
+                if other in checked:
+                    continue
+                checked.add(other)
+                if self._find(other) == self._find(idx):
+                    continue
+                self.comparisons += 1
+                sim = similarity(sig, self.sigs[other])
+                if sim >= self.threshold:
+                    self._union(idx, other)
+            members.append(idx)
+        return idx
+
+    def clusters(self):
+        # [{"kept": meta, "removed": [(meta, similarity to kept), ...]}] for every group of 2+
+        groups = {}
+        for i in range(len(self.meta)):
+            groups.setdefault(self._find(i), []).append(i)
+        result = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            members.sort(key=lambda i: _keep_key(self.meta[i]))
+            keep = members[0]
+            removed = [
+                (self.meta[i], similarity(self.sigs[keep], self.sigs[i]))
+                for i in members[1:]
+            ]
+            result.append({"kept": self.meta[keep], "removed": removed})
+        result.sort(key=lambda c: c["kept"]["order"])
+        return result
@@ -0,0 +1,262 @@
+# COLUMNAR SAMPLER FEATURES ===========================
+# one numpy column per stratification feature instead of one dict (with sets) per annotation
+# ann_type / conf_tier / wc_tertile / source are small int codes, domains + categories are bitmasks
+# so bin membership, coverage and priority are array ops over the whole pool
+# to_features() gives back the dicts sampler_script has always used, row for row identical
+
+import numpy as np
+
+from .common import EXCLUSION_IDS, build_domain_map
+
+DOMAIN_MAP = build_domain_map()
+
+ANN_TYPES = ("exclusion", "single_cat", "multi_cat")
+CONF_TIERS = ("exclusion_only", "high_conf", "mixed_conf", "low_conf")
+TERTILES = ("short", "medium", "long")
+
+CONF_RANK = {"high": 3, "medium": 2, "low": 1}
+CONF_BONUS = {"low_conf": 3.0, "mixed_conf": 1.5, "high_conf": 0.0, "exclusion_only": 0.5}
+
+_ANN_CODE = {name: i for i, name in enumerate(ANN_TYPES)}
+_CONF_CODE = {name: i for i, name in enumerate(CONF_TIERS)}
+_CONF_BONUS_BY_CODE = np.array([CONF_BONUS[name] for name in CONF_TIERS])
+_NO_TERTILE = -1
+
+
+def _conf_tier(phil_cats):
+    conf_vals = [
+        CONF_RANK[v.get("confidence")]
+        for v in phil_cats.values()
+        if v.get("confidence") in CONF_RANK
+    ]
+    if not conf_vals:
+        return "exclusion_only"
+    if all(c == 3 for c in conf_vals):
+        return "high_conf"
+    if any(c == 1 for c in conf_vals):
+        return "low_conf"
+    return "mixed_conf"
+
+
+class Vocab:
+    # string <-> code, codes handed out in first seen order
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+
+class FeatureMatrix:
+    # rows = annotations, every attribute below is a column of length n (passage_ids a plain list)
+    def __init__(self, passage_ids, ann_type, conf_tier, source, word_count, domain_mask, cat_mask,
+                 num_cats, scores, sources, domains, categories):
+        self.passage_ids = passage_ids
+        self.ann_type = ann_type        # int8 code into ANN_TYPES
+        self.conf_tier = conf_tier      # int8 code into CONF_TIERS
+        self.source = source            # int32 code into sources
+        self.word_count = word_count    # int64
+        self.domain_mask = domain_mask  # uint64, bit i = domains.names[i]
+        self.cat_mask = cat_mask        # uint64, bit i = categories.names[i]
+        self.num_cats = num_cats        # int16, philosophical categories only
+        self.scores = scores            # passage score as given, carried through untouched
+        self.sources = sources
+        self.domains = domains
+        self.categories = categories
+        self.tertile = np.full(len(passage_ids), _NO_TERTILE, dtype=np.int8)
+        self.priority = np.zeros(len(passage_ids))
+
+    def __len__(self):
+        return len(self.passage_ids)
+
+    @classmethod
+    def from_records(cls, records, passages_meta):
+        # records = iterable of (passage_id, latest annotation), same rules as extract_features
+        domains = Vocab(sorted(set(DOMAIN_MAP.values())))
+        categories = Vocab(sorted(DOMAIN_MAP))
+        sources = Vocab()
+        pids, ann, conf, src, wc, dmask, cmask, ncats, scores = [], [], [], [], [], [], [], [], []
+        for pid, record in records:
+            cats = record.get("categories", {})
+            meta = passages_meta.get(pid) or {}
+            phil_cats = {k: v for k, v in cats.items() if k not in EXCLUSION_IDS}
+
+            if len(phil_cats) != len(cats):
+                ann_type = "exclusion"
+            elif len(phil_cats) == 1:
+                ann_type = "single_cat"
+            else:
+                ann_type = "multi_cat"
+
+            d = 0
+            c = 0
+            for cat in phil_cats:
+                c |= 1 << categories.code(cat)
+                if cat in DOMAIN_MAP:
+                    d |= 1 << domains.code(DOMAIN_MAP[cat])
+
+            pids.append(record["passage_id"])
+            ann.append(_ANN_CODE[ann_type])
+            conf.append(_CONF_CODE[_conf_tier(phil_cats)])
+            src.append(sources.code(meta.get("source", "unknown")))
+            wc.append(meta.get("word_count", 0))
+            dmask.append(d)
+            cmask.append(c)
+            ncats.append(len(phil_cats))
+            scores.append(meta.get("score", 0))
+        if len(categories) > 64 or len(domains) > 64:
+            raise ValueError("more than 64 categories/domains, masks are uint64")
+
+        return cls(
+            pids,
+            np.array(ann, dtype=np.int8),
+            np.array(conf, dtype=np.int8),
+            np.array(src, dtype=np.int32),
+            np.array(wc, dtype=np.int64),
+            np.array(dmask, dtype=np.uint64),
+            np.array(cmask, dtype=np.uint64),
+            np.array(ncats, dtype=np.int16),
+            scores,
+            sources, domains, categories,
+        )
+
+    # derived columns ===========================
+
+    def assign_tertiles(self):
+        # cut points as assign_wc_tertiles: sorted word counts at n//3 and 2n//3, inclusive
+        n = len(self)
+        if n == 0:
+            return
+        wcs = np.sort(self.word_count)
+        t1 = wcs[n // 3]
+        t2 = wcs[(2 * n) // 3]
+        self.tertile = np.where(self.word_count <= t1, 0, np.where(self.word_count <= t2, 1, 2)).astype(np.int8)
+
+    def domain_counts(self):
+        return self._popcount(self.domain_mask, len(self.domains))
+
+    def compute_priority(self):
+        # same terms, same addition order as compute_priority_score so the floats match exactly
+        score = np.zeros(len(self))
+        score += self.num_cats * 1.5
+        score += _CONF_BONUS_BY_CODE[self.conf_tier]
+        score += self.domain_counts() * 1.0
+        score += np.where(self.tertile == 1, 1.0, 0.0)
+        self.priority = score
+        return score
+
+    def priority_order(self):
+        # row order the sampler uses: priority desc, passage_id asc
+        return np.lexsort((np.array(self.passage_ids, dtype=str), -self.priority))
+
+    def take(self, rows):
+        # new matrix with just these rows, in this order (vocabs shared)
+        rows = np.asarray(rows, dtype=np.intp)
+        out = FeatureMatrix(
+            [self.passage_ids[i] for i in rows],
+            self.ann_type[rows], self.conf_tier[rows], self.source[rows], self.word_count[rows],
+            self.domain_mask[rows], self.cat_mask[rows], self.num_cats[rows],
+            [self.scores[i] for i in rows],
+            self.sources, self.domains, self.categories,
+        )
+        out.tertile = self.tertile[rows]
+        out.priority = self.priority[rows]
+        return out
+
+    # selections ===========================
+
+    def bin_rows(self, ann_type, tertile):
+        return np.flatnonzero((self.ann_type == _ANN_CODE[ann_type]) & (self.tertile == TERTILES.index(tertile)))
+
+    def domain_rows(self, domain):
+        code = self.domains.codes.get(domain)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.domain_mask & np.uint64(1 << code))
+
+    def category_rows(self, category):
+        code = self.categories.codes.get(category)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.cat_mask & np.uint64(1 << code))
+
+    def category_counts(self):
+        # {category: rows with it}, categories nobody used are left out
+        counts = self._bit_totals(self.cat_mask, len(self.categories))
+        return {name: int(counts[i]) for i, name in enumerate(self.categories.names) if counts[i]}
+
+    def coverage(self, rows=None):
+        # (domain names, category names) present anywhere in rows
+        d = self.domain_mask if rows is None else self.domain_mask[rows]
+        c = self.cat_mask if rows is None else self.cat_mask[rows]
+        d = int(np.bitwise_or.reduce(d)) if len(d) else 0
+        c = int(np.bitwise_or.reduce(c)) if len(c) else 0
+        return self._names(d, self.domains), self._names(c, self.categories)
+
+    def value_counts(self, column, rows, labels):
+        # {label: count} over rows, in first seen order like counting into a defaultdict would give
+        codes = getattr(self, column)[rows]
+        if len(codes) == 0:
+            return {}
+        uniq, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return {labels[int(uniq[i])]: int(counts[i]) for i in order}
+
+    # back to dicts ===========================
+
+    def to_features(self):
+        # list of feature dicts exactly as extract_features + assign_wc_tertiles + _priority build them
+        features = []
+        domain_sets = {}
+        cat_sets = {}
+        for i, pid in enumerate(self.passage_ids):
+            d = int(self.domain_mask[i])
+            c = int(self.cat_mask[i])
+            if d not in domain_sets:
+                domain_sets[d] = self._names(d, self.domains)
+            if c not in cat_sets:
+                cat_sets[c] = frozenset(self._names(c, self.categories))
+            feat = {
+                "passage_id":      pid,
+                "ann_type":        ANN_TYPES[self.ann_type[i]],
+                "domains_present": set(domain_sets[d]),
+                "category_ids":    cat_sets[c],
+                "conf_tier":       CONF_TIERS[self.conf_tier[i]],
+                "source":          self.sources.names[self.source[i]],
+                "word_count":      int(self.word_count[i]),
+                "score":           self.scores[i],
+                "num_cats":        int(self.num_cats[i]),
+            }
+            if self.tertile[i] != _NO_TERTILE:
+                feat["wc_tertile"] = TERTILES[self.tertile[i]]
+            feat["_priority"] = float(self.priority[i])
+            features.append(feat)
+        return features
+
+    # bit helpers ===========================
+
+    @staticmethod
+    def _names(mask, vocab):
+        return {name for i, name in enumerate(vocab.names) if mask >> i & 1}
+
+    @staticmethod
+    def _bit_totals(masks, bits):
+        # rows with each bit set, one pass per bit
+        return np.array([np.count_nonzero(masks & np.uint64(1 << b)) for b in range(bits)], dtype=np.int64)
+
+    @staticmethod
+    def _popcount(masks, bits):
+        out = np.zeros(len(masks), dtype=np.int64)
+        for b in range(bits):
+            out += ((masks >> np.uint64(b)) & np.uint64(1)).astype(np.int64)
+        return out
@@ -0,0 +1,108 @@
+# INDEXED PASSAGE FILE ===========================
+# passages.jsonl = one compact JSON passage per line, passages.idx.json = id -> [offset, length, priority, score]
+# the data file is memory mapped and a passage is only decoded when someone asks for it, so the
+# app/setup scripts pay for the index (a few numbers per passage) instead of every passage text
+# convert_passages writes both files next to passages.json
+
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+
+INDEX_VERSION = 1
+DECODED_CACHE = 64  # recently decoded passages kept per mapping, reruns ask for the same one a lot
+
+
+def index_path(data_path):
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.stem + ".idx.json")
+
+
+class PassageFileWriter:
+    # writes passages.jsonl + index, both to .tmp files that close() swaps in
+    def __init__(self, data_path):
+        self.data_path = Path(data_path)
+        self.index_path = index_path(self.data_path)
+        self._tmp_data = self.data_path.with_suffix(self.data_path.suffix + ".tmp")
+        self._f = open(self._tmp_data, 'wb')
+        self.offset = 0
+        self.index = {}
+
+    def write(self, passage):
+        line = json.dumps(passage, ensure_ascii=False).encode('utf-8')
+        self._f.write(line + b'\n')
+        self.index[passage['id']] = [self.offset, len(line), passage.get('priority'), passage.get('score')]
+        self.offset += len(line) + 1
+
+    def close(self):
+        self._f.close()
+        tmp_index = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "data_file": self.data_path.name, "passages": self.index},
+                      f, ensure_ascii=False)
+        # data first then index, a reader never sees an index pointing past the end of the data
+        os.replace(self._tmp_data, self.data_path)
+        os.replace(tmp_index, self.index_path)
+
+    def abort(self):
+        # drop both .tmp files, whichever got written
+        self._f.close()
+        self._tmp_data.unlink(missing_ok=True)
+        self.index_path.with_suffix(self.index_path.suffix + ".tmp").unlink(missing_ok=True)
+
+
+class IndexedPassages(Mapping):
+    # read only {passage_id: passage} over the mmapped file, same interface the app uses on the dict
+    # one instance is shared by every session (storage caches it) so the decoded cache is locked
+    def __init__(self, data_path):
+        self.data_path = Path(data_path)
+        with open(index_path(self.data_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported passage index version {index.get('version')}")
+        self._index = index["passages"]
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+        with open(self.data_path, 'rb') as f:
+            # mmap cant map an empty file
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else None
+
+    def __getitem__(self, passage_id):
+        with self._lock:
+            passage = self._decoded.get(passage_id)
+            if passage is not None:
+                self._decoded.move_to_end(passage_id)
+                return passage
+        offset, length = self._index[passage_id][:2]
+        passage = json.loads(self._mm[offset:offset + length])
+        with self._lock:
+            self._decoded[passage_id] = passage
+            if len(self._decoded) > DECODED_CACHE:
+                self._decoded.popitem(last=False)
+        return passage
+
+    def __contains__(self, passage_id):
+        return passage_id in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def meta(self):
+        # {id: {"priority", "score"}} straight from the index, for ranking without decoding passages
+        return {pid: {"priority": entry[2], "score": entry[3]} for pid, entry in self._index.items()}
+
+
+def is_current(data_path):
+    # data + index both present and at least as new as passages.json, else fall back to the JSON
+    data_path = Path(data_path)
+    idx = index_path(data_path)
+    if not (data_path.exists() and idx.exists()):
+        return False
+    legacy = data_path.with_suffix(".json")
+    return not legacy.exists() or idx.stat().st_mtime >= legacy.stat().st_mtime
@@ -1,4 +1,5 @@
 #production config,, defines annotators and their assignments
+import heapq
 
 PRODUCTION_ANNOTATORS = [
     {#me
@@ -47,16 +48,74 @@ PRODUCTION_ANNOTATORS = [
 ]
 
 
-def generate_primary_assignments(passage_ids, num_passages=2000):
-    # assigns first num_passages to primary annotator
-    assignments = []
-    for i, passage_id in enumerate(passage_ids[:num_passages]):
-        assignments.append({
-            "annotator_id": "primary_rafuh",
+# priority tiers from convert_passages, anything unknown sorts after LOW
+PRIORITY_RANK = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
+
+
+def passage_score(passage):
+    # numeric score from convert_passages, 0 when missing/garbled (also used by dedup to pick the keeper)
+    try:
+        return float(passage.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def rank_passages(passage_ids, passages_meta=None):
+    # order passage ids by priority tier then score (desc), file order breaks ties
+    # passages_meta = {id: passage} with priority/score, without it file order is kept
+    if not passages_meta:
+        return list(passage_ids)
+    heap = []
+    for order, pid in enumerate(passage_ids):
+        meta = passages_meta.get(pid) or {}
+        tier = PRIORITY_RANK.get(str(meta.get("priority", "")).upper(), len(PRIORITY_RANK))
+        heap.append((tier, -passage_score(meta), order, pid))
+    heapq.heapify(heap)
+    return [heapq.heappop(heap)[3] for _ in range(len(heap))]
+
+
+def distribute_assignments(ranked_ids, annotator_ids, capacity=None, loads=None, set_name="core"):
+    # hand ranked passages out to whoever currently has the fewest, O(n log k)
+    # loads = existing assignment counts so incremental runs keep balancing against what's there
+    # capacity = max assignments per annotator (None = unlimited)
+    loads = loads or {}
+    heap = [(loads.get(aid, 0), i, aid) for i, aid in enumerate(annotator_ids)]
+    heapq.heapify(heap)
+    result = {aid: [] for aid in annotator_ids}
+    for passage_id in ranked_ids:
+        #full annotators are popped and not pushed back
+        while heap and capacity is not None and heap[0][0] >= capacity:
+            heapq.heappop(heap)
+        if not heap:
+            break
+        load, i, aid = heapq.heappop(heap)
+        result[aid].append({
+            "annotator_id": aid,
             "passage_id": passage_id,
-            "set": "core"
+            "set": set_name
         })
-    return assignments
+        heapq.heappush(heap, (load + 1, i, aid))
+    return result
+
+
+def generate_primary_assignments(passage_ids, num_passages=2000, passages_meta=None):
+    # assigns top num_passages to primary annotator, by priority/score when metadata is given
+    ranked = rank_passages(passage_ids, passages_meta)
+    return distribute_assignments(ranked, ["primary_rafuh"], capacity=num_passages)["primary_rafuh"]
+
+
+def generate_incremental_assignments(passage_ids, existing, annotator_ids, capacity=None, passages_meta=None):
+    # only NEW rows for passages not yet assigned to any of annotator_ids
+    # existing = {annotator_id: [assignment, ...]} as already stored, so nothing gets rewritten
+    assigned = {
+        a["passage_id"]
+        for aid in annotator_ids
+        for a in existing.get(aid, [])
+    }
+    loads = {aid: len(existing.get(aid, [])) for aid in annotator_ids}
+    ranked = [pid for pid in rank_passages(passage_ids, passages_meta) if pid not in assigned]
+    new = distribute_assignments(ranked, annotator_ids, capacity=capacity, loads=loads)
+    return {aid: rows for aid, rows in new.items() if rows}
 
 
 def generate_expert_assignments(passage_ids, expert_annotators, overlap_count=100):
@@ -76,10 +135,13 @@ def generate_expert_assignments(passage_ids, expert_annotators, overlap_count=10
     return assignments
 
 #generate assignmnets for deployment
-def get_production_assignments(passage_ids):
+# passages_meta = {id: passage} so primary gets the highest priority/score passages first
+def get_production_assignments(passage_ids, passages_meta=None):
     all_assignments = {}
 
-    all_assignments["primary_rafuh"] = generate_primary_assignments(passage_ids, num_passages=2000)
+    all_assignments["primary_rafuh"] = generate_primary_assignments(
+        passage_ids, num_passages=2000, passages_meta=passages_meta
+    )
 
     # expert_assignments = generate_expert_assignments(passage_ids, expert_ids, overlap_count=5)
     # for assignment in expert_assignments:
@@ -0,0 +1,167 @@
+# OPT-IN PER RERUN PROFILER ===========================
+# times storage calls + render functions, keeps recent samples per operation in memory
+# turn on with profiling = true in secrets.toml or ANNOTATOR_PROFILE=1, otherwise everything here is a no-op
+# numbers are per server process (shared by all sessions) and reset on restart
+
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent
+
+ENABLED = os.environ.get("ANNOTATOR_PROFILE", "").lower() in ("1", "true", "yes")
+try:
+    import streamlit as st
+    if hasattr(st, "secrets") and "profiling" in st.secrets:
+        ENABLED = bool(st.secrets["profiling"])
+except(ImportError, Exception):
+    pass
+
+METRICS_FILE = Path(os.environ.get("ANNOTATOR_PROFILE_FILE", DATA_DIR / "profile_metrics.prom"))
+WRITE_INTERVAL = 15  # seconds between prometheus file writes
+MAX_SAMPLES = 2048  # per operation, oldest dropped first
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_counts = defaultdict(int)
+_totals = defaultdict(float)
+_last_write = 0.0
+
+
+def record(op, seconds):
+    with _lock:
+        _samples[op].append(seconds)
+        _counts[op] += 1
+        _totals[op] += seconds
+
+
+@contextmanager
+def timer(op):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        #finally so st.rerun/st.stop exceptions still get timed
+        record(op, time.perf_counter() - start)
+
+
+def timed(op=None):
+    # decorator, returns the function untouched when profiling is off
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        name = op or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        inner.__profiled__ = True
+        return inner
+    return wrap
+
+
+def instrument_module(module, prefix=None):
+    # swap every plain function defined in module for a timed wrapper
+    # calls between functions inside the module go through module globals so they get timed too
+    if not ENABLED:
+        return []
+    prefix = prefix or module.__name__.rsplit(".", 1)[-1]
+    wrapped = []
+    for name, fn in list(vars(module).items()):
+        if name.startswith("_") or not inspect.isfunction(fn):
+            continue
+        if fn.__module__ != module.__name__ or getattr(fn, "__profiled__", False):
+            continue
+        setattr(module, name, timed(f"{prefix}.{name}")(fn))
+        wrapped.append(name)
+    return wrapped
+
+
+def instrument_storage():
+    # wrap data.storage, plus the sheets backend when in sheets mode (that is the API latency)
+    # has to run BEFORE app.py does `from data.storage import ...` or app keeps the raw functions
+    if not ENABLED:
+        return
+    from . import storage
+    instrument_module(storage)
+    if storage.STORAGE_MODE == "sheets":
+        from . import sheets_backend
+        instrument_module(sheets_backend, prefix="sheets")
+
+
+def _percentile(sorted_vals, q):
+    #nearest rank
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(q * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def summary():
+    # {op: {count, total, mean, p50, p95, p99}} percentiles over the last MAX_SAMPLES calls
+    with _lock:
+        snapshot = {op: (sorted(vals), _counts[op], _totals[op]) for op, vals in _samples.items()}
+    result = {}
+    for op, (vals, count, total) in sorted(snapshot.items()):
+        result[op] = {
+            "count": count,
+            "total": total,
+            "mean": total / count if count else 0.0,
+            "p50": _percentile(vals, 0.50),
+            "p95": _percentile(vals, 0.95),
+            "p99": _percentile(vals, 0.99),
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+        _totals.clear()
+
+
+def to_prometheus(stats=None):
+    stats = summary() if stats is None else stats
+    lines = [
+        "# HELP annotator_op_seconds Latency of storage calls and render functions.",
+        "# TYPE annotator_op_seconds summary",
+    ]
+    for op, s in stats.items():
+        label = op.replace("\\", "\\\\").replace('"', '\\"')
+        for q in ("p50", "p95", "p99"):
+            quantile = f"0.{q[1:]}"
+            lines.append(f'annotator_op_seconds{{op="{label}",quantile="{quantile}"}} {s[q]:.6f}')
+        lines.append(f'annotator_op_seconds_sum{{op="{label}"}} {s["total"]:.6f}')
+        lines.append(f'annotator_op_seconds_count{{op="{label}"}} {s["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=None, force=False):
+    # writes textfile-collector style metrics, throttled to one write per WRITE_INTERVAL
+    global _last_write
+    if not ENABLED:
+        return False
+    now = time.monotonic()
+    if not force and now - _last_write < WRITE_INTERVAL:
+        return False
+    _last_write = now
+    path = Path(path or METRICS_FILE)
+    try:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(to_prometheus(), encoding="utf-8")
+        os.replace(tmp, path)  #atomic so scrapers never see half a file
+        return True
+    except OSError as e:
+        print(f"Could not write profiler metrics: {e}")
+        return False
@@ -0,0 +1,193 @@
+# LATEST WINS RESOLVER ===========================
+# annotation logs are append only (a re-save is a new row), everything that reads them wants the
+# latest record per passage. resolve() does it in two passes over a source:
+#   1. scan every record, keep only passage_id -> (parsed timestamp, offset)
+#   2. fetch just the winning offsets and yield those records, in log order
+# so memory is the small map, not the log. timestamps are compared parsed (not as ISO strings, where
+# "…:00Z" sorts after "…:00.5Z"), equal timestamps go to the later row
+# sources: ListSource (anything already in memory, eg the sheets backend), JsonlSource (one record
+# per line, winners re-read by seeking), JsonArraySource (storage's local JSON files, read
+# incrementally instead of json.load-ing the whole array)
+# scripts/check_resolver.py runs the array reader at every chunk size against json.load
+
+import json
+from datetime import datetime, timezone
+
+READ_CHUNK = 1 << 16  # chars per read for the incremental JSON array reader
+
+_NEVER = float("-inf")
+
+
+def parse_timestamp(value):
+    # epoch seconds, naive timestamps are UTC (thats what save_annotation writes), missing or
+    # unparseable ones sort before everything
+    if not value:
+        return _NEVER
+    try:
+        ts = datetime.fromisoformat(value)  #handles the trailing Z itself on 3.11+
+    except (TypeError, ValueError):
+        text = str(value).strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            ts = datetime.fromisoformat(text)
+        except ValueError:
+            return _NEVER
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+# SOURCES ===========================
+# scan() -> (offset, record) for every record, fetch(offsets) -> records at those (sorted) offsets
+
+class ListSource:
+    def __init__(self, records):
+        self.records = records
+
+    def scan(self):
+        return enumerate(self.records)
+
+    def fetch(self, offsets):
+        for offset in offsets:
+            yield self.records[offset]
+
+
+class JsonlSource:
+    # offsets are byte positions, blank/corrupt lines are skipped (a crashed append leaves half a line)
+    def __init__(self, path):
+        self.path = path
+
+    def scan(self):
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def fetch(self, offsets):
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+
+class JsonArraySource:
+    # offsets are element numbers, fetch streams the array again and picks them out
+    def __init__(self, path):
+        self.path = path
+
+    def scan(self):
+        return enumerate(iter_json_array(self.path))
+
+    def fetch(self, offsets):
+        wanted = iter(offsets)
+        target = next(wanted, None)
+        if target is None:
+            return
+        for i, record in enumerate(iter_json_array(self.path)):
+            if i == target:
+                yield record
+                target = next(wanted, None)
+                if target is None:
+                    return
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK):
+    # elements of a top level JSON array one at a time, only ~one element + a chunk held in memory
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
+        started = False
+        while True:
+            # skip whitespace, the opening bracket and separators
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+            if pos >= len(buf):
+                if started:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                return  #empty file
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # element runs past the chunk, read more and try again
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            after = end
+            while after < len(buf) and buf[after] in " \t\r\n":
+                after += 1
+            if not eof and (after >= len(buf) or buf[after] not in ",]"):
+                # only whats after the separator proves the element is done, a number cut at the
+                # chunk edge decodes fine on its own ("23456" as "2345", "-0.25" as "-0"),
+                # read more and decode it again
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield element
+            pos = end
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+# RESOLVING ===========================
+
+def latest_index(pairs, key="passage_id"):
+    # {passage_id: (timestamp, offset)} of the latest record per passage, from (offset, record) pairs
+    best = {}
+    for offset, record in pairs:
+        pid = record.get(key, "")
+        if not pid:
+            continue
+        ts = parse_timestamp(record.get("timestamp"))
+        current = best.get(pid)
+        if current is None or ts >= current[0]:
+            best[pid] = (ts, offset)
+    return best
+
+
+def resolve(source, key="passage_id"):
+    # latest record per passage, yielded in log order
+    best = latest_index(source.scan(), key)
+    offsets = sorted(offset for _, offset in best.values())
+    del best
+    yield from source.fetch(offsets)
+
+
+def resolve_records(records, key="passage_id"):
+    # {passage_id: latest record} for a list already in memory
+    return {record[key]: record for record in resolve(ListSource(records), key)}
+
+
+def newer(record, current):
+    # would `record` replace `current` as the latest? (same rule as resolve)
+    return parse_timestamp(record.get("timestamp")) >= parse_timestamp(current.get("timestamp"))
+
+
+def source_for(path):
+    # JsonlSource for .jsonl, JsonArraySource for anything else
+    return JsonlSource(path) if str(path).endswith(".jsonl") else JsonArraySource(path)
@@ -0,0 +1,312 @@
+# SAMPLER SNAPSHOT ===========================
+# local copy of the sheets the IAA sampler reads (primary_rafuh, passages, assignments) in sqlite
+# so dry runs dont hit the API at all, --refresh tops it up from the spreadsheet
+# the annotation log is append only, so a refresh only pulls its rows after the last one stored
+# (plus that last row again, if it changed or the sheet shrank the whole sheet is reloaded)
+# passages / assignments get edited in place (setup_google_sheets --sync rewrites score / priority,
+# --prune deletes rows), those are read whole every refresh (just the kept columns) and only
+# rewritten in the snapshot when their digest changed
+# also reads a plain JSON / JSONL annotation log + the local passages file for fully offline runs
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent
+SNAPSHOT_DB = DATA_DIR / "sampler_snapshot.sqlite"
+
+PRIMARY_SHEET = "primary_rafuh"
+
+# sheet -> columns kept (None = all), passages only needs what the sampler stratifies on not the text
+SNAPSHOT_SHEETS = {
+    PRIMARY_SHEET: None,
+    "passages":    ("id", "source", "word_count", "score", "priority"),
+    "assignments": None,
+}
+APPEND_ONLY = {PRIMARY_SHEET}  # sheets only ever appended to, refreshed by tailing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    sheet        TEXT PRIMARY KEY,
+    header       TEXT NOT NULL,   -- JSON list, full header row as in the sheet
+    rows         INTEGER NOT NULL,
+    refreshed_at REAL NOT NULL,
+    digest       TEXT             -- sha1 of the records, sheets that are reloaded whole only
+);
+CREATE TABLE IF NOT EXISTS rows (
+    sheet   TEXT NOT NULL,
+    row_num INTEGER NOT NULL,     -- 1 = first row under the header
+    record  TEXT NOT NULL,        -- JSON dict, same values get_all_records gives
+    PRIMARY KEY (sheet, row_num)
+);
+"""
+
+
+def connect(db_path=None):
+    conn = sqlite3.connect(str(db_path or SNAPSHOT_DB))
+    conn.executescript(_SCHEMA)
+    if "digest" not in {c[1] for c in conn.execute("PRAGMA table_info(sheets)")}:
+        conn.execute("ALTER TABLE sheets ADD COLUMN digest TEXT")  #snapshot from before digests
+    return conn
+
+
+# REFRESH FROM SHEETS ===========================
+
+def _records(header, values, keep):
+    # rows -> dicts exactly like worksheet.get_all_records (padded, numericised), cut down to keep
+    from gspread.utils import numericise_all
+
+    out = []
+    for row in values:
+        row = list(row) + [""] * (len(header) - len(row))
+        record = dict(zip(header, numericise_all(row[:len(header)])))
+        if keep is not None:
+            record = {k: record.get(k, "") for k in keep}
+        out.append(record)
+    return out
+
+
+def _stored(conn, sheet):
+    row = conn.execute("SELECT header, rows FROM sheets WHERE sheet = ?", (sheet,)).fetchone()
+    if row is None:
+        return None, 0
+    return json.loads(row[0]), row[1]
+
+
+def _last_record(conn, sheet, row_num):
+    row = conn.execute(
+        "SELECT record FROM rows WHERE sheet = ? AND row_num = ?", (sheet, row_num)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def refresh_sheet(conn, worksheet, keep=None, full=False):
+    # one batch_get: the header + everything from the last stored row down
+    # returns (rows added, reloaded from scratch?)
+    from gspread.utils import rowcol_to_a1
+
+    sheet = worksheet.title
+    header, stored = (None, 0) if full else _stored(conn, sheet)
+    first = stored + 1 if stored else 2  #sheet row of the last stored record, or the first data row
+    if stored and worksheet.row_count < first:
+        return refresh_sheet(conn, worksheet, keep, full=True)  #sheet got smaller than the snapshot
+
+    ranges = ["1:1"]
+    if worksheet.row_count >= first:
+        ranges.append(f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(worksheet.row_count, worksheet.col_count)}")
+    fetched = worksheet.batch_get(ranges)
+    new_header = [str(h) for h in (fetched[0][0] if fetched[0] else [])]
+    tail = list(fetched[1]) if len(fetched) > 1 else []
+    while tail and not any(str(v).strip() for v in tail[-1]):
+        tail.pop()  #trailing blank rows in the grid
+
+    if stored:
+        # first row fetched is the one we already have, it has to be unchanged
+        if (header != new_header or not tail
+                or _records(new_header, tail[:1], keep)[0] != _last_record(conn, sheet, stored)):
+            return refresh_sheet(conn, worksheet, keep, full=True)  #history rewritten, start over
+        tail = tail[1:]
+    else:
+        conn.execute("DELETE FROM rows WHERE sheet = ?", (sheet,))
+
+    records = _records(new_header, tail, keep)
+    conn.executemany(
+        "INSERT INTO rows (sheet, row_num, record) VALUES (?, ?, ?)",
+        [(sheet, stored + i + 1, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(records)],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO sheets (sheet, header, rows, refreshed_at) VALUES (?, ?, ?, ?)",
+        (sheet, json.dumps(new_header), stored + len(records), time.time()),
+    )
+    conn.commit()
+    return len(records), not stored
+
+
+def reload_sheet(conn, worksheet, keep=None, full=False):
+    # whole sheet (only the kept columns), rows rewritten only if the records differ from the snapshot
+    # returns (rows stored, reloaded?) like refresh_sheet, (0, False) when nothing changed
+    from gspread.utils import rowcol_to_a1
+
+    sheet = worksheet.title
+    header = [str(h) for h in worksheet.row_values(1)]
+    cols = [i for i, h in enumerate(header, start=1) if keep is None or h in keep]
+    rows = []
+    if cols and worksheet.row_count >= 2:
+        if keep is None:
+            ranges = [f"A2:{rowcol_to_a1(worksheet.row_count, worksheet.col_count)}"]
+        else:
+            ranges = [f"{rowcol_to_a1(2, c)}:{rowcol_to_a1(worksheet.row_count, c)}" for c in cols]
+        fetched = [list(r) for r in worksheet.batch_get(ranges)]
+        if keep is None:
+            rows = fetched[0]
+        else:
+            # one column per range, rows with a blank cell at the bottom come back shorter
+            height = max((len(col) for col in fetched), default=0)
+            rows = [[col[i][0] if i < len(col) and col[i] else "" for col in fetched] for i in range(height)]
+    while rows and not any(str(v).strip() for v in rows[-1]):
+        rows.pop()  #trailing blank rows in the grid
+
+    records = _records([header[c - 1] for c in cols], rows, keep)
+    digest = hashlib.sha1(json.dumps(records, ensure_ascii=False).encode("utf-8")).hexdigest()
+    stored = conn.execute("SELECT digest FROM sheets WHERE sheet = ?", (sheet,)).fetchone()
+    if not full and stored is not None and stored[0] == digest:
+        conn.execute("UPDATE sheets SET refreshed_at = ? WHERE sheet = ?", (time.time(), sheet))
+        conn.commit()
+        return 0, False
+
+    conn.execute("DELETE FROM rows WHERE sheet = ?", (sheet,))
+    conn.executemany(
+        "INSERT INTO rows (sheet, row_num, record) VALUES (?, ?, ?)",
+        [(sheet, i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(records, start=1)],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO sheets (sheet, header, rows, refreshed_at, digest) VALUES (?, ?, ?, ?, ?)",
+        (sheet, json.dumps(header), len(records), time.time(), digest),
+    )
+    conn.commit()
+    return len(records), True
+
+
+def refresh(spreadsheet, db_path=None, full=False, sheets=None):
+    # refresh every snapshot sheet (or just `sheets`), returns {sheet: (rows added, reloaded, total)}
+    import gspread
+
+    conn = connect(db_path)
+    result = {}
+    try:
+        for sheet, keep in SNAPSHOT_SHEETS.items():
+            if sheets is not None and sheet not in sheets:
+                continue
+            try:
+                worksheet = spreadsheet.worksheet(sheet)
+            except gspread.exceptions.WorksheetNotFound:
+                print(f"  WARNING: '{sheet}' sheet not found, snapshot copy left as is")
+                continue
+            update = refresh_sheet if sheet in APPEND_ONLY else reload_sheet
+            added, reloaded = update(conn, worksheet, keep, full)
+            result[sheet] = (added, reloaded, _stored(conn, sheet)[1])
+    finally:
+        conn.close()
+    return result
+
+
+def snapshot_info(db_path=None):
+    # {sheet: (rows, refreshed_at)}, empty if there is no snapshot yet
+    db_path = Path(db_path or SNAPSHOT_DB)
+    if not db_path.exists():
+        return {}
+    conn = connect(db_path)
+    try:
+        return {s: (n, t) for s, n, t in conn.execute("SELECT sheet, rows, refreshed_at FROM sheets")}
+    finally:
+        conn.close()
+
+
+def snapshot_records(sheet, db_path=None):
+    # records of one sheet in sheet order
+    return [record for _, record in snapshot_rows(sheet, db_path)]
+
+
+def snapshot_rows(sheet, db_path=None, after=0):
+    # [(row_num, record)] past row `after`, so a long running reader only parses whats new
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT row_num, record FROM rows WHERE sheet = ? AND row_num > ? ORDER BY row_num",
+            (sheet, after),
+        )
+        return [(n, json.loads(r)) for n, r in rows]
+    finally:
+        conn.close()
+
+
+# RECORD SHAPES (same as the live sheet loaders in sampler_script) ===========================
+
+def primary_annotation(r):
+    cats_raw = r.get("categories", "{}")
+    try:
+        categories = json.loads(cats_raw) if isinstance(cats_raw, str) else cats_raw
+    except (json.JSONDecodeError, TypeError):
+        categories = {}
+    return {
+        "passage_id":               str(r.get("passage_id", "")),
+        "timestamp":                str(r.get("timestamp", "")),
+        "explicit_philosophy_flag": r.get("explicit_philosophy_flag", False),
+        "categories":               categories,
+        "notes":                    r.get("notes", ""),
+        "duration_seconds":         r.get("duration_seconds", 0),
+    }
+
+
+def passage_meta(r):
+    pid = str(r.get("id", ""))
+    return {
+        "id":            pid,
+        "source":        r.get("source", "unknown"),
+        "word_count":    int(r.get("word_count") or 0),
+        "score":         r.get("score", 0),
+        "priority":      r.get("priority", ""),
+    }
+
+
+def iaa_pairs(records):
+    # set of (annotator_id, passage_id) for rows whose set starts with iaa
+    return {
+        (str(r["annotator_id"]), str(r["passage_id"]))
+        for r in records
+        if str(r.get("set", "")).startswith("iaa")
+    }
+
+
+# SNAPSHOT LOADERS ===========================
+
+def load_primary_annotations(db_path=None):
+    return [primary_annotation(r) for r in snapshot_records(PRIMARY_SHEET, db_path)]
+
+
+def load_passages_metadata(db_path=None):
+    passages = {}
+    for r in snapshot_records("passages", db_path):
+        meta = passage_meta(r)
+        passages[meta["id"]] = meta
+    return passages
+
+
+def read_iaa_assignments(db_path=None):
+    return iaa_pairs(snapshot_records("assignments", db_path))
+
+
+# LOCAL FILES ===========================
+
+def load_annotation_log(path):
+    # JSON array (storage's local annotation file) or JSONL (one annotation per line)
+    from .resolver import source_for
+
+    return [primary_annotation(r) for _, r in source_for(path).scan()]
+
+
+def load_local_passages_metadata(path=None):
+    # metadata from passages.jsonl / passages.json (test_passages.json if neither), word_count from
+    # the text when convert_passages didnt store one
+    from .passage_index import is_current
+
+    if path is None:
+        indexed = DATA_DIR / "passages.jsonl"
+        path = indexed if is_current(indexed) else DATA_DIR / "passages.json"
+        if not path.exists():
+            path = DATA_DIR / "test_passages.json"
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == ".jsonl":
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    passages = {}
+    for p in records:
+        if not p.get("word_count"):
+            p = dict(p, word_count=len(p.get("text", "").split()))
+        meta = passage_meta(p)
+        passages[meta["id"]] = meta
+    return passages
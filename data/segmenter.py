@@ -0,0 +1,81 @@
+# SENTENCE SEGMENTER ===========================
+# NLTK Punkt + the citation bracket fix ups convert_passages always did, made cheap to call a lot
+# the model is loaded once per process straight from disk (only downloads if it really is missing)
+# and the citation rules are compiled once with a first character check so most sentences skip the regex
+# output must stay identical to the old split_into_sentences, checked over the corpus by
+#   python scripts/bench_segmenter.py --check  (exits 1 on any difference, needs the punkt_tab model:
+#   python -c "import nltk; nltk.download('punkt_tab')")
+
+import re
+
+import nltk
+
+# bump whenever segmentation output changes, convert_passages cache entries then just stop matching
+SPLITTER_VERSION = "1"
+
+# sentence that is nothing but citation brackets eg "[116]" or "[12] [13]"
+_CITATION_ONLY = re.compile(r'[\[\]\d\s]+')
+_CITATION_ONLY_START = frozenset("[]0123456789")
+# citations stuck to the start of the next sentence eg "[116] However ..."
+_LEADING_CITATIONS = re.compile(r'^((?:\[\d+\]\s*)+)(.*)')
+
+_tokenizers = {}  #language -> loaded punkt tokenizer
+
+
+def _load_punkt(language):
+    try:
+        from nltk.tokenize import PunktTokenizer  #nltk >= 3.9, punkt_tab model
+
+        def build():
+            return PunktTokenizer(language)
+        resource = "punkt_tab"
+    except ImportError:
+        def build():
+            return nltk.data.load(f"tokenizers/punkt/{language}.pickle")
+        resource = "punkt"
+
+    try:
+        return build()
+    except LookupError:
+        # only hit the network when the model is not installed yet
+        nltk.download(resource, quiet=True)
+        return build()
+
+
+def get_tokenizer(language="english"):
+    tok = _tokenizers.get(language)
+    if tok is None:
+        tok = _tokenizers[language] = _load_punkt(language)
+    return tok
+
+
+def merge_citations(raw_sentences):
+    # NLTK puts citation brackets at start of next sentence sometimes
+    # eg "[116] However ..." should be "...loneliness.[116]" + "However ..."
+    merged = []
+    for sent in raw_sentences:
+        #if sentence is JUST citation brackets attach to previous
+        if merged:
+            stripped = sent.strip()
+            if stripped and stripped[0] in _CITATION_ONLY_START and _CITATION_ONLY.fullmatch(stripped):
+                merged[-1] = merged[-1] + ' ' + sent
+                continue
+            #check for citations with square brackets in passage like [117]
+            if sent[:1] == '[':
+                match = _LEADING_CITATIONS.match(sent)
+                if match and match.group(2).strip():
+                    merged[-1] = merged[-1] + ' ' + match.group(1).rstrip()
+                    merged.append(match.group(2).strip())
+                    continue
+        merged.append(sent)
+    return merged
+
+
+def split_sentences(text, language="english"):
+    return merge_citations(get_tokenizer(language).tokenize(text))
+
+
+def split_batch(texts, language="english"):
+    # list of texts -> list of sentence lists, tokenizer looked up once for the whole batch
+    tokenize = get_tokenizer(language).tokenize
+    return [merge_citations(tokenize(text)) for text in texts]
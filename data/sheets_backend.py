@@ -2,6 +2,7 @@
 #same interface as local storage but reads/writes to gsheets
 
 import json
+import threading
 import gspread
 from google.oauth2.service_account import Credentials
 from datetime import datetime
@@ -14,6 +15,9 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
+# sheets that arent an annotators log
+SYSTEM_SHEETS = {'passages', 'annotators', 'assignments'}
+
 @st.cache_resource
 def get_sheets_client():
     # init and CACHE gsheets client (cached across reruns)
@@ -185,23 +189,16 @@ def get_completed_passage_ids(annotator_id):
     annotations = load_annotations(annotator_id)
     return {a['passage_id'] for a in annotations}
 
+def list_annotator_ids():
+    # titles of the annotator sheets, every sheet but the system ones
+    _, spreadsheet = get_sheets_client()
+    return [ws.title for ws in spreadsheet.worksheets() if ws.title not in SYSTEM_SHEETS]
+
+
 def load_all_annotations():
     # load annotations from ALL annotators returns {annotator_id: [annotations]}
     try:
-        _, spreadsheet = get_sheets_client()
-
-        worksheets = spreadsheet.worksheets()
-
-        result = {}
-        # skip system sheets
-        system_sheets = {'passages', 'annotators', 'assignments'}
-
-        for ws in worksheets:
-            if ws.title not in system_sheets:
-                result[ws.title] = load_annotations(ws.title)  #annotator sheet
-
-        return result
-
+        return {aid: load_annotations(aid) for aid in list_annotator_ids()}
     except Exception as err:
         print(f"Failed to load all annotations: {err}")
         return {}
@@ -263,16 +260,47 @@ def add_bonus_passages(annotator_id, all_passage_ids, count=10, pool_ids=None):
         available = [pid for pid in all_passage_ids if pid in pool and pid not in current_ids]
         bonus = available[:count]
 
-        #add new assignments to sheet
-        for passage_id in bonus:
-            asgn_sheet.append_row([
-                annotator_id,
-                passage_id,
-                'bonus'
-            ])
+        #add new assignments to sheet in one call
+        if bonus:
+            asgn_sheet.append_rows([[annotator_id, passage_id, 'bonus'] for passage_id in bonus])
 
         return bonus
 
     except Exception as e:
         print(f"CANT ADD bonus passages bc {e}")
         return []
+
+
+# serialises bonus allocation inside this server process so two experts clicking at once
+# cant both be handed the same passage (streamlit runs every session in one process)
+_bonus_lock = threading.Lock()
+
+def allocate_expert_bonus(annotator_id, all_passage_ids, expert_ids, count=5, primary_id="primary_rafuh"):
+    # EXPERT BONUS POOL ===========================
+    # pool = primary's completed passages minus anything already assigned to any expert
+    # one assignments read + one primary log read + one append_rows
+    with _bonus_lock:
+        try:
+            _, spreadsheet = get_sheets_client()
+            asgn_sheet = spreadsheet.worksheet("assignments")
+
+            experts = set(expert_ids) | {annotator_id}
+            taken = {
+                record["passage_id"]
+                for record in asgn_sheet.get_all_records()
+                if record["annotator_id"] in experts
+            }
+            primary_done = get_completed_passage_ids(primary_id)
+
+            bonus = [
+                pid for pid in all_passage_ids
+                if pid in primary_done and pid not in taken
+            ][:count]
+
+            if bonus:
+                asgn_sheet.append_rows([[annotator_id, pid, 'bonus'] for pid in bonus])
+            return bonus
+
+        except Exception as e:
+            print(f"CANT ALLOCATE expert bonus passages bc {e}")
+            return []
@@ -4,6 +4,7 @@
 
 import json
 import os
+import threading
 import time
 from pathlib import Path
 from datetime import datetime
@@ -53,12 +54,36 @@ TEST_ASSIGNMENTS = {
 }
 
 
+_indexed_passages = {}  #(path, index mtime) -> IndexedPassages, shared by all sessions
+
+
+def _load_indexed_passages(data_file):
+    from . import passage_index
+    key = (str(data_file), passage_index.index_path(data_file).stat().st_mtime)
+    passages = _indexed_passages.get(key)
+    if passages is None:
+        _indexed_passages.clear()  #older versions of the file
+        passages = _indexed_passages[key] = passage_index.IndexedPassages(data_file)
+    return passages
+
+
+def passages_meta(passages):
+    # priority/score per passage for ranking, from the index when passages is the lazy mapping
+    return passages.meta() if hasattr(passages, "meta") else passages
+
+
 def load_passages():
     # load all passages from local JSON or gsheets depending on mode
     if STORAGE_MODE == 'sheets':
         from . import sheets_backend
         return sheets_backend.load_passages()
     else:
+        # indexed passages.jsonl from convert_passages, decoded one passage at a time
+        from . import passage_index
+        indexed_file = DATA_DIR / "passages.jsonl"
+        if passage_index.is_current(indexed_file):
+            return _load_indexed_passages(indexed_file)
+
         # local mode - prod passages if available otherwise test
         prod_file = DATA_DIR / "passages.json"
         test_file = DATA_DIR / "test_passages.json"
@@ -104,7 +129,7 @@ def get_assignments(annotator_id):
             # generate on the fly from passages
             all_passages = load_passages()
             passage_ids = list(all_passages.keys())
-            prod_asgn = prod_config.get_production_assignments(passage_ids)
+            prod_asgn = prod_config.get_production_assignments(passage_ids, passages_meta(all_passages))
             if annotator_id in prod_asgn:
                 return prod_asgn[annotator_id]
         except (Exception) as e:
@@ -133,6 +158,20 @@ def load_annotations(annotator_id):
         return []
 
 
+def iter_latest_annotations(annotator_id):
+    # latest annotation per passage (latest wins), streamed, see resolver.py
+    from . import resolver
+    if STORAGE_MODE == 'sheets':
+        from . import sheets_backend
+        source = resolver.ListSource(sheets_backend.load_annotations(annotator_id))
+    else:
+        fpath = get_annotation_file(annotator_id)
+        if not fpath.exists():
+            return iter(())
+        source = resolver.JsonArraySource(fpath)
+    return resolver.resolve(source)
+
+
 def save_annotation(annotator_id: str, annotation: dict) -> bool:
     # APPEND ONLY save - same passage_id kept twice, latest wins at export ===========================
     if STORAGE_MODE == 'sheets':
@@ -163,6 +202,17 @@ def get_completed_passage_ids(annotator_id):
         return {a["passage_id"] for a in annotations}
 
 
+def list_annotator_ids():
+    # every annotator with an annotation log (sheet or local file)
+    if STORAGE_MODE == 'sheets':
+        from . import sheets_backend
+        return sheets_backend.list_annotator_ids()
+    annotations_dir = DATA_DIR / "annotations"
+    if not annotations_dir.exists():
+        return []
+    return sorted(fpath.stem for fpath in annotations_dir.glob("*.json"))
+
+
 def load_all_annotations():
     #Load annotations from ALL annotators, returns {annotator_id: [annotations]}
     if STORAGE_MODE == 'sheets':
@@ -180,16 +230,18 @@ def load_all_annotations():
         return result
 
 
-def add_bonus_passages(annotator_id, passages, count=10):
+def add_bonus_passages(annotator_id, passages, count=10, pool_ids=None):
     # add bonus passage assignments for annotator who wants more
+    # pool_ids restricts to a subset of passages eg primary's completed (for experts)
     if STORAGE_MODE == 'sheets':
         from . import sheets_backend
-        return sheets_backend.add_bonus_passages(annotator_id, passages, count)
+        return sheets_backend.add_bonus_passages(annotator_id, passages, count, pool_ids=pool_ids)
     else:
         current = get_assignments(annotator_id)
         current_ids = {a["passage_id"] for a in current}
 
-        available = [p_id for p_id in passages if p_id not in current_ids]
+        pool = pool_ids if pool_ids is not None else set(passages)
+        available = [p_id for p_id in passages if p_id in pool and p_id not in current_ids]
         bonus = available[:count]
 
         for p_id in bonus:
@@ -197,3 +249,43 @@ def add_bonus_passages(annotator_id, passages, count=10):
                 {"passage_id": p_id, "set": "bonus"}
             )
         return bonus
+
+
+_bonus_lock = threading.Lock()
+
+def allocate_expert_bonus(annotator_id, all_passage_ids, expert_ids, count=5, primary_id="primary_rafuh"):
+    # bonus passages for an expert: primary's completed passages not yet given to ANY expert
+    # computed from one assignments read and one primary log read, locked so two experts
+    # requesting at the same time never get the same passage
+    if STORAGE_MODE == 'sheets':
+        from . import sheets_backend
+        return sheets_backend.allocate_expert_bonus(annotator_id, all_passage_ids, expert_ids, count, primary_id)
+    else:
+        with _bonus_lock:
+            experts = set(expert_ids) | {annotator_id}
+            prod_asgn = {}
+            try:
+                from . import prod_config
+                all_passages = load_passages()
+                prod_asgn = prod_config.get_production_assignments(
+                    list(all_passages.keys()), passages_meta(all_passages)
+                )
+            except Exception as e:
+                print(e)
+            # prod rows and TEST_ASSIGNMENTS both count, bonus rows handed out below live in the
+            # latter even for experts that have prod assignments
+            taken = set()
+            for aid in experts:
+                for a in prod_asgn.get(aid, []) + TEST_ASSIGNMENTS.get(aid, []):
+                    taken.add(a["passage_id"])
+            primary_done = get_completed_passage_ids(primary_id)
+
+            bonus = [
+                pid for pid in all_passage_ids
+                if pid in primary_done and pid not in taken
+            ][:count]
+            for p_id in bonus:
+                TEST_ASSIGNMENTS.setdefault(annotator_id, []).append(
+                    {"passage_id": p_id, "set": "bonus"}
+                )
+            return bonus
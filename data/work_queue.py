@@ -0,0 +1,164 @@
+# LEASE BASED WORK QUEUE ===========================
+# pull mode for passage allocation, annotators lease the next passage(s) instead of
+# only working through a static assignment list
+# leases time out unless renewed (do_save renews), sign out releases them, abandoned tabs just expire
+# backed by a local sqlite file so it only works for a single host deployment
+# switch on with assignment_mode = "queue" in secrets.toml
+
+import sqlite3
+import time
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent
+QUEUE_DB = DATA_DIR / "work_queue.sqlite"
+LEASE_TTL = 30 * 60  # seconds a lease survives without activity
+
+QUEUE_MODE = False
+try:
+    import streamlit as st
+    if hasattr(st, "secrets") and "assignment_mode" in st.secrets:
+        QUEUE_MODE = st.secrets["assignment_mode"] == "queue"
+except(ImportError, Exception):
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    queue        TEXT NOT NULL,
+    passage_id   TEXT NOT NULL,
+    annotator_id TEXT NOT NULL,
+    status       TEXT NOT NULL,   -- leased | done
+    leased_at    REAL NOT NULL,
+    expires_at   REAL,            -- NULL once done
+    PRIMARY KEY (queue, passage_id)
+);
+CREATE INDEX IF NOT EXISTS leases_by_annotator ON leases (queue, annotator_id, status);
+"""
+
+
+def _connect(db_path=None):
+    # autocommit mode so BEGIN IMMEDIATE below is the only transaction boundary
+    conn = sqlite3.connect(str(db_path or QUEUE_DB), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _expire(conn, now):
+    conn.execute(
+        "DELETE FROM leases WHERE status = 'leased' AND expires_at < ?", (now,)
+    )
+
+
+def lease_next(queue, annotator_id, candidate_ids, batch=1, ttl=LEASE_TTL, db_path=None):
+    # atomically lease up to `batch` passages from candidate_ids (in order) that nobody holds
+    # BEGIN IMMEDIATE takes the write lock first so two sessions can never pick the same passage
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _expire(conn, now)
+        taken = {
+            row[0] for row in conn.execute(
+                "SELECT passage_id FROM leases WHERE queue = ?", (queue,)
+            )
+        }
+        leased = []
+        for pid in candidate_ids:
+            if len(leased) >= batch:
+                break
+            if pid not in taken:
+                leased.append(pid)
+        conn.executemany(
+            "INSERT INTO leases VALUES (?, ?, ?, 'leased', ?, ?)",
+            [(queue, pid, annotator_id, now, now + ttl) for pid in leased],
+        )
+        conn.execute("COMMIT")
+        return leased
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def renew(queue, annotator_id, ttl=LEASE_TTL, db_path=None):
+    # push back expiry on everything this annotator still has leased, returns count renewed
+    conn = _connect(db_path)
+    try:
+        cur = conn.execute(
+            "UPDATE leases SET expires_at = ? "
+            "WHERE queue = ? AND annotator_id = ? AND status = 'leased'",
+            (time.time() + ttl, queue, annotator_id),
+        )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def complete(queue, annotator_id, passage_id, db_path=None):
+    # mark passage done, works whether or not the lease expired in the meantime
+    # if someone else has since leased it their lease is left alone
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT annotator_id, status FROM leases WHERE queue = ? AND passage_id = ?",
+            (queue, passage_id),
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?, 'done', ?, NULL)",
+                (queue, passage_id, annotator_id, now),
+            )
+        elif row[0] == annotator_id and row[1] == "leased":
+            conn.execute(
+                "UPDATE leases SET status = 'done', expires_at = NULL "
+                "WHERE queue = ? AND passage_id = ?",
+                (queue, passage_id),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def release(queue, annotator_id, passage_ids=None, db_path=None):
+    # give back unfinished leases (all of them if passage_ids is None)
+    conn = _connect(db_path)
+    try:
+        if passage_ids is None:
+            cur = conn.execute(
+                "DELETE FROM leases WHERE queue = ? AND annotator_id = ? AND status = 'leased'",
+                (queue, annotator_id),
+            )
+        else:
+            cur = conn.executemany(
+                "DELETE FROM leases WHERE queue = ? AND annotator_id = ? "
+                "AND passage_id = ? AND status = 'leased'",
+                [(queue, annotator_id, pid) for pid in passage_ids],
+            )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def annotator_passages(queue, annotator_id, db_path=None):
+    # passages this annotator currently holds or finished through the queue, in lease order
+    # used at login to put queued work back into the session's assignment list
+    conn = _connect(db_path)
+    try:
+        _expire(conn, time.time())
+        return [
+            row[0] for row in conn.execute(
+                "SELECT passage_id FROM leases WHERE queue = ? AND annotator_id = ? "
+                "ORDER BY leased_at, rowid",
+                (queue, annotator_id),
+            )
+        ]
+    finally:
+        conn.close()
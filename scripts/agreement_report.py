@@ -0,0 +1,80 @@
+#inter-annotator agreement report over every annotators saved annotations (local files or sheets,
+# whatever STORAGE_MODE the app uses)
+#python scripts/agreement_report.py  (--annotators primary_rafuh Chris_005 --json report.json)
+# per category: Fleiss' kappa, Krippendorff's alpha, pooled evidence F1 and how many passages had
+# 2+ annotators, then Cohen's kappa / evidence F1 for every pair that shares passages
+# Test_001 is left out unless --include-test, it only mirrors another experts passages
+import argparse
+import json
+import sys
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.agreement import AgreementTable
+from data.storage import load_all_annotations
+
+TEST_ANNOTATOR = "Test_001"
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_report(report, min_units):
+    print(f"{len(report['annotators'])} annotators, {report['passages']} passages")
+
+    group = report["group"]
+    print(f"\n  {'category':<40} {'units':>6} {'fleiss':>8} {'alpha':>8} {'ev f1':>8}")
+    for cat, units in group["units"].items():
+        if units < min_units:
+            continue
+        print(f"  {cat:<40} {units:>6} {fmt(group['fleiss'][cat]):>8} "
+              f"{fmt(group['krippendorff'][cat]):>8} {fmt(group['evidence_f1'][cat]):>8}")
+
+    for pair, stats in report["pairs"].items():
+        a, b = pair.split("|")
+        print(f"\n  {a} vs {b} ({stats['passages']} shared passages)")
+        print(f"    {'category':<38} {'kappa':>8} {'ev f1':>8}")
+        for cat, kappa in stats["cohen"].items():
+            f1 = stats["evidence_f1"][cat]
+            if kappa is None and f1 is None:
+                continue
+            print(f"    {cat:<38} {fmt(kappa):>8} {fmt(f1):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inter-annotator agreement per category")
+    parser.add_argument("--annotators", nargs="+", default=None, help="only these annotators (default: all)")
+    parser.add_argument("--include-test", action="store_true", help=f"keep {TEST_ANNOTATOR} in")
+    parser.add_argument("--min-units", type=int, default=1,
+                        help="hide categories with fewer multiply annotated passages than this")
+    parser.add_argument("--json", type=Path, default=None, help="also write the full report as JSON")
+    args = parser.parse_args()
+
+    all_annotations = load_all_annotations()
+    if args.annotators:
+        missing = [a for a in args.annotators if a not in all_annotations]
+        if missing:
+            print(f"ERROR: no annotations for {', '.join(missing)}")
+            sys.exit(1)
+        all_annotations = {a: all_annotations[a] for a in args.annotators}
+    exclude = () if args.include_test else (TEST_ANNOTATOR,)
+
+    table = AgreementTable.from_annotations(all_annotations, exclude=exclude)
+    if len(table.annotators) < 2:
+        print("ERROR: need annotations from at least 2 annotators")
+        sys.exit(1)
+    report = table.report()
+    print_report(report, args.min_units)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#benchmark + identical output check for the indexed IAA sampler core in sampler_script.py
+# builds synthetic primary annotation pools, runs the original (pre index) sampler and the current one
+# and compares their output byte for byte, then times the current one on bigger pools on its own
+# feature extraction is checked too: per dict extract_features vs the columnar FeatureMatrix
+#python scripts/bench_sampler.py  (--sizes 1000 10000 100000 --reference-max 20000 --seed 7)
+# exits 1 if outputs ever differ, so it can gate changes to the sampler
+import argparse
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+import sampler_script as sampler
+from data.common import EXCLUSION_IDS, is_annotation_complete
+from data.features import FeatureMatrix
+
+ALL_DOMAINS = sampler.ALL_DOMAINS
+ALL_CATEGORIES = sampler.ALL_CATEGORIES
+OVERLAP_COUNT = sampler.OVERLAP_COUNT
+TARGET_BINS = sampler.TARGET_BINS
+
+
+# REFERENCE (original sampler, kept verbatim as the golden output) ===========================
+
+def reference_sample_overlap(features_list, existing_overlap_ids, seed):
+    candidates = [
+        f for f in features_list
+        if f["passage_id"] not in existing_overlap_ids
+        and f["ann_type"] != "exclusion"
+    ]
+
+    overlap = []
+    covered_domains = set()
+
+    for domain in sorted(ALL_DOMAINS):
+        dom_cands = [
+            f for f in candidates
+            if domain in f["domains_present"]
+            and f["passage_id"] not in {o["passage_id"] for o in overlap}
+        ]
+        if dom_cands:
+            chosen = dom_cands[0]
+            overlap.append(chosen)
+            covered_domains |= chosen["domains_present"]
+            if len(overlap) >= OVERLAP_COUNT:
+                break
+
+    rest = [
+        f for f in candidates
+        if f["passage_id"] not in {o["passage_id"] for o in overlap}
+    ]
+    for f in rest:
+        if len(overlap) >= OVERLAP_COUNT:
+            break
+        overlap.append(f)
+
+    return [f["passage_id"] for f in overlap]
+
+
+def reference_sample_for_experts(features_list, expert_ids, existing_assignments, overlap_ids,
+                                 per_expert=25, seed=42):
+    unique_per_expert = per_expert - len(overlap_ids)
+    feat_by_pid = {f["passage_id"]: f for f in features_list}
+
+    overlap_set = set(overlap_ids)
+
+    claimed_unique = set()
+
+    result = {}
+
+    for expert_id in expert_ids:
+        already_assigned = {pid for (aid, pid) in existing_assignments if aid == expert_id}
+
+        available = [
+            f for f in features_list
+            if f["passage_id"] not in overlap_set
+            and f["passage_id"] not in claimed_unique
+            and f["passage_id"] not in already_assigned
+        ]
+
+        bins = defaultdict(list)
+        for f in available:
+            key = (f["ann_type"], f["wc_tertile"])
+            bins[key].append(f)
+
+        selection = []
+        for bin_key, target in sorted(TARGET_BINS.items(), key=lambda x: -x[1]):
+            candidates = bins.get(bin_key, [])
+            selected_pids = {f["passage_id"] for f in selection}
+            candidates = [f for f in candidates if f["passage_id"] not in selected_pids]
+            for f in candidates[:target]:
+                selection.append(f)
+
+        selected_pids = {f["passage_id"] for f in selection}
+        covered_domains = set()
+        for f in selection:
+            covered_domains |= f["domains_present"]
+        for pid in overlap_ids:
+            if pid in feat_by_pid:
+                covered_domains |= feat_by_pid[pid]["domains_present"]
+
+        missing_domains = ALL_DOMAINS - covered_domains
+        for domain in sorted(missing_domains):
+            dom_cands = [
+                f for f in available
+                if domain in f["domains_present"]
+                and f["passage_id"] not in selected_pids
+            ]
+            if dom_cands:
+                chosen = dom_cands[0]
+                selection.append(chosen)
+                selected_pids.add(chosen["passage_id"])
+                covered_domains |= chosen["domains_present"]
+
+        if len(selection) < unique_per_expert:
+            covered_cats = set()
+            for f in selection:
+                covered_cats |= f["category_ids"]
+            for pid in overlap_ids:
+                if pid in feat_by_pid:
+                    covered_cats |= feat_by_pid[pid]["category_ids"]
+
+            cat_counts = {
+                cat: sum(1 for f in features_list if cat in f["category_ids"])
+                for cat in ALL_CATEGORIES - covered_cats
+            }
+            for cat in sorted(cat_counts, key=lambda c: cat_counts[c]):
+                if len(selection) >= unique_per_expert:
+                    break
+                cat_candidates = [
+                    f for f in available
+                    if cat in f["category_ids"]
+                    and f["passage_id"] not in selected_pids
+                ]
+                if cat_candidates:
+                    chosen = cat_candidates[0]
+                    selection.append(chosen)
+                    selected_pids.add(chosen["passage_id"])
+
+        source_cap = max(1, int(unique_per_expert * 0.40))
+        while len(selection) < unique_per_expert:
+            source_counts = defaultdict(int)
+            for f in selection:
+                source_counts[f["source"]] += 1
+
+            remaining = [
+                f for f in available
+                if f["passage_id"] not in {sf["passage_id"] for sf in selection}
+            ]
+            capped = [f for f in remaining if source_counts[f["source"]] < source_cap]
+            candidates = capped if capped else remaining
+            if not candidates:
+                break
+            selection.append(candidates[0])
+
+        if len(selection) > unique_per_expert:
+            selection.sort(key=lambda f: -f["_priority"])
+            trimmed = selection[:unique_per_expert]
+            trimmed_domains = set()
+            for f in trimmed:
+                trimmed_domains |= f["domains_present"]
+            trimmed_domains |= covered_domains
+            if trimmed_domains < ALL_DOMAINS:
+                for f in selection[unique_per_expert:]:
+                    if f["domains_present"] - trimmed_domains:
+                        trimmed.append(f)
+                        trimmed_domains |= f["domains_present"]
+                        if trimmed_domains >= ALL_DOMAINS:
+                            break
+            selection = trimmed
+
+        unique_pids = [f["passage_id"] for f in selection]
+        claimed_unique.update(unique_pids)
+        result[expert_id] = overlap_ids + unique_pids
+
+    return result
+
+
+def reference_existing_overlap(existing_assignments, expert_ids):
+    expert_assignment_sets = {
+        eid: {pid for (aid, pid) in existing_assignments if aid == eid}
+        for eid in expert_ids
+    }
+    return set.intersection(*expert_assignment_sets.values()) if expert_assignment_sets else set()
+
+
+# SYNTHETIC POOL ===========================
+
+def synthetic_pool(n, expert_ids, seed, existing_frac=0.01, sources=40):
+    # n completed primary annotations (plus some superseded edits), passage metadata and a few
+    # existing iaa rows, run through the same feature pipeline as sampler_script.main
+    rng = random.Random(seed)
+    phil = sorted(ALL_CATEGORIES)
+    excl = sorted(EXCLUSION_IDS)
+    records = []
+    meta = {}
+    for i in range(n):
+        pid = f"P{i:07d}"
+        if rng.random() < 0.12:
+            cats = {rng.choice(excl): {}}
+        else:
+            # skewed so some categories are rare, which exercises the rare category pass
+            k = rng.choice([1, 1, 1, 2, 2, 3])
+            chosen = set()
+            while len(chosen) < k:
+                chosen.add(phil[min(len(phil) - 1, int(rng.expovariate(0.35)))])
+            cats = {
+                c: {"evidence": [0], "confidence": rng.choice(["high", "high", "medium", "low"])}
+                for c in chosen
+            }
+        ts = f"2025-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00"
+        records.append({"passage_id": pid, "timestamp": ts, "categories": cats})
+        if rng.random() < 0.05:
+            records.append({"passage_id": pid, "timestamp": "2024-12-31T00:00:00", "categories": {}})
+        meta[pid] = {
+            "id": pid,
+            "source": f"source_{min(sources - 1, int(rng.expovariate(0.15)))}",
+            "word_count": rng.randint(40, 400),
+            "score": rng.randint(0, 12),
+            "priority": rng.choice(["HIGH", "MEDIUM", "LOW"]),
+        }
+    rng.shuffle(records)
+
+    latest = sampler.resolve_latest(records)
+    eligible = {pid: rec for pid, rec in latest.items() if is_annotation_complete(rec)}
+
+    pids = sorted(eligible)
+    existing = set()
+    shared = rng.sample(pids, min(len(pids), 3))  #some overlap already handed to everyone
+    for eid in expert_ids:
+        for pid in shared:
+            existing.add((eid, pid))
+        for pid in rng.sample(pids, int(len(pids) * existing_frac)):
+            existing.add((eid, pid))
+    return eligible, meta, existing
+
+
+def dict_features(eligible, meta):
+    # the per dict pipeline sampler_script.main used before FeatureMatrix
+    features_list = [sampler.extract_features(rec, meta.get(pid, {})) for pid, rec in eligible.items()]
+    sampler.assign_wc_tertiles(features_list)
+    for f in features_list:
+        f["_priority"] = sampler.compute_priority_score(f)
+    features_list.sort(key=lambda f: (-f["_priority"], f["passage_id"]))
+    return features_list
+
+
+def matrix_features(eligible, meta):
+    # what sampler_script.main does now
+    matrix = FeatureMatrix.from_records(eligible.items(), meta)
+    matrix.assign_tertiles()
+    matrix.compute_priority()
+    matrix = matrix.take(matrix.priority_order())
+    return matrix.to_features(), matrix
+
+
+def run(features_list, existing, expert_ids, per_expert, seed, impl, matrix=None):
+    if impl == "reference":
+        existing_olap = reference_existing_overlap(existing, expert_ids)
+        overlap_fn, experts_fn = reference_sample_overlap, reference_sample_for_experts
+    else:
+        assigned_sets = sampler.expert_assignment_sets(existing, expert_ids)
+        existing_olap = set.intersection(*assigned_sets.values()) if assigned_sets else set()
+        overlap_fn, experts_fn = sampler.sample_overlap, sampler.sample_for_experts
+
+    # sorted so the set order of existing_olap cant make the two sides differ
+    existing_olap = sorted(existing_olap)
+    if len(existing_olap) >= OVERLAP_COUNT:
+        overlap_ids = existing_olap[:OVERLAP_COUNT]
+    else:
+        overlap_ids = (existing_olap + overlap_fn(features_list, set(existing_olap), seed))[:OVERLAP_COUNT]
+    if impl == "reference":
+        assignments = experts_fn(features_list, expert_ids, existing, overlap_ids, per_expert, seed)
+    else:
+        assignments = experts_fn(features_list, expert_ids, existing, overlap_ids, per_expert, seed,
+                                 matrix=matrix)
+    return json.dumps({"overlap": overlap_ids, "assignments": assignments}, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IAA sampler against the original implementation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="pool sizes (completed annotations)")
+    parser.add_argument("--reference-max", type=int, default=20000,
+                        help="largest pool the slow original is run on")
+    parser.add_argument("--experts", type=int, default=5)
+    parser.add_argument("--per-expert", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    expert_ids = [f"expert_{i:02d}" for i in range(args.experts)]
+    failures = 0
+
+    print(f"{'pool':>8} {'dict feats':>11} {'columnar':>10} {'reference':>11} {'indexed':>10} {'speedup':>8}  output")
+    for size in args.sizes:
+        eligible, meta, existing = synthetic_pool(size, expert_ids, args.seed)
+
+        start = time.perf_counter()
+        features_list, matrix = matrix_features(eligible, meta)
+        col_time = time.perf_counter() - start
+        start = time.perf_counter()
+        expected_features = dict_features(eligible, meta)
+        dict_time = time.perf_counter() - start
+        same_features = expected_features == features_list
+
+        start = time.perf_counter()
+        indexed = run(features_list, existing, expert_ids, args.per_expert, args.seed, "indexed", matrix)
+        new_time = time.perf_counter() - start
+
+        if size <= args.reference_max:
+            start = time.perf_counter()
+            expected = run(expected_features, existing, expert_ids, args.per_expert, args.seed, "reference")
+            ref_time = time.perf_counter() - start
+            same = expected == indexed and same_features
+            ref_col = f"{ref_time:>10.3f}s"
+            speedup = f"{ref_time / max(new_time, 1e-9):>7.1f}x"
+        else:
+            same = same_features
+            ref_col, speedup = f"{'-':>11}", f"{'-':>8}"
+        failures += not same
+        label = "identical" if same else ("FEATURES DIFFER" if not same_features else "DIFFERENT")
+        if size > args.reference_max and same:
+            label += " (features only)"
+        print(f"{len(features_list):>8} {dict_time:>10.3f}s {col_time:>9.3f}s {ref_col} {new_time:>9.3f}s "
+              f"{speedup}  {label}")
+
+    if failures:
+        print(f"\nFAILED: {failures} pool(s) sampled differently")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
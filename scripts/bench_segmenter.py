@@ -0,0 +1,141 @@
+#benchmark + golden check for data/segmenter.py against the original convert_passages splitter
+# runs both over the real corpus, every passage has to come out with exactly the same sentences
+#python scripts/bench_segmenter.py  (--limit 5000 --batch-size 256 --repeat 3)
+#python scripts/bench_segmenter.py --check  (golden check only, one untimed pass, no benchmark)
+# exits 1 if any passage segments differently, so it can gate changes to the segmenter
+# needs the punkt_tab model installed: python -c "import nltk; nltk.download('punkt_tab')"
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import nltk
+
+from data import segmenter
+
+DEFAULT_INPUT = ROOT / "data" / "annotations" / "filtered_passages_deduplicated.jsonl"
+
+
+def reference_split(text):
+    # split_into_sentences exactly as convert_passages had it, kept here as the golden reference
+    return reference_merge(nltk.tokenize.sent_tokenize(text))
+
+
+def reference_merge(raw_sentences):
+    merged = []
+    for sent in raw_sentences:
+        if merged and re.fullmatch(r'[\[\]\d\s]+', sent.strip()):
+            merged[-1] = merged[-1] + ' ' + sent
+        else:
+            match = re.match(r'^((?:\[\d+\]\s*)+)(.*)', sent)
+            if match and merged and match.group(2).strip():
+                citations = match.group(1).rstrip()
+                remainder = match.group(2).strip()
+                merged[-1] = merged[-1] + ' ' + citations
+                merged.append(remainder)
+            else:
+                merged.append(sent)
+
+    return merged
+
+
+def load_texts(path, limit=None):
+    texts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                texts.append(json.loads(line)['text'])
+            except (json.JSONDecodeError, KeyError):
+                continue  #convert_passages reports these, nothing to segment
+            if limit and len(texts) >= limit:
+                break
+    return texts
+
+
+def time_best(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and golden check the sentence segmenter")
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--limit", type=int, default=None, help="only the first N passages")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs, best one is reported")
+    parser.add_argument("--check", action="store_true", help="golden check only, skip the benchmark")
+    args = parser.parse_args()
+    if args.check:
+        args.repeat = 1
+
+    texts = load_texts(args.input, args.limit)
+    if not texts:
+        print(f"No passages found in {args.input}")
+        sys.exit(1)
+    print(f"Loaded {len(texts)} passages from {args.input}")
+
+    # model loading is timed on its own, both sides share the loaded model afterwards
+    start = time.perf_counter()
+    try:
+        segmenter.get_tokenizer()
+    except LookupError:
+        print("ERROR: punkt_tab model not installed, run: python -c \"import nltk; nltk.download('punkt_tab')\"")
+        sys.exit(1)
+    load_time = time.perf_counter() - start
+    nltk.tokenize.sent_tokenize(texts[0])  #warm the reference path too
+
+    def run_reference():
+        return [reference_split(t) for t in texts]
+
+    def run_segmenter():
+        out = []
+        for i in range(0, len(texts), args.batch_size):
+            out.extend(segmenter.split_batch(texts[i:i + args.batch_size]))
+        return out
+
+    ref_time, expected = time_best(run_reference, args.repeat)
+    new_time, actual = time_best(run_segmenter, args.repeat)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+    sentences = sum(len(s) for s in expected)
+
+    if not args.check:
+        # the citation pass on its own, punkt time is the same on both sides so it hides this in the totals
+        raw = [nltk.tokenize.sent_tokenize(t) for t in texts]
+        ref_merge_time, _ = time_best(lambda: [reference_merge(r) for r in raw], args.repeat)
+        new_merge_time, _ = time_best(lambda: [segmenter.merge_citations(r) for r in raw], args.repeat)
+
+        print(f"\nModel load:  {load_time * 1000:.0f} ms")
+        print(f"Reference:   {ref_time:.2f}s ({len(texts) / ref_time:.0f} passages/s)")
+        print(f"Segmenter:   {new_time:.2f}s ({len(texts) / new_time:.0f} passages/s)")
+        print(f"Speedup:     {ref_time / new_time:.2f}x")
+        print(f"Citation pass: {ref_merge_time * 1000:.0f} ms -> {new_merge_time * 1000:.0f} ms "
+              f"({ref_merge_time / max(new_merge_time, 1e-9):.1f}x)")
+    print(f"Sentences:   {sentences}")
+
+    if mismatches:
+        print(f"\nFAILED: {len(mismatches)} passage(s) segment differently")
+        for i in mismatches[:5]:
+            print(f"  - passage {i}:")
+            print(f"      expected {expected[i][:3]}...")
+            print(f"      got      {actual[i][:3]}...")
+        sys.exit(1)
+    print(f"\nOK: all {len(texts)} passages identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#runtime + peak memory of every sampler stage at 1k..1M passages, on synth_data.py logs
+# stages: resolve_latest -> complete filter -> extract_features (per dict) / FeatureMatrix ->
+# sample_overlap -> sample_for_experts, same calls sampler_script.main makes
+#python scripts/bench_suite.py  (--sizes 1000 10000 100000 1000000 --repeat 3)
+# --save bench.json keeps the numbers, --baseline bench.json compares against them and exits 1 if a
+# stage got slower/bigger than --tolerance allows, so it can run before merging sampler changes
+# peak memory is tracemalloc (python allocations above what was live when the stage started),
+# measured in a separate untimed run since tracing slows everything down
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+import sampler_script as sampler
+import synth_data
+from data.common import is_annotation_complete
+
+NOISE_FLOOR_S = 0.05  # stages faster than this arent compared, timer noise
+NOISE_FLOOR_MB = 1.0
+
+
+def load_inputs(n, seed, data_dir=None):
+    # generated in memory unless synth_data.py output for this size is in data_dir
+    if data_dir is not None and (data_dir / f"primary_rafuh_{n}.jsonl").exists():
+        with open(data_dir / f"primary_rafuh_{n}.jsonl", 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        with open(data_dir / f"passages_{n}.jsonl", 'r', encoding='utf-8') as f:
+            meta = {p["id"]: p for p in map(json.loads, f)}
+        return records, meta
+    return list(synth_data.annotation_log(n, seed)), {p["id"]: p for p in synth_data.passage_metadata(n, seed)}
+
+
+def stages(records, meta, expert_ids, per_expert, seed):
+    # [(name, fn)], each fn takes the previous stages outputs from `out` and adds its own
+    def resolve(out):
+        out["latest"] = sampler.resolve_latest(records)
+
+    def complete(out):
+        out["eligible"] = {pid: rec for pid, rec in out["latest"].items() if is_annotation_complete(rec)}
+
+    def dict_features(out):
+        feats = [sampler.extract_features(rec, meta.get(pid, {})) for pid, rec in out["eligible"].items()]
+        sampler.assign_wc_tertiles(feats)
+        for f in feats:
+            f["_priority"] = sampler.compute_priority_score(f)
+        feats.sort(key=lambda f: (-f["_priority"], f["passage_id"]))
+
+    def matrix_features(out):
+        out["matrix"], out["features"] = sampler.build_pool(out["eligible"], meta)
+
+    def overlap(out):
+        out["overlap"] = sampler.sample_overlap(out["features"], set(), seed)
+
+    def experts(out):
+        sampler.sample_for_experts(out["features"], expert_ids, set(), out["overlap"], per_expert, seed,
+                                   matrix=out["matrix"])
+
+    return [
+        ("resolve_latest", resolve),
+        ("complete_filter", complete),
+        ("extract_features", dict_features),
+        ("feature_matrix", matrix_features),
+        ("sample_overlap", overlap),
+        ("sample_for_experts", experts),
+    ]
+
+
+def measure(n, args, expert_ids):
+    records, meta = load_inputs(n, args.seed, args.data)
+    result = {"saves": len(records)}
+    steps = stages(records, meta, expert_ids, args.per_expert, args.seed)
+
+    # timing, best of --repeat, every repeat reruns the whole chain so inputs are the same
+    best = {}
+    for _ in range(args.repeat):
+        out = {}
+        for name, fn in steps:
+            start = time.perf_counter()
+            fn(out)
+            elapsed = time.perf_counter() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    result["pool"] = len(out["eligible"])
+
+    peaks = {}
+    if not args.no_memory:
+        out = {}
+        tracemalloc.start()
+        for name, fn in steps:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(out)
+            peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+        tracemalloc.stop()
+        del out
+
+    result["stages"] = {name: {"seconds": best[name], "peak_mb": peaks.get(name)} for name, _ in steps}
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # [(size, stage, what, was, now)] for every stage over tolerance
+    regressions = []
+    for size, res in results.items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        for stage, now in res["stages"].items():
+            was = base["stages"].get(stage)
+            if not was:
+                continue
+            if now["seconds"] > NOISE_FLOOR_S and now["seconds"] > was["seconds"] * (1 + tolerance):
+                regressions.append((size, stage, "time", f"{was['seconds']:.3f}s", f"{now['seconds']:.3f}s"))
+            if (now["peak_mb"] is not None and was.get("peak_mb") is not None
+                    and now["peak_mb"] > NOISE_FLOOR_MB and now["peak_mb"] > was["peak_mb"] * (1 + tolerance)):
+                regressions.append((size, stage, "memory", f"{was['peak_mb']:.1f}MB", f"{now['peak_mb']:.1f}MB"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sampler runtime and peak memory across pool sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="annotated passages (1000000 works too, needs a few GB of RAM)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs, best one is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--experts", type=int, default=5)
+    parser.add_argument("--per-expert", type=int, default=25)
+    parser.add_argument("--data", type=Path, default=None,
+                        help="read synth_data.py output from here instead of generating in memory")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--save", type=Path, default=None, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown/growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    expert_ids = [f"expert_{i:02d}" for i in range(args.experts)]
+    results = {}
+    for n in args.sizes:
+        print(f"\n== {n} passages ==")
+        res = results[str(n)] = measure(n, args, expert_ids)
+        print(f"  {res['saves']} saves, {res['pool']} complete")
+        print(f"  {'stage':<20} {'time':>10} {'peak mem':>10}")
+        for stage, m in res["stages"].items():
+            mem = "-" if m["peak_mb"] is None else f"{m['peak_mb']:.1f}MB"
+            print(f"  {stage:<20} {m['seconds']:>9.3f}s {mem:>10}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nFAILED: {len(regressions)} regression(s) over {args.tolerance:.0%}")
+            for size, stage, what, was, now in regressions:
+                print(f"  - {size} {stage} {what}: {was} -> {now}")
+            sys.exit(1)
+        print(f"\nOK: no regressions over {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#builds a sentence level multi-label dataset from the resolved annotations, for training a classifier
+# every sentence of every passage someone completed becomes one example:
+#   text + context window (--context sentences either side), the categories annotators picked the
+#   sentence as evidence for, per category vote count and confidence weight (mean over the passages
+#   annotators of high 1.0 / medium 0.7 / low 0.4, 0 for annotators who didnt pick it) so
+#   a sentence only one of three low confidence annotators picked is a weak positive
+# sentences nobody picked are negatives (labels empty), passage_labels keeps the passage level
+# categories incl the exclusions
+# train/dev/test is decided per passage from a hash of its id, so every sentence of a passage lands
+# in the same split and a passage keeps its split across rebuilds and as the data grows
+#python scripts/build_dataset.py  (--out data/dataset --format jsonl|arrow --context 2 --split 0.8 0.1 0.1)
+# writes <out>/<split>/shard-00000.<jsonl|arrow> + manifest.json, example order is passage id then
+# sentence so the same inputs always give byte identical shards whatever --workers is
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from convert_passages import bounded_map
+from data import resolver, storage
+from data.common import is_annotation_complete
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_OUT = ROOT / "data" / "dataset"
+TEST_ANNOTATOR = "Test_001"
+SPLITS = ("train", "dev", "test")
+CONFIDENCE_WEIGHTS = {"high": 1.0, "medium": 0.7, "low": 0.4}
+CHUNK_SIZE = 256  # passages per pool task
+SHARD_SIZE = 50_000  # examples per shard file
+
+
+# LABELS ===========================
+
+def collect_labels(sources, skip=()):
+    # {passage_id: [{category: (confidence, evidence)} per annotator]} from complete latest annotations
+    # only the label data is kept, the records themselves are streamed past
+    labels = {}
+    counts = {}
+    for annotator_id, records in sources:
+        if annotator_id in skip:
+            continue
+        n = 0
+        for record in records:
+            if not is_annotation_complete(record):
+                continue
+            labels.setdefault(str(record["passage_id"]), []).append({
+                cat_id: ((cat_data or {}).get("confidence"),
+                         tuple(int(s) for s in (cat_data or {}).get("evidence") or []))
+                for cat_id, cat_data in record["categories"].items()
+            })
+            n += 1
+        counts[annotator_id] = n
+    return labels, counts
+
+
+def split_for(passage_id, fractions, seed):
+    # deterministic train/dev/test pick from the passage id alone
+    digest = hashlib.sha256(f"{seed}:{passage_id}".encode("utf-8")).hexdigest()
+    point = int(digest[:15], 16) / 16 ** 15
+    edge = 0.0
+    for name, fraction in zip(SPLITS, fractions):
+        edge += fraction
+        if point < edge:
+            return name
+    return SPLITS[-1]
+
+
+# EXAMPLES (runs in the pool) ===========================
+
+def passage_examples(passage, annotations, context, split):
+    # one example per sentence, returns (examples, evidence indices past the last sentence)
+    sentences = passage.get("sentences") or []
+    raters = len(annotations)
+    votes = [{} for _ in sentences]
+    weights = [{} for _ in sentences]
+    passage_labels = set()
+    out_of_range = 0
+    for cats in annotations:
+        for cat_id, (confidence, evidence) in cats.items():
+            passage_labels.add(cat_id)
+            weight = CONFIDENCE_WEIGHTS.get(confidence, 0.0)
+            for s in set(evidence):
+                if not 0 <= s < len(sentences):
+                    out_of_range += 1
+                    continue
+                votes[s][cat_id] = votes[s].get(cat_id, 0) + 1
+                weights[s][cat_id] = weights[s].get(cat_id, 0.0) + weight
+
+    pid = str(passage["id"])
+    passage_labels = sorted(passage_labels)
+    examples = []
+    for i, text in enumerate(sentences):
+        labels = sorted(votes[i])
+        examples.append({
+            "id":             f"{pid}:{i}",
+            "passage_id":     pid,
+            "sentence_index": i,
+            "num_sentences":  len(sentences),
+            "text":           text,
+            "context_before": sentences[max(0, i - context):i],
+            "context_after":  sentences[i + 1:i + 1 + context],
+            "labels":         labels,
+            "weights":        [round(weights[i][c] / raters, 4) for c in labels],
+            "votes":          [votes[i][c] for c in labels],
+            "annotators":     raters,
+            "passage_labels": passage_labels,
+            "source":         passage.get("source") or "",
+            "split":          split,
+        })
+    return examples, out_of_range
+
+
+def build_chunk(job):
+    # [(passage, annotations, split)] -> ([examples], out of range evidence count)
+    chunk, context = job
+    examples = []
+    out_of_range = 0
+    for passage, annotations, split in chunk:
+        ex, bad = passage_examples(passage, annotations, context, split)
+        examples.extend(ex)
+        out_of_range += bad
+    return examples, out_of_range
+
+
+# SHARDED OUTPUT ===========================
+
+def arrow_schema():
+    return pa.schema([
+        ("id",             pa.string()),
+        ("passage_id",     pa.string()),
+        ("sentence_index", pa.int32()),
+        ("num_sentences",  pa.int32()),
+        ("text",           pa.string()),
+        ("context_before", pa.list_(pa.string())),
+        ("context_after",  pa.list_(pa.string())),
+        ("labels",         pa.list_(pa.string())),
+        ("weights",        pa.list_(pa.float32())),
+        ("votes",          pa.list_(pa.int32())),
+        ("annotators",     pa.int32()),
+        ("passage_labels", pa.list_(pa.string())),
+        ("source",         pa.string()),
+        ("split",          pa.string()),
+    ])
+
+
+class ShardWriter:
+    # one split's shard-NNNNN files, a new shard every shard_size examples
+    # jsonl is written as it comes, arrow buffers a shard and writes it as one IPC file
+    def __init__(self, directory, fmt, shard_size):
+        self.directory = directory
+        self.fmt = fmt
+        self.shard_size = shard_size
+        self.count = 0
+        self.shards = 0
+        self._file = None
+        self._buffer = []
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self):
+        return self.directory / f"shard-{self.shards - 1:05d}.{self.fmt}"
+
+    def write(self, example):
+        if self.count % self.shard_size == 0:
+            self._flush()
+            self.shards += 1
+            if self.fmt == "jsonl":
+                self._file = open(self._path(), 'w', encoding='utf-8')
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps(example, ensure_ascii=False) + "\n")
+        else:
+            self._buffer.append(example)
+        self.count += 1
+
+    def _flush(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._buffer:
+            schema = arrow_schema()
+            with pa.OSFile(str(self._path()), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(pa.Table.from_pylist(self._buffer, schema=schema))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+
+
+# INPUTS ===========================
+
+def annotation_sources(args):
+    # [(annotator_id, resolved records)] from --logs or the storage backend, lazily
+    if args.logs:
+        for path in args.logs:
+            yield path.name.split(".")[0], resolver.resolve(resolver.source_for(path))
+        return
+    ids = storage.list_annotator_ids()
+    if args.annotators:
+        ids = [a for a in ids if a in args.annotators]
+    for annotator_id in ids:
+        yield annotator_id, storage.iter_latest_annotations(annotator_id)
+
+
+def load_passages(path=None):
+    # {id: passage} mapping with sentences, storage's (lazily decoded locally) unless a file is given
+    if path is None:
+        return storage.load_passages()
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == ".jsonl":
+            records = (json.loads(line) for line in f if line.strip())
+            return {str(p["id"]): p for p in records}
+        return {str(p["id"]): p for p in json.load(f)}
+
+
+def passage_jobs(labels, passages, args, missing):
+    # (chunk, context) jobs in passage id order, passages are looked up a chunk at a time
+    pids = iter(sorted(labels))
+    while True:
+        batch = list(islice(pids, args.chunk_size))
+        if not batch:
+            return
+        chunk = []
+        for pid in batch:
+            passage = passages.get(pid)
+            if passage is None or not passage.get("sentences"):
+                missing.append(pid)
+                continue
+            chunk.append((passage, labels[pid], split_for(pid, args.split, args.split_seed)))
+        if chunk:
+            yield chunk, args.context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a sentence level multi-label dataset from the annotations")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    parser.add_argument("--format", choices=("jsonl", "arrow"), default="jsonl",
+                        help="arrow needs pyarrow (pip install pyarrow)")
+    parser.add_argument("--context", type=int, default=2, help="sentences of context either side")
+    parser.add_argument("--split", type=float, nargs=3, default=[0.8, 0.1, 0.1], metavar=("TRAIN", "DEV", "TEST"))
+    parser.add_argument("--split-seed", default="0", help="salt for the passage hash, change it to reshuffle")
+    parser.add_argument("--annotators", nargs="+", default=None, help="only these annotators (default: all)")
+    parser.add_argument("--include-test", action="store_true", help=f"keep {TEST_ANNOTATOR} in")
+    parser.add_argument("--logs", type=Path, nargs="+", default=None,
+                        help="JSON / JSONL annotation logs to use instead of the storage backend")
+    parser.add_argument("--passages", type=Path, default=None,
+                        help="passages JSON / JSONL with sentences (default the app's passages)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    args = parser.parse_args()
+
+    if abs(sum(args.split) - 1.0) > 1e-6 or min(args.split) < 0:
+        print(f"ERROR: --split fractions must be >= 0 and add up to 1, got {args.split}")
+        sys.exit(1)
+    if args.format == "arrow" and pa is None:
+        print("ERROR: --format arrow needs pyarrow (pip install pyarrow), or use --format jsonl")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    skip = () if args.include_test else (TEST_ANNOTATOR,)
+    labels, counts = collect_labels(annotation_sources(args), skip)
+    for annotator_id, n in counts.items():
+        print(f"  {annotator_id:<30} {n:>8} complete annotations")
+    if not labels:
+        print("No complete annotations found.")
+        return
+    passages = load_passages(args.passages)
+    print(f"  {len(labels)} annotated passages, {len(passages)} passages available")
+
+    # built into a temp dir and swapped in at the end so a failed run never leaves a mixed dataset
+    tmp_out = args.out.with_name(args.out.name + ".tmp")
+    if tmp_out.exists():
+        shutil.rmtree(tmp_out)
+    writers = {split: ShardWriter(tmp_out / split, args.format, args.shard_size) for split in SPLITS}
+    positives = {split: 0 for split in SPLITS}
+    split_passages = {split: set() for split in SPLITS}
+    out_of_range = 0
+    missing = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = passage_jobs(labels, passages, args, missing)
+        for examples, bad in bounded_map(pool, build_chunk, jobs, max_in_flight=args.workers * 2):
+            out_of_range += bad
+            for example in examples:
+                split = example["split"]
+                writers[split].write(example)
+                positives[split] += bool(example["labels"])
+                split_passages[split].add(example["passage_id"])
+    for writer in writers.values():
+        writer.close()
+
+    manifest = {
+        "created":            time.strftime("%Y-%m-%d %H:%M:%S"),
+        "format":             args.format,
+        "context":            args.context,
+        "split_fractions":    dict(zip(SPLITS, args.split)),
+        "split_seed":         args.split_seed,
+        "confidence_weights": CONFIDENCE_WEIGHTS,
+        "annotators":         counts,
+        "categories":         sorted({c for anns in labels.values() for cats in anns for c in cats}),
+        "splits": {
+            split: {
+                "passages":  len(split_passages[split]),
+                "sentences": writers[split].count,
+                "positive":  positives[split],
+                "shards":    writers[split].shards,
+            }
+            for split in SPLITS
+        },
+        "missing_passages":     len(missing),
+        "evidence_out_of_range": out_of_range,
+    }
+    with open(tmp_out / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    if args.out.exists():
+        shutil.rmtree(args.out)
+    tmp_out.replace(args.out)
+
+    print(f"\nDataset written to {args.out} ({args.format}) in {time.perf_counter() - start:.1f}s")
+    for split, info in manifest["splits"].items():
+        print(f"  {split:<6} {info['passages']:>7} passages {info['sentences']:>9} sentences "
+              f"({info['positive']} with a label) in {info['shards']} shard(s)")
+    if missing:
+        print(f"  WARNING: {len(missing)} annotated passage(s) not found or without sentences, "
+              f"eg {', '.join(missing[:5])}")
+    if out_of_range:
+        print(f"  WARNING: {out_of_range} evidence index(es) past the end of their passage, ignored")
+
+
+if __name__ == "__main__":
+    main()
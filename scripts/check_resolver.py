@@ -0,0 +1,69 @@
+#regression check for data/resolver.py: the incremental JSON array reader against json.load
+# every case is read at every chunk size from 1 char up, so each element gets split at every
+# possible point (numbers cut mid digit like "2345" + "6", strings, escapes, nested objects)
+# plus latest wins resolution on a log with out of order and equal timestamps
+#python scripts/check_resolver.py
+# exits 1 on any mismatch, so it can gate changes to the resolver
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.resolver import iter_json_array, resolve_records
+
+ARRAY_CASES = [
+    '[1, 23456, "x"]',
+    '[123456789, -0.25e-3, 1E+10, 7]',
+    '[true, false, null, 0]',
+    '["a\\"b", "\\u00e9t\\u00e9", "", "[,]"]',
+    '[{"a": [1, 2, {"b": 345}], "c": "d"}, [], {}, 67890]',
+    '  [ 1 ,\n 22 ,\t333 ]  ',
+    '[]',
+    '',
+]
+
+
+def check_arrays():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "array.json"
+        for case in ARRAY_CASES:
+            path.write_text(case, encoding='utf-8')
+            expected = json.loads(case) if case.strip() else []
+            for chunk_size in range(1, len(case) + 2):
+                got = list(iter_json_array(path, chunk_size=chunk_size))
+                if got != expected:
+                    failures.append(f"{case!r} chunk {chunk_size}: {got!r} != {expected!r}")
+    return failures
+
+
+def check_latest_wins():
+    records = [
+        {"passage_id": "p1", "timestamp": "2026-01-05T09:00:00.500000Z", "v": 1},
+        {"passage_id": "p1", "timestamp": "2026-01-05T09:00:00Z", "v": 2},  #sorts later as a string, is earlier
+        {"passage_id": "p2", "timestamp": "2026-01-05T09:00:00Z", "v": 3},
+        {"passage_id": "p2", "timestamp": "2026-01-05T09:00:00Z", "v": 4},  #tie, later row wins
+        {"passage_id": "p3", "timestamp": "", "v": 5},
+        {"passage_id": "p3", "timestamp": "2026-01-01T00:00:00", "v": 6},
+    ]
+    expected = {"p1": 1, "p2": 4, "p3": 6}
+    got = {pid: r["v"] for pid, r in resolve_records(records).items()}
+    return [] if got == expected else [f"latest wins: {got} != {expected}"]
+
+
+def main():
+    failures = check_arrays() + check_latest_wins()
+    if failures:
+        print(f"FAILED: {len(failures)} mismatch(es)")
+        for failure in failures[:20]:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print(f"OK: {len(ARRAY_CASES)} arrays at every chunk size, latest wins resolution")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#exports every annotators latest annotations (latest wins, resolver.py) as tables for analysis
+# one row per passage x category: evidence sentence indices, confidence, duration, flags, notes
+# (an annotation with no categories yet still gets one row, category empty)
+# partitioned by annotator: <out>/annotator_id=<id>/part-0.<parquet|arrow|csv>, readable as one
+# dataset by pyarrow / pandas / duckdb
+#python scripts/export_annotations.py  (--format parquet|arrow|csv --out data/export --complete-only)
+# --logs a.jsonl b.json exports those log files instead of the storage backend (annotator = file name)
+# logs are streamed and rows written in --batch sized chunks, memory is one batch + the resolver map,
+# not the logs (the sheets backend still reads one annotators sheet at a time, thats the API)
+# parquet/arrow need pyarrow (pip install pyarrow), csv works without it
+import argparse
+import csv
+import json
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data import resolver, storage
+from data.common import EXCLUSION_IDS, build_domain_map, is_annotation_complete
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_OUT = ROOT / "data" / "export"
+ROW_BATCH = 50_000
+
+COLUMNS = [
+    "annotator_id", "passage_id", "timestamp", "category", "domain", "exclusion", "confidence",
+    "evidence", "duration_seconds", "explicit_philosophy_flag", "complete", "notes",
+]
+
+
+def arrow_schema():
+    return pa.schema([
+        ("annotator_id",             pa.string()),
+        ("passage_id",               pa.string()),
+        ("timestamp",                pa.timestamp("us", tz="UTC")),
+        ("category",                 pa.string()),
+        ("domain",                   pa.string()),
+        ("exclusion",                pa.bool_()),
+        ("confidence",               pa.string()),
+        ("evidence",                 pa.list_(pa.int32())),
+        ("duration_seconds",         pa.float64()),
+        ("explicit_philosophy_flag", pa.bool_()),
+        ("complete",                 pa.bool_()),
+        ("notes",                    pa.string()),
+    ])
+
+
+# ROWS ===========================
+
+def _flag(value):
+    # sheets hands booleans back as "TRUE"/"FALSE" strings
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _categories(record):
+    cats = record.get("categories") or {}
+    if isinstance(cats, str):
+        try:
+            cats = json.loads(cats)
+        except json.JSONDecodeError:
+            cats = {}
+    return cats
+
+
+def annotation_rows(annotator_id, records, domain_map, complete_only=False):
+    # resolved annotation records -> row dicts, one per category
+    for record in records:
+        complete = is_annotation_complete(dict(record, categories=_categories(record)))
+        if complete_only and not complete:
+            continue
+        ts = resolver.parse_timestamp(record.get("timestamp"))
+        base = {
+            "annotator_id":             annotator_id,
+            "passage_id":               str(record.get("passage_id", "")),
+            "timestamp":                None if ts == float("-inf") else datetime.fromtimestamp(ts, timezone.utc),
+            "duration_seconds":         _number(record.get("duration_seconds")),
+            "explicit_philosophy_flag": _flag(record.get("explicit_philosophy_flag", False)),
+            "complete":                 complete,
+            "notes":                    record.get("notes") or "",
+        }
+        cats = _categories(record)
+        if not cats:
+            yield dict(base, category=None, domain=None, exclusion=False, confidence=None, evidence=[])
+            continue
+        for cat_id, cat_data in cats.items():
+            cat_data = cat_data or {}
+            yield dict(
+                base,
+                category=cat_id,
+                domain=domain_map.get(cat_id),
+                exclusion=cat_id in EXCLUSION_IDS,
+                confidence=cat_data.get("confidence") or None,
+                evidence=sorted(int(s) for s in cat_data.get("evidence") or []),
+            )
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# WRITERS ===========================
+# each takes the part file path + an iterator of row batches, returns rows written
+
+def write_parquet(path, batches):
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))  #one row group per batch
+            count += len(batch)
+    return count
+
+
+def write_arrow(path, batches):
+    schema = arrow_schema()
+    count = 0
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_csv(path, batches):
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for batch in batches:
+            for row in batch:
+                row = dict(row, evidence=json.dumps(row["evidence"]))
+                if row["timestamp"] is not None:
+                    row["timestamp"] = row["timestamp"].isoformat()
+                writer.writerow(row)
+            count += len(batch)
+    return count
+
+
+WRITERS = {"parquet": write_parquet, "arrow": write_arrow, "csv": write_csv}
+
+
+def export_annotator(annotator_id, records, out, fmt, domain_map, complete_only=False, batch=ROW_BATCH):
+    # writes one annotators partition, returns rows written
+    # written under a temp name and moved into place so a failed export never leaves half a file
+    part_dir = out / f"annotator_id={annotator_id}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    path = part_dir / f"part-0.{fmt}"
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    rows = annotation_rows(annotator_id, records, domain_map, complete_only)
+    try:
+        count = WRITERS[fmt](tmp, batched(rows, batch))
+    except BaseException:
+        tmp.unlink(missing_ok=True)  #dataset discovery would otherwise pick the .tmp up
+        if not any(part_dir.iterdir()):
+            part_dir.rmdir()
+        raise
+    tmp.replace(path)
+    return count
+
+
+def sources(args):
+    # [(annotator_id, resolved record iterator)], lazily so only one log is open at a time
+    if args.logs:
+        for path in args.logs:
+            name = path.name.split(".")[0]
+            yield name, resolver.resolve(resolver.source_for(path))
+        return
+    ids = storage.list_annotator_ids()
+    if args.annotators:
+        ids = [a for a in ids if a in args.annotators]
+    for annotator_id in ids:
+        yield annotator_id, storage.iter_latest_annotations(annotator_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export resolved annotations as Parquet / Arrow / CSV tables")
+    parser.add_argument("--format", choices=tuple(WRITERS), default=None,
+                        help="default parquet, csv if pyarrow isnt installed")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    parser.add_argument("--annotators", nargs="+", default=None, help="only these annotators (default: all)")
+    parser.add_argument("--logs", type=Path, nargs="+", default=None,
+                        help="JSON / JSONL annotation logs to export instead of the storage backend")
+    parser.add_argument("--complete-only", action="store_true", help="skip annotations that arent complete")
+    parser.add_argument("--batch", type=int, default=ROW_BATCH, help="rows per write (parquet row group)")
+    parser.add_argument("--clean", action="store_true", help="remove --out first (drops stale annotators)")
+    args = parser.parse_args()
+
+    if args.format is None:
+        args.format = "parquet" if pa is not None else "csv"
+        if pa is None:
+            print("pyarrow not installed, exporting CSV (pip install pyarrow for parquet/arrow)")
+    elif args.format != "csv" and pa is None:
+        print(f"ERROR: --format {args.format} needs pyarrow (pip install pyarrow), or use --format csv")
+        sys.exit(1)
+    if args.clean and args.out.exists():
+        shutil.rmtree(args.out)
+
+    domain_map = build_domain_map()
+    total = 0
+    annotators = 0
+    for annotator_id, records in sources(args):
+        start = time.perf_counter()
+        count = export_annotator(annotator_id, records, args.out, args.format, domain_map,
+                                 args.complete_only, args.batch)
+        print(f"  {annotator_id:<30} {count:>9} rows  ({time.perf_counter() - start:.1f}s)")
+        total += count
+        annotators += 1
+
+    if not annotators:
+        print("No annotation logs found.")
+        return
+    print(f"{total} rows from {annotators} annotator(s) written to {args.out} ({args.format})")
+
+
+if __name__ == "__main__":
+    main()
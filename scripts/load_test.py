@@ -0,0 +1,296 @@
+#headless load test, drives app.py with many simulated annotators through streamlit AppTest
+# each simulated annotator logs in with a prod_config entry code, ticks categories, picks evidence,
+# sets confidence, saves and sometimes goes back a passage
+#python scripts/load_test.py --sessions 20 --saves 10  and  --storage sheets-emulated --latency-ms 400
+# storage is always redirected to a temp dir so real annotation files are never touched
+import argparse
+import math
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from streamlit.testing.v1 import AppTest
+
+from data import prod_config, storage
+from data.common import EXCLUSION_IDS, load_categories
+
+APP_PATH = ROOT / "app.py"
+SOURCE_DATA_DIR = storage.DATA_DIR
+PASSAGES_PER_EXPERT = 50
+
+CATEGORY_IDS = [
+    cat["id"]
+    for domain in load_categories()["domains"]
+    for cat in domain["categories"]
+]
+PHIL_IDS = [c for c in CATEGORY_IDS if c not in EXCLUSION_IDS]
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(q * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+# SETUP ===========================
+
+def isolate_storage(tmp_dir):
+    # point local storage at a temp copy of the passages, annotation files land there too
+    src_dir = SOURCE_DATA_DIR
+    # index copied after passages.json so it still counts as current
+    for name in ("passages.json", "passages.jsonl", "passages.idx.json", "test_passages.json"):
+        if (src_dir / name).exists():
+            shutil.copy(src_dir / name, tmp_dir / name)
+    storage.DATA_DIR = tmp_dir
+    storage.STORAGE_MODE = "local"
+
+
+def emulate_sheets_latency(latency_ms, jitter_ms):
+    # every storage call sleeps like a Sheets round trip would, app code runs unchanged
+    lat = latency_ms / 1000.0
+    jit = jitter_ms / 1000.0
+    rng = random.Random(0)
+
+    def slow(fn):
+        def inner(*args, **kwargs):
+            time.sleep(max(0.0, rng.gauss(lat, jit)))
+            return fn(*args, **kwargs)
+        return inner
+
+    for name in ("load_passages", "lookup_annotator", "get_assignments", "load_annotations",
+                 "iter_latest_annotations", "save_annotation", "get_completed_passage_ids",
+                 "load_all_annotations", "add_bonus_passages"):
+        setattr(storage, name, slow(getattr(storage, name)))
+
+
+def login_codes(n_sessions):
+    # real entry codes first, then LOAD-nnnn codes that build_logins registers as extra experts
+    codes = [a["entry_code"] for a in prod_config.PRODUCTION_ANNOTATORS]
+    codes += [f"LOAD-{i:04d}" for i in range(len(codes), n_sessions)]
+    return codes[:n_sessions]
+
+
+def build_logins(n_sessions):
+    # every session gets its own annotator, extras are registered in prod_config so login goes through lookup
+    codes = login_codes(n_sessions)
+    passage_ids = list(storage.load_passages().keys())
+    known = {a["entry_code"] for a in prod_config.PRODUCTION_ANNOTATORS}
+    for code in codes:
+        if code not in known:
+            prod_config.PRODUCTION_ANNOTATORS.append({
+                "entry_code": code,
+                "annotator_id": "loadtest_" + code.split("-")[1],
+                "role": "expert",
+                "display_name": f"Load test {code}",
+            })
+
+    # experts have no prod assignments in local mode, give them a slice so they have work
+    for i, a in enumerate(prod_config.PRODUCTION_ANNOTATORS):
+        if a["role"] == "expert":
+            start = (i * PASSAGES_PER_EXPERT) % max(1, len(passage_ids))
+            chunk = (passage_ids[start:] + passage_ids[:start])[:PASSAGES_PER_EXPERT]
+            storage.TEST_ASSIGNMENTS[a["annotator_id"]] = [{"passage_id": p, "set": "core"} for p in chunk]
+    return codes
+
+
+# ONE SIMULATED ANNOTATOR ===========================
+# a session is a generator that yields after every rerun, so the scheduler below can interleave
+# many sessions the way one server process interleaves reruns from many browser tabs
+# (AppTest itself is not safe to drive from several threads at once)
+
+def _find(widgets, key=None, label=None):
+    for w in widgets:
+        if key is not None and w.key == key:
+            return w
+        if label is not None and getattr(w, "label", None) == label:
+            return w
+    return None
+
+
+def simulate_annotator(code, saves, seed, timeout, result):
+    rng = random.Random(seed)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    def run():
+        start = time.perf_counter()
+        at.run()
+        result["latencies"].append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    run()
+    yield
+    at.text_input[0].input(code)
+    _find(at.button, label="Enter").click()
+    run()
+    yield
+
+    for _ in range(saves):
+        assignments = at.session_state["assignments"]
+        idx = at.session_state["current_index"]
+        if not assignments or idx >= len(assignments):
+            return
+        pid = assignments[idx]["passage_id"]
+
+        if rng.random() < 0.1:
+            cats = [rng.choice(sorted(EXCLUSION_IDS))]
+        else:
+            cats = rng.sample(PHIL_IDS, rng.choice([1, 1, 2, 3]))
+
+        for cat_id in cats:
+            cb = _find(at.checkbox, key=f"cat_{cat_id}_{pid}")
+            if cb is None or cb.disabled:
+                continue
+            cb.check()
+            run()
+            yield
+            if cat_id in EXCLUSION_IDS:
+                continue
+            sent_buttons = [b for b in at.button if b.key and b.key.startswith(f"sent_{cat_id}_")]
+            if sent_buttons:
+                rng.choice(sent_buttons).click()
+                run()
+                yield
+            radio = _find(at.radio, key=f"conf_{cat_id}_{pid}")
+            if radio is not None:
+                radio.set_value(rng.choice(["high", "medium", "low"]))
+                run()
+                yield
+
+        _find(at.button, label="Save and Next").click()
+        run()
+        result["saves"] += 1
+        yield
+
+        # occasionally go back and forward again like a real annotator checking their work
+        if rng.random() < 0.15:
+            prev = _find(at.button, label="Previous")
+            if prev is not None and not prev.disabled:
+                prev.click()
+                run()
+                yield
+                _find(at.button, label="Save and Next").click()
+                run()
+                yield
+
+
+def run_sessions(codes, saves, seed, timeout, concurrency):
+    # round robin over at most `concurrency` live sessions, next one starts when one finishes
+    results = []
+    queue = list(enumerate(codes))
+    live = []
+    while queue or live:
+        while queue and len(live) < concurrency:
+            i, code = queue.pop(0)
+            result = {"code": code, "saves": 0, "latencies": [], "error": None}
+            results.append(result)
+            live.append((simulate_annotator(code, saves, seed + i, timeout, result), result))
+        still_live = []
+        for gen, result in live:
+            try:
+                next(gen)
+                still_live.append((gen, result))
+            except StopIteration:
+                pass
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+        live = still_live
+    return results
+
+
+def _worker(job):
+    # one load test process, same setup as main so each process is an independent server
+    codes, args = job
+    tmp_dir = Path(tempfile.mkdtemp(prefix="annotator_load_"))
+    try:
+        setup(tmp_dir, args)
+        return run_sessions(codes, args.saves, args.seed, args.timeout, args.concurrency or len(codes))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def setup(tmp_dir, args):
+    isolate_storage(tmp_dir)
+    if args.storage == "sheets-emulated":
+        emulate_sheets_latency(args.latency_ms, args.jitter_ms)
+    return build_logins(args.sessions)
+
+
+# MAIN ===========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-annotator load test for app.py")
+    parser.add_argument("--sessions", type=int, default=10, help="simulated annotators")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="sessions interleaved at once per process (default all)")
+    parser.add_argument("--processes", type=int, default=1, help="independent server processes")
+    parser.add_argument("--saves", type=int, default=10, help="saves per simulated annotator")
+    parser.add_argument("--storage", choices=["local", "sheets-emulated"], default="local")
+    parser.add_argument("--latency-ms", type=float, default=350.0, help="emulated Sheets round trip")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per rerun AppTest timeout (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Load test: {args.sessions} sessions x {args.saves} saves, "
+          f"{args.processes} process(es), storage {args.storage}")
+
+    # ru_maxrss is KiB on linux, bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if args.processes <= 1:
+        tmp_dir = Path(tempfile.mkdtemp(prefix="annotator_load_"))
+        codes = setup(tmp_dir, args)
+        concurrency = args.concurrency or args.sessions
+        results = run_sessions(codes, args.saves, args.seed, args.timeout, concurrency)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        per_session_mb = rss_growth * rss_unit / max(1, len(codes)) / 1e6
+    else:
+        # codes are split up front so every process gets distinct annotators
+        codes = login_codes(args.sessions)
+        jobs = [(codes[i::args.processes], args) for i in range(args.processes)]
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            results = [r for chunk in pool.map(_worker, jobs) for r in chunk]
+        #peak of the largest child, spread over the sessions that process ran
+        rss_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        per_session_mb = rss_peak * rss_unit / max(1, max(len(j[0]) for j in jobs)) / 1e6
+    wall = time.perf_counter() - start
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    saves = sum(r["saves"] for r in results)
+    errors = [r for r in results if r["error"]]
+
+    print("\n" + "=" * 60)
+    print("LOAD TEST REPORT")
+    print("=" * 60)
+    print(f"Wall time:           {wall:.1f}s")
+    print(f"Saves:               {saves} ({saves / (wall / 60):.1f} saves/min)")
+    print(f"Reruns:              {len(latencies)} ({len(latencies) / wall:.1f}/s)")
+    print(f"Rerun latency p50:   {_percentile(latencies, 0.50) * 1000:.0f} ms")
+    print(f"Rerun latency p95:   {_percentile(latencies, 0.95) * 1000:.0f} ms")
+    print(f"Rerun latency p99:   {_percentile(latencies, 0.99) * 1000:.0f} ms")
+    print(f"Memory:              {per_session_mb:.1f} MB peak RSS per session")
+    if errors:
+        print(f"\n{len(errors)} session(s) failed:")
+        for r in errors[:5]:
+            print(f"  - {r['code']}: {r['error']}")
+    print("=" * 60)
+
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
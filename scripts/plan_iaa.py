@@ -0,0 +1,147 @@
+#bootstrap confidence intervals on the agreement collected so far + how many IAA passages it takes
+# to get them down to a target width, written as a plan sampler_script.py --plan picks up
+#python scripts/plan_iaa.py --target-width 0.2 --save data/iaa_plan.json  (--replicates 2000 --workers 4)
+# expert vs expert pairs only share the overlap passages -> sizes the overlap
+# primary vs expert pairs share everything the expert got -> sizes --per-expert
+# interval width is taken to shrink with 1/sqrt(passages), a rough projection from what was seen,
+# categories marked on fewer than --min-positive shared passages are too rare to plan on and are
+# left out (they would ask for thousands of passages)
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.agreement import AgreementTable, bootstrap, interval, units_needed
+from data.storage import load_all_annotations
+
+PRIMARY_ID = "primary_rafuh"
+TEST_ANNOTATOR = "Test_001"
+
+
+def fmt(value, digits=3):
+    return "-" if value is None or np.isnan(value) else f"{value:.{digits}f}"
+
+
+def pair_needs(table, width, positives, primary_pairs, args):
+    # {category: (max needed over primary pairs, max over expert pairs)} plus the two overall maxima
+    shared = table.shared()
+    needed = units_needed(shared, width, args.target_width)
+    plannable = ~np.isnan(needed) & (positives >= args.min_positive)
+    if args.categories:
+        plannable &= np.isin(table.categories, args.categories)[None, :]
+    needed = np.where(plannable, needed, np.nan)
+
+    by_cat = {}
+    for j, cat in enumerate(table.categories):
+        col = needed[:, j]
+        prim, expert = col[primary_pairs], col[~primary_pairs]
+        by_cat[cat] = (
+            None if np.isnan(prim).all() else int(np.nanmax(prim)),
+            None if np.isnan(expert).all() else int(np.nanmax(expert)),
+        )
+    prim = [p for p, _ in by_cat.values() if p is not None]
+    expert = [e for _, e in by_cat.values() if e is not None]
+    return by_cat, max(prim, default=None), max(expert, default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agreement confidence intervals and IAA sample size plan")
+    parser.add_argument("--target-width", type=float, default=0.2,
+                        help="wanted confidence interval width for Cohen's kappa (0.2 = +-0.1)")
+    parser.add_argument("--level",      type=float, default=0.95)
+    parser.add_argument("--replicates", type=int,   default=2000)
+    parser.add_argument("--seed",       type=int,   default=42)
+    parser.add_argument("--workers",    type=int,   default=os.cpu_count() or 1)
+    parser.add_argument("--min-positive", type=int, default=5,
+                        help="shared passages a category has to be marked on to be planned for")
+    parser.add_argument("--categories", nargs="+", default=None, help="plan for these categories only")
+    parser.add_argument("--primary",    default=PRIMARY_ID)
+    parser.add_argument("--save",       type=Path, default=None, help="write the plan JSON for sampler_script --plan")
+    args = parser.parse_args()
+
+    all_annotations = load_all_annotations()
+    table = AgreementTable.from_annotations(all_annotations, exclude=(TEST_ANNOTATOR,))
+    if len(table.annotators) < 2:
+        print("ERROR: need annotations from at least 2 annotators")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    reps = bootstrap(table, args.replicates, args.seed, args.workers)
+    if reps is None:
+        print("ERROR: no passage has been annotated by 2+ annotators yet, nothing to plan from")
+        sys.exit(1)
+    print(f"{args.replicates} bootstrap replicates over {int(table.units.max())} passages "
+          f"in {time.perf_counter() - start:.1f}s ({args.workers} worker(s))")
+
+    # group agreement, for information
+    alpha = table.krippendorff()
+    low, high = interval(reps["krippendorff"], args.level)
+    print(f"\nKrippendorff's alpha, {args.level:.0%} intervals")
+    print(f"  {'category':<40} {'units':>6} {'alpha':>7} {'low':>7} {'high':>7} {'width':>7}")
+    for j, cat in enumerate(table.categories):
+        if not table.units[j]:
+            continue
+        print(f"  {cat:<40} {table.units[j]:>6} {fmt(alpha[j]):>7} {fmt(low[j]):>7} "
+              f"{fmt(high[j]):>7} {fmt(high[j] - low[j]):>7}")
+
+    # pairwise kappa intervals drive the plan
+    kappa = table.cohen()
+    low, high = interval(reps["cohen"], args.level)
+    width = high - low
+    counts = table.pair_counts
+    positives = counts[:, :, 1, :].sum(axis=2) + counts[:, :, 0, 1]  #shared passages either marked it on
+    primary_pairs = np.array([args.primary in (table.annotators[a], table.annotators[b]) for a, b in table.pairs])
+    shared = table.shared()
+    for i, (a, b) in enumerate(table.pairs):
+        if not shared[i].any():
+            continue
+        print(f"\n  {table.annotators[a]} vs {table.annotators[b]} ({shared[i].max()} shared passages)")
+        print(f"    {'category':<38} {'kappa':>7} {'low':>7} {'high':>7} {'width':>7}")
+        for j, cat in enumerate(table.categories):
+            if positives[i, j] < args.min_positive:
+                continue
+            print(f"    {cat:<38} {fmt(kappa[i, j]):>7} {fmt(low[i, j]):>7} {fmt(high[i, j]):>7} "
+                  f"{fmt(width[i, j]):>7}")
+
+    by_cat, per_expert, overlap = pair_needs(table, width, positives, primary_pairs, args)
+    print(f"\nPassages needed for {args.level:.0%} kappa intervals {args.target_width} wide")
+    print(f"  {'category':<40} {'primary pairs':>14} {'expert pairs':>13}")
+    for cat, (prim, expert) in by_cat.items():
+        if prim is None and expert is None:
+            continue
+        print(f"  {cat:<40} {prim if prim is not None else '-':>14} {expert if expert is not None else '-':>13}")
+
+    if overlap is not None and per_expert is not None:
+        per_expert = max(per_expert, overlap)  #overlap passages count towards every expert's total
+    if shared[~primary_pairs].max(initial=0) and shared[~primary_pairs].max(initial=0) < 10:
+        print("\n  WARNING: under 10 overlap passages so far, the overlap projection is very rough")
+    print("\nPlan:")
+    print(f"  --overlap    {overlap if overlap is not None else '- (no expert pair data yet, keep the default)'}")
+    print(f"  --per-expert {per_expert if per_expert is not None else '- (no primary pair data yet, keep the default)'}")
+
+    if args.save:
+        plan = {
+            "created":      time.strftime("%Y-%m-%d %H:%M:%S"),
+            "target_width": args.target_width,
+            "level":        args.level,
+            "replicates":   args.replicates,
+            "seed":         args.seed,
+            "overlap":      overlap,
+            "per_expert":   per_expert,
+            "categories":   {cat: {"primary_pairs": p, "expert_pairs": e} for cat, (p, e) in by_cat.items()},
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2)
+        print(f"\nSaved to {args.save}  (use: python scripts/sampler_script.py --plan {args.save})")
+
+
+if __name__ == "__main__":
+    main()
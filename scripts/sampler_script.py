@@ -1,12 +1,22 @@
 #Assigns a stratifed sample of passages to annotators for Inter-Annotator Agreement
 # reads completed primary annotations from gSHEET and samples a set of 20+5
 #python scripts/sampler_script.py --dry-run  (preview) and --seed 99 for custom seed
+# --refresh pulls new sheet rows into a local sqlite snapshot, later runs with --source snapshot (or
+# --source local for a JSON/JSONL log) dont touch the API until they write
+# --watch runs as a daemon that tops up expert IAA sets in small batches as the pool grows
+# --search runs many randomised variants on a process pool and keeps the best scoring one
+# --plan data/iaa_plan.json takes --per-expert / --overlap from plan_iaa.py (sized for a target kappa precision)
 import argparse
 import json
+import os
+import random
 import sys
+import time
 import toml
 import gspread
+import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from google.oauth2.service_account import Credentials
 from pathlib import Path
 
@@ -14,8 +24,9 @@ from pathlib import Path
 ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(ROOT))
 
-from data import prod_config
+from data import prod_config, resolver, sampler_snapshot
 from data.common import EXCLUSION_IDS, build_domain_map, is_annotation_complete
+from data.features import ANN_TYPES, CONF_BONUS, CONF_RANK, CONF_TIERS, TERTILES, FeatureMatrix
 
 DOMAIN_MAP = build_domain_map()
 
@@ -24,6 +35,7 @@ ALL_CATEGORIES = set(DOMAIN_MAP.keys())
 
 MINIMUM_POOL = 250
 OVERLAP_COUNT = 5
+PER_EXPERT = 25  # plan_iaa.py projects what these two need to be for a target kappa precision
 
 # target unique slots per expert per bin (ann_type x wc_tertile) totalling 20
 TARGET_BINS = {
@@ -62,24 +74,8 @@ def _get_client():
 def _load_primary_annotations(spreadsheet):
     #load all rows from primary_rafuh annotator sheet
     try:
-        sheet = spreadsheet.worksheet("primary_rafuh")
-        records = sheet.get_all_records()
-        annotations = []
-        for r in records:
-            cats_raw = r.get("categories", "{}")
-            try:
-                categories = json.loads(cats_raw) if isinstance(cats_raw, str) else cats_raw
-            except (json.JSONDecodeError, TypeError):
-                categories = {}
-            annotations.append({
-                "passage_id":               str(r.get("passage_id", "")),
-                "timestamp":                str(r.get("timestamp", "")),
-                "explicit_philosophy_flag": r.get("explicit_philosophy_flag", False),
-                "categories":               categories,
-                "notes":                    r.get("notes", ""),
-                "duration_seconds":         r.get("duration_seconds", 0),
-            })
-        return annotations
+        sheet = spreadsheet.worksheet(sampler_snapshot.PRIMARY_SHEET)
+        return [sampler_snapshot.primary_annotation(r) for r in sheet.get_all_records()]
     except gspread.exceptions.WorksheetNotFound:
         print("ERROR: 'primary_rafuh' sheet not found. Has the primary annotator saved any annotations?")
         sys.exit(1)
@@ -87,30 +83,88 @@ def _load_primary_annotations(spreadsheet):
 def _load_passages_metadata(spreadsheet):
     # load passage metadata from passages sheet, returns {id: passage_dict}
     sheet = spreadsheet.worksheet("passages")
-    records = sheet.get_all_records()
     passages = {}
-    for r in records:
-        pid = str(r.get("id", ""))
-        passages[pid] = {
-            "id":            pid,
-            "source":        r.get("source", "unknown"),
-            "word_count":    int(r.get("word_count") or 0),
-            "score":         r.get("score", 0),
-            "priority":      r.get("priority", ""),
-        }
+    for r in sheet.get_all_records():
+        meta = sampler_snapshot.passage_meta(r)
+        passages[meta["id"]] = meta
     return passages
 
+
+def load_inputs(args):
+    # (raw primary annotations, passage metadata, existing iaa pairs, spreadsheet or None)
+    # --source sheets reads everything live, snapshot/local never touch the API unless --refresh
+    db = args.snapshot
+    if args.source == "sheets":
+        print("Connecting to Google Sheets...")
+        spreadsheet = _get_client()
+        print(f"  Connected: {spreadsheet.title}")
+        print("\nLoading primary annotations...")
+        raw = _load_primary_annotations(spreadsheet)
+        print(f"  {len(raw)} raw records loaded")
+        print("\nLoading passage metadata...")
+        meta = _load_passages_metadata(spreadsheet)
+        print(f"  {len(meta)} passages loaded")
+        print("\nChecking for existing IAA assignments...")
+        existing = read_iaa_assignments(spreadsheet)
+        print(f"  {len(existing)} existing IAA assignment(s) found")
+        return raw, meta, existing, spreadsheet
+
+    spreadsheet = None
+    if args.refresh:
+        print("Connecting to Google Sheets...")
+        spreadsheet = _get_client()
+        print(f"Refreshing snapshot {db} ({args.refresh})...")
+        for sheet, (added, reloaded, total) in sampler_snapshot.refresh(
+            spreadsheet, db, full=args.refresh == "full"
+        ).items():
+            how = "reloaded" if reloaded else "incremental" if added else "unchanged"
+            print(f"  {sheet}: +{added} row(s), {total} total ({how})")
+
+    info = sampler_snapshot.snapshot_info(db)
+    if args.source == "snapshot" and not info:
+        print(f"ERROR: no snapshot at {db}. Run once with --refresh to create it.")
+        sys.exit(1)
+    if info:
+        oldest = min(t for _, t in info.values())
+        print(f"Snapshot {db}: refreshed {time.strftime('%Y-%m-%d %H:%M', time.localtime(oldest))}")
+
+    print("\nLoading primary annotations...")
+    if args.source == "local":
+        raw = sampler_snapshot.load_annotation_log(args.annotations)
+        print(f"  {len(raw)} raw records loaded from {args.annotations}")
+        meta = sampler_snapshot.load_local_passages_metadata(args.passages)
+    else:
+        raw = sampler_snapshot.load_primary_annotations(db)
+        print(f"  {len(raw)} raw records loaded")
+        meta = sampler_snapshot.load_passages_metadata(db)
+    print(f"\nPassage metadata: {len(meta)} passages")
+    if "assignments" in info:
+        existing = sampler_snapshot.read_iaa_assignments(db)
+    else:
+        print("  WARNING: no snapshot of the assignments sheet, assuming no existing IAA assignments")
+        existing = set()
+    print(f"  {len(existing)} existing IAA assignment(s) in snapshot")
+    return raw, meta, existing, spreadsheet
+
+
 # CORE ALGORITHM FUNCTIONS ===========================
+# extract_features/assign_wc_tertiles/compute_priority_score are the per dict versions, main builds
+# the pool through data.features.FeatureMatrix (same results, vectorised) and keeps them as reference
 
 def resolve_latest(raw_records):
-    #collapse append-only log to most recent record per passage_id
-    latest = {}
-    for record in raw_records:
+    #collapse append-only log to most recent record per passage_id (parsed timestamps, see data/resolver.py)
+    return resolver.resolve_records(raw_records)
+
+
+def merge_latest(latest, new_records):
+    # fold more log rows into an existing resolve_latest result, returns the passage ids that changed
+    changed = set()
+    for record in new_records:
         pid = record.get("passage_id", "")
-        ts  = record.get("timestamp", "")
-        if pid and (pid not in latest or ts > latest[pid]["timestamp"]):
+        if pid and (pid not in latest or resolver.newer(record, latest[pid])):
             latest[pid] = record
-    return latest
+            changed.add(pid)
+    return changed
 
 
 def extract_features(record: dict, passage_meta: dict) -> dict:
@@ -135,11 +189,10 @@ def extract_features(record: dict, passage_meta: dict) -> dict:
     domains_present = {DOMAIN_MAP[c] for c in phil_cats if c in DOMAIN_MAP}
 
     # confidence tier - maps high/med/low to numeric for comparison
-    conf_rank = {"high": 3, "medium": 2, "low": 1}
     conf_vals = [
-        conf_rank.get(v.get("confidence"), 0)
+        CONF_RANK[v.get("confidence")]
         for v in phil_cats.values()
-        if v.get("confidence") in conf_rank
+        if v.get("confidence") in CONF_RANK
     ]
     if not conf_vals:
         conf_tier = "exclusion_only"
@@ -185,8 +238,7 @@ def compute_priority_score(feat):
     # higher = more useful for IAA, breaks ties within strata
     score = 0.0
     score += feat["num_cats"] * 1.5
-    conf_bonus = {"low_conf": 3.0, "mixed_conf": 1.5, "high_conf": 0.0, "exclusion_only": 0.5}
-    score += conf_bonus.get(feat["conf_tier"], 0.0)
+    score += CONF_BONUS.get(feat["conf_tier"], 0.0)
     score += len(feat["domains_present"]) * 1.0
     if feat.get("wc_tertile") == "medium":
         score += 1.0
@@ -194,8 +246,71 @@ def compute_priority_score(feat):
 
 
 
-def sample_overlap(features_list: list, existing_overlap_ids: set, seed: int) -> list:
-    # SELECT OVERLAP_COUNT passages shared across ALL experts ===========================
+def build_indexes(features_list, matrix=None):
+    # one pass over the pool, every list keeps pool order (= priority order after the sort in main)
+    # so "first candidate in X" is a short scan of X's list instead of a filter over the whole pool
+    # matrix = FeatureMatrix with rows in the same order as features_list, turns the pass into array ops
+    index = {
+        "bin":        defaultdict(list),  #(ann_type, wc_tertile) -> features
+        "domain":     defaultdict(list),
+        "category":   defaultdict(list),
+        "cat_counts": defaultdict(int),   #category -> passages in pool with it
+    }
+    if matrix is not None:
+        for ann_type, tertile in TARGET_BINS:
+            rows = matrix.bin_rows(ann_type, tertile)
+            if len(rows):
+                index["bin"][(ann_type, tertile)] = [features_list[i] for i in rows]
+        for domain in matrix.domains.names:
+            rows = matrix.domain_rows(domain)
+            if len(rows):
+                index["domain"][domain] = [features_list[i] for i in rows]
+        for cat, count in matrix.category_counts().items():
+            index["category"][cat] = [features_list[i] for i in matrix.category_rows(cat)]
+            index["cat_counts"][cat] = count
+        return index
+
+    for f in features_list:
+        index["bin"][(f["ann_type"], f.get("wc_tertile"))].append(f)
+        for domain in f["domains_present"]:
+            index["domain"][domain].append(f)
+        for cat in f["category_ids"]:
+            index["category"][cat].append(f)
+            index["cat_counts"][cat] += 1
+    return index
+
+
+def _first_free(candidates, *taken):
+    # first feature whose passage_id is in none of the taken sets
+    for f in candidates:
+        pid = f["passage_id"]
+        if not any(pid in t for t in taken):
+            return f
+    return None
+
+
+def build_pool(eligible, passages_meta):
+    # (FeatureMatrix, feature dicts) for the eligible annotations, both highest priority first
+    matrix = FeatureMatrix.from_records(eligible.items(), passages_meta)
+    matrix.assign_tertiles()
+    matrix.compute_priority()
+
+    #sort highest priority first, stable tie-break by passage_id
+    matrix = matrix.take(matrix.priority_order())
+    return matrix, matrix.to_features()
+
+
+def production_expert_ids():
+    # experts from prod_config, Test_001 mirrors Chris_005 instead of getting its own sample
+    return [
+        a["annotator_id"]
+        for a in prod_config.PRODUCTION_ANNOTATORS
+        if a["role"] == "expert" and a["annotator_id"] != "Test_001"
+    ]
+
+
+def sample_overlap(features_list: list, existing_overlap_ids: set, seed: int, count: int = OVERLAP_COUNT) -> list:
+    # SELECT count passages shared across ALL experts ===========================
     # stratified to cover as many domains as possible, favours mixed/low confidence
     candidates = [
         f for f in features_list
@@ -204,31 +319,30 @@ def sample_overlap(features_list: list, existing_overlap_ids: set, seed: int) ->
     ]
 
     overlap = []
+    overlap_pids = set()
     covered_domains = set()
 
     #first try pick one passage per domain (4 passages)
     for domain in sorted(ALL_DOMAINS):
-        dom_cands = [
-            f for f in candidates
-            if domain in f["domains_present"]
-            and f["passage_id"] not in {o["passage_id"] for o in overlap}
-        ]
-        if dom_cands:
-            chosen = dom_cands[0]
+        chosen = next(
+            (f for f in candidates
+             if domain in f["domains_present"] and f["passage_id"] not in overlap_pids),
+            None,
+        )
+        if chosen is not None:
             overlap.append(chosen)
+            overlap_pids.add(chosen["passage_id"])
             covered_domains |= chosen["domains_present"]
-            if len(overlap) >= OVERLAP_COUNT:
+            if len(overlap) >= count:
                 break
 
     # fill remaining slots with highest priority remaining
-    rest = [
-        f for f in candidates
-        if f["passage_id"] not in {o["passage_id"] for o in overlap}
-    ]
-    for f in rest:
-        if len(overlap) >= OVERLAP_COUNT:
+    for f in candidates:
+        if len(overlap) >= count:
             break
-        overlap.append(f)
+        if f["passage_id"] not in overlap_pids:
+            overlap.append(f)
+            overlap_pids.add(f["passage_id"])
 
     return [f["passage_id"] for f in overlap]
 
@@ -240,110 +354,122 @@ def sample_for_experts(
     overlap_ids: list,
     per_expert: int = 25,
     seed: int = 42,
+    stable_ties: bool = False,
+    matrix: FeatureMatrix = None,
 ) -> dict:
     # returns {expert_id: [passage_id, ...]} with each list length per_expert
     # each experts list = overlap_ids + unique passages
     #no unique passage in more than one experts list
     # passages already assigned to expert are skipped
+    # pool is indexed once up front, per expert work only scans the front of the relevant index lists
+    # stable_ties breaks equal rare category counts by name instead of set order (which changes per run)
     unique_per_expert = per_expert - len(overlap_ids)
     feat_by_pid = {f["passage_id"]: f for f in features_list}
+    index = build_indexes(features_list, matrix)
+
+    assigned_by_expert = defaultdict(set)
+    for aid, pid in existing_assignments:
+        assigned_by_expert[aid].add(pid)
 
     overlap_set = set(overlap_ids)  #global pool not in overlap for unique slots
 
+    overlap_domains = set()
+    overlap_cats = set()
+    for pid in overlap_ids:
+        if pid in feat_by_pid:
+            overlap_domains |= feat_by_pid[pid]["domains_present"]
+            overlap_cats |= feat_by_pid[pid]["category_ids"]
+
     claimed_unique = set()  #passages claimed as unique by earlier experts
 
     result = {}
 
     for expert_id in expert_ids:
-        already_assigned = {pid for (aid, pid) in existing_assignments if aid == expert_id}
+        already_assigned = assigned_by_expert.get(expert_id, set())
+        # a passage is available for this experts unique slots unless it is in one of these
+        blocked = (overlap_set, claimed_unique, already_assigned)
 
-        # available for this experts unique slots
-        available = [
-            f for f in features_list
-            if f["passage_id"] not in overlap_set
-            and f["passage_id"] not in claimed_unique
-            and f["passage_id"] not in already_assigned
-        ]
+        selection = []
+        selected_pids = set()
 
-        # PASS 1: stratified bin filling ===========================
-        bins = defaultdict(list)
-        for f in available:
-            key = (f["ann_type"], f["wc_tertile"])
-            bins[key].append(f)
+        def pick(f):
+            selection.append(f)
+            selected_pids.add(f["passage_id"])
 
-        selection = []
+        # PASS 1: stratified bin filling ===========================
         for bin_key, target in sorted(TARGET_BINS.items(), key=lambda x: -x[1]):
-            candidates = bins.get(bin_key, [])
-            selected_pids = {f["passage_id"] for f in selection}  #exclude already added
-            candidates = [f for f in candidates if f["passage_id"] not in selected_pids]
-            for f in candidates[:target]:
-                selection.append(f)
+            taken = 0
+            for f in index["bin"].get(bin_key, []):
+                if taken >= target:
+                    break
+                pid = f["passage_id"]
+                if pid in selected_pids or any(pid in b for b in blocked):
+                    continue
+                pick(f)
+                taken += 1
 
         # PASS 2: domain coverage enforcement ===========================
-        selected_pids = {f["passage_id"] for f in selection}
-        covered_domains = set()
+        covered_domains = set(overlap_domains)  #include overlap domains too
         for f in selection:
             covered_domains |= f["domains_present"]
-        #include overlap domains too
-        for pid in overlap_ids:
-            if pid in feat_by_pid:
-                covered_domains |= feat_by_pid[pid]["domains_present"]
 
         missing_domains = ALL_DOMAINS - covered_domains
         for domain in sorted(missing_domains):
-            dom_cands = [
-                f for f in available
-                if domain in f["domains_present"]
-                and f["passage_id"] not in selected_pids
-            ]
-            if dom_cands:
-                chosen = dom_cands[0]
-                selection.append(chosen)
-                selected_pids.add(chosen["passage_id"])
+            chosen = _first_free(index["domain"].get(domain, []), selected_pids, *blocked)
+            if chosen is not None:
+                pick(chosen)
                 covered_domains |= chosen["domains_present"]
 
         #opportunistically fill rare categories if still under quota
         if len(selection) < unique_per_expert:
-            covered_cats = set()
+            covered_cats = set(overlap_cats)
             for f in selection:
                 covered_cats |= f["category_ids"]
-            for pid in overlap_ids:
-                if pid in feat_by_pid:
-                    covered_cats |= feat_by_pid[pid]["category_ids"]
 
             cat_counts = {
-                cat: sum(1 for f in features_list if cat in f["category_ids"])
+                cat: index["cat_counts"].get(cat, 0)
                 for cat in ALL_CATEGORIES - covered_cats
             }
-            for cat in sorted(cat_counts, key=lambda c: cat_counts[c]):
+            if stable_ties:
+                cat_order = sorted(cat_counts, key=lambda c: (cat_counts[c], c))
+            else:
+                cat_order = sorted(cat_counts, key=lambda c: cat_counts[c])
+            for cat in cat_order:
                 if len(selection) >= unique_per_expert:
                     break
-                cat_candidates = [
-                    f for f in available
-                    if cat in f["category_ids"]
-                    and f["passage_id"] not in selected_pids
-                ]
-                if cat_candidates:
-                    chosen = cat_candidates[0]
-                    selection.append(chosen)
-                    selected_pids.add(chosen["passage_id"])
+                chosen = _first_free(index["category"].get(cat, []), selected_pids, *blocked)
+                if chosen is not None:
+                    pick(chosen)
 
         # PASS 3: backfill with source cap ===========================
+        # source counts only ever go up so a source that hits the cap stays capped, meaning the
+        # capped scan never has to look behind its last position, and once nothing under the cap
+        # is left the plain "first remaining" scan takes over for good
         source_cap = max(1, int(unique_per_expert * 0.40))
+        source_counts = defaultdict(int)
+        for f in selection:
+            source_counts[f["source"]] += 1
+        # (same holds for the uncapped scan, everything behind it is already taken)
+        pos = 0
+        capped_done = False
         while len(selection) < unique_per_expert:
-            source_counts = defaultdict(int)
-            for f in selection:
-                source_counts[f["source"]] += 1
-
-            remaining = [
-                f for f in available
-                if f["passage_id"] not in {sf["passage_id"] for sf in selection}
-            ]
-            capped = [f for f in remaining if source_counts[f["source"]] < source_cap]
-            candidates = capped if capped else remaining
-            if not candidates:
-                break
-            selection.append(candidates[0])
+            chosen = None
+            while pos < len(features_list):
+                f = features_list[pos]
+                pid = f["passage_id"]
+                if (pid not in selected_pids and not any(pid in b for b in blocked)
+                        and (capped_done or source_counts[f["source"]] < source_cap)):
+                    chosen = f
+                    break
+                pos += 1
+            if chosen is None:
+                if capped_done:
+                    break
+                capped_done = True
+                pos = 0
+                continue
+            pick(chosen)
+            source_counts[chosen["source"]] += 1
 
         # trim to unique_per_expert if domain/category passes overshot
         if len(selection) > unique_per_expert:
@@ -374,8 +500,176 @@ def sample_for_experts(
     return result
 
 
-def print_iaa_report(assignments, overlap_ids, features_list):
+def expert_assignment_sets(existing_assignments, expert_ids):
+    # {expert_id: {passage_id}} in one pass over the existing rows
+    sets = {eid: set() for eid in expert_ids}
+    for aid, pid in existing_assignments:
+        if aid in sets:
+            sets[aid].add(pid)
+    return sets
+
+
+# MULTI START SEARCH ===========================
+# the greedy passes above always give the same answer for the same pool, search mode reruns them on
+# randomised variants (priority order jittered, expert claim order shuffled) and keeps the best score
+# variant k is fully determined by (--seed, k) so the winner can be rebuilt with --variant k
+# variant 0 is the unjittered greedy with ties broken by name (stable_ties) and the existing overlap
+# sorted, search can only match or beat that. it is not always the plain run without --search, whose
+# ties follow set order (different per run) so it can land on a different, unreproducible sample
+
+SEARCH_WEIGHTS = {
+    "bin_error":         1.0,   # |picked - target| summed over TARGET_BINS, unique slots only
+    "missing_domains":   8.0,   # per expert
+    "missing_cats":      2.0,   # per expert
+    "global_missing":   10.0,   # categories absent from the whole IAA set
+    "source_excess":     3.0,   # unique slots over the 40% per source cap
+    "short":             6.0,   # unique slots left empty
+    "mean_priority":     0.2,   # bonus, tie breaker between otherwise equal samples
+}
+SEARCH_BATCH = 32  # variants per pool task
+
+
+def score_sample(assignments, overlap_ids, feat_by_pid, unique_per_expert):
+    # higher is better, returns (score, {component: value})
+    overlap_set = set(overlap_ids)
+    source_cap = max(1, int(unique_per_expert * 0.40))
+    parts = defaultdict(float)
+    all_cats = set()
+    priorities = []
+    for pids in assignments.values():
+        feats = [feat_by_pid[p] for p in pids if p in feat_by_pid]
+        unique = [f for f in feats if f["passage_id"] not in overlap_set]
+        bins = defaultdict(int)
+        sources = defaultdict(int)
+        domains = set()
+        cats = set()
+        for f in unique:
+            bins[(f["ann_type"], f.get("wc_tertile"))] += 1
+            sources[f["source"]] += 1
+        for f in feats:
+            domains |= f["domains_present"]
+            cats |= f["category_ids"]
+            priorities.append(f["_priority"])
+        parts["bin_error"] += sum(abs(bins.get(k, 0) - t) for k, t in TARGET_BINS.items())
+        parts["missing_domains"] += len(ALL_DOMAINS - domains)
+        parts["missing_cats"] += len(ALL_CATEGORIES - cats)
+        parts["source_excess"] += sum(max(0, c - source_cap) for c in sources.values())
+        parts["short"] += max(0, unique_per_expert - len(unique))
+        all_cats |= cats
+    parts["global_missing"] = len(ALL_CATEGORIES - all_cats)
+    parts["mean_priority"] = sum(priorities) / len(priorities) if priorities else 0.0
+    score = SEARCH_WEIGHTS["mean_priority"] * parts["mean_priority"] - sum(
+        SEARCH_WEIGHTS[k] * v for k, v in parts.items() if k != "mean_priority"
+    )
+    return score, dict(parts)
+
+
+def build_sample(features_list, expert_ids, existing_assignments, existing_olap, per_expert, seed,
+                 stable_ties=False, overlap_count=OVERLAP_COUNT):
+    # steps 9 + 10 of main: overlap (reusing existing), then unique passages per expert
+    if len(existing_olap) >= overlap_count:
+        overlap_ids = list(existing_olap)[:overlap_count]
+    else:
+        new_overlap = sample_overlap(features_list, existing_olap, seed=seed, count=overlap_count)
+        overlap_ids = (list(existing_olap) + new_overlap)[:overlap_count]
+    assignments = sample_for_experts(
+        features_list=features_list,
+        expert_ids=expert_ids,
+        existing_assignments=existing_assignments,
+        overlap_ids=overlap_ids,
+        per_expert=per_expert,
+        seed=seed,
+        stable_ties=stable_ties,
+    )
+    return overlap_ids, assignments
+
+
+def run_variant(ctx, seed, k):
+    # variant k of the search, same (seed, k) -> same sample on any machine / process
+    features_list = ctx["features_list"]
+    expert_ids = list(ctx["expert_ids"])
+    if k > 0:
+        rng = random.Random(f"{seed}:{k}")
+        jitter = rng.uniform(0.0, ctx["jitter"])
+        noise = {f["passage_id"]: rng.random() * jitter for f in features_list}
+        features_list = sorted(
+            features_list, key=lambda f: (-(f["_priority"] + noise[f["passage_id"]]), f["passage_id"])
+        )
+        if rng.random() < 0.5:
+            rng.shuffle(expert_ids)
+    overlap_ids, assignments = build_sample(
+        features_list, expert_ids, ctx["existing_assignments"], ctx["existing_olap"],
+        ctx["per_expert"], seed, stable_ties=True, overlap_count=ctx.get("overlap_count", OVERLAP_COUNT),
+    )
+    # report/write in the configured expert order whatever order they claimed in
+    assignments = {eid: assignments[eid] for eid in ctx["expert_ids"]}
+    return overlap_ids, assignments
+
+
+_search_ctx = None  #set in each worker process by _init_search
+
+
+def _init_search(ctx):
+    global _search_ctx
+    _search_ctx = ctx
+    _search_ctx["feat_by_pid"] = {f["passage_id"]: f for f in ctx["features_list"]}
+
+
+def _search_batch(job):
+    # runs variants [start, stop), returns (score, k) of the best one, lowest k wins ties
+    seed, start, stop = job
+    ctx = _search_ctx
+    best = None
+    for k in range(start, stop):
+        overlap_ids, assignments = run_variant(ctx, seed, k)
+        score, _ = score_sample(assignments, overlap_ids, ctx["feat_by_pid"], ctx["per_expert"] - len(overlap_ids))
+        if best is None or score > best[0]:
+            best = (score, k)
+    return best
+
+
+def search_samples(ctx, seed, restarts, time_budget, workers):
+    # evaluates variants 0..restarts-1 in batches across the pool until done or out of time
+    # returns (best k, variants evaluated, completed all?)
+    # batches are handed out in order and never skipped, so a run that finishes is reproducible
+    deadline = time.monotonic() + time_budget
+    batches = ((seed, i, min(i + SEARCH_BATCH, restarts)) for i in range(0, restarts, SEARCH_BATCH))
+    best = None
+    evaluated = 0
+    pending = {}
+    out_of_time = False
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_search, initargs=(ctx,)) as pool:
+        while True:
+            while not out_of_time and len(pending) < workers * 2:
+                job = next(batches, None)
+                if job is None:
+                    break
+                pending[pool.submit(_search_batch, job)] = job
+            if not pending:
+                break
+            timeout = None if out_of_time else max(0.0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                job = pending.pop(fut)
+                if fut.cancelled():
+                    continue
+                evaluated += job[2] - job[1]
+                score, k = fut.result()
+                if best is None or score > best[0] or (score == best[0] and k < best[1]):
+                    best = (score, k)
+            if time.monotonic() >= deadline and not out_of_time:
+                out_of_time = True
+                for fut in pending:
+                    fut.cancel()
+                # batches already running still finish, they are counted like any other
+        complete = not out_of_time and evaluated >= restarts
+    return best[1], evaluated, complete
+
+
+def print_iaa_report(assignments, overlap_ids, features_list, matrix=None):
+    # matrix (FeatureMatrix over the same pool) swaps the per passage dict loops for column counts
     feat_by_pid = {f["passage_id"]: f for f in features_list}
+    row_of = {pid: i for i, pid in enumerate(matrix.passage_ids)} if matrix is not None else None
     overlap_set = set(overlap_ids)
 
     print("\n" + "=" * 60)
@@ -392,22 +686,30 @@ def print_iaa_report(assignments, overlap_ids, features_list):
 
     all_cats_covered = set()
     for expert_id, pids in assignments.items():
-        feats = [feat_by_pid[p] for p in pids if p in feat_by_pid]
-
-        ann_types   = defaultdict(int)
-        conf_tiers  = defaultdict(int)
-        wc_tertiles = defaultdict(int)
-        sources     = defaultdict(int)
-        domains     = set()
-        cats        = set()
-
-        for f in feats:
-            ann_types[f["ann_type"]] += 1
-            conf_tiers[f["conf_tier"]] += 1
-            wc_tertiles[f.get("wc_tertile", "?")] += 1
-            sources[f["source"]] += 1
-            domains |= f["domains_present"]
-            cats |= f["category_ids"]
+        if matrix is not None:
+            rows = np.array([row_of[p] for p in pids if p in row_of], dtype=np.intp)
+            ann_types   = matrix.value_counts("ann_type", rows, ANN_TYPES)
+            conf_tiers  = matrix.value_counts("conf_tier", rows, CONF_TIERS)
+            wc_tertiles = matrix.value_counts("tertile", rows, {**dict(enumerate(TERTILES)), -1: "?"})
+            sources     = matrix.value_counts("source", rows, matrix.sources.names)
+            domains, cats = matrix.coverage(rows)
+        else:
+            feats = [feat_by_pid[p] for p in pids if p in feat_by_pid]
+
+            ann_types   = defaultdict(int)
+            conf_tiers  = defaultdict(int)
+            wc_tertiles = defaultdict(int)
+            sources     = defaultdict(int)
+            domains     = set()
+            cats        = set()
+
+            for f in feats:
+                ann_types[f["ann_type"]] += 1
+                conf_tiers[f["conf_tier"]] += 1
+                wc_tertiles[f.get("wc_tertile", "?")] += 1
+                sources[f["source"]] += 1
+                domains |= f["domains_present"]
+                cats |= f["category_ids"]
 
         all_cats_covered |= cats
 
@@ -442,12 +744,7 @@ def read_iaa_assignments(spreadsheet):
     #prevents duplicating on re-runs
     try:
         sheet = spreadsheet.worksheet("assignments")
-        rows = sheet.get_all_records()
-        existing = set()
-        for row in rows:
-            if str(row.get("set", "")).startswith("iaa"):
-                existing.add((str(row["annotator_id"]), str(row["passage_id"])))
-        return existing
+        return sampler_snapshot.iaa_pairs(sheet.get_all_records())
     except Exception as e:
         print(f"WARNING: Could not read existing IAA assignments: {e}")
         return set()
@@ -472,24 +769,238 @@ def write_iaa_assignments(spreadsheet, assignments, overlap_ids):
         return False
 
 
+# WATCH MODE ===========================
+# --watch keeps running and tops up the expert IAA sets while the primary annotator works
+# every cycle refreshes the snapshot (new sheet rows only) and folds just those rows into the pool,
+# the feature matrix is only rebuilt when the pool actually changed
+# each expert gets at most --batch new passages per cycle until they hold --per-expert
+# a passage already given to any expert is never handed out again except as overlap (iaa_overlap)
+
+WATCH_INTERVAL = 300  # seconds between cycles
+WATCH_BATCH = 5  # new passages per expert per cycle
+
+
+def new_watch_state():
+    return {
+        "rows":     {},     # sheet -> last snapshot row folded in
+        "latest":   {},     # resolve_latest over every primary row so far
+        "eligible": {},     # complete annotations among latest
+        "meta":     {},     # passage metadata
+        "existing": set(),  # (annotator_id, passage_id) iaa rows
+        "matrix":   None,
+        "features": [],
+    }
+
+
+def _fold_rows(state, sheet, db, reloaded):
+    # snapshot rows past the last one seen, a reloaded sheet has new row numbers so start from 0
+    after = 0 if reloaded else state["rows"].get(sheet, 0)
+    rows = sampler_snapshot.snapshot_rows(sheet, db, after=after)
+    if rows:
+        state["rows"][sheet] = rows[-1][0]
+    elif reloaded:
+        state["rows"][sheet] = 0
+    return [record for _, record in rows]
+
+
+def update_watch_state(state, db, refreshed):
+    # refreshed = sampler_snapshot.refresh() result, returns True if the sampling pool changed
+    reloaded = {sheet for sheet, (_, full, _) in refreshed.items() if full}
+    primary = sampler_snapshot.PRIMARY_SHEET
+    if primary in reloaded:
+        state["latest"], state["eligible"] = {}, {}
+    if "passages" in reloaded:
+        state["meta"] = {}
+    if "assignments" in reloaded:
+        state["existing"] = set()
+
+    new_primary = _fold_rows(state, primary, db, primary in reloaded)
+    changed = merge_latest(state["latest"], map(sampler_snapshot.primary_annotation, new_primary))
+    for pid in changed:
+        if is_annotation_complete(state["latest"][pid]):
+            state["eligible"][pid] = state["latest"][pid]
+        else:
+            state["eligible"].pop(pid, None)  #re-saved as incomplete
+
+    new_passages = _fold_rows(state, "passages", db, "passages" in reloaded)
+    for r in new_passages:
+        meta = sampler_snapshot.passage_meta(r)
+        state["meta"][meta["id"]] = meta
+
+    state["existing"] |= sampler_snapshot.iaa_pairs(_fold_rows(state, "assignments", db, "assignments" in reloaded))
+
+    pool_changed = bool(changed or new_passages or reloaded & {primary, "passages"})
+    if pool_changed or state["matrix"] is None:
+        state["matrix"], state["features"] = build_pool(state["eligible"], state["meta"])
+    return pool_changed
+
+
+def plan_top_up(features_list, expert_ids, existing, per_expert, batch, seed, matrix=None,
+                overlap_count=OVERLAP_COUNT):
+    # (overlap ids, {annotator_id: [new passage ids]}) for one cycle, only pairs not in existing
+    assigned = expert_assignment_sets(existing, expert_ids)
+    existing_olap = set.intersection(*assigned.values()) if assigned else set()
+    taken = {pid for _, pid in existing}
+    deficit = {eid: per_expert - len(assigned[eid]) for eid in expert_ids}
+
+    # overlap first, everyone gets it so it only goes out while every expert has room
+    new_olap = []
+    room = min(deficit.values(), default=0)
+    if len(existing_olap) < overlap_count and room > 0:
+        free = [f for f in features_list if f["passage_id"] not in taken]
+        new_olap = sample_overlap(free, existing_olap, seed, count=overlap_count)
+        new_olap = new_olap[:min(overlap_count - len(existing_olap), room, batch)]
+    overlap_ids = sorted(existing_olap) + new_olap
+    claimed = taken | set(new_olap)
+
+    plan = {}
+    for eid in expert_ids:
+        k = min(batch - len(new_olap), deficit[eid] - len(new_olap))
+        picks = []
+        if k > 0:
+            #everything any expert already holds counts as assigned, so sample_for_experts skips it
+            blocked = {(eid, pid) for pid in claimed}
+            result = sample_for_experts(
+                features_list, [eid], blocked, overlap_ids, len(overlap_ids) + k, seed, matrix=matrix,
+            )
+            picks = result[eid][len(overlap_ids):][:k]
+            claimed.update(picks)
+        if new_olap or picks:
+            plan[eid] = new_olap + picks
+
+    # mirror Christophs new passages to the Test user like the one shot run does
+    if "Chris_005" in plan:
+        plan["Test_001"] = [p for p in plan["Chris_005"] if ("Test_001", p) not in existing]
+    return overlap_ids, plan
+
+
+def watch(args):
+    expert_ids = production_expert_ids()
+    print(f"Watching for completed primary annotations every {args.interval:.0f}s "
+          f"(experts: {', '.join(expert_ids)}; up to {args.batch} per expert per cycle, "
+          f"{args.per_expert} each, {args.overlap} overlap){' [DRY RUN]' if args.dry_run else ''}")
+    spreadsheet = _get_client()
+    state = new_watch_state()
+    cycle = 0
+    try:
+        while True:
+            cycle += 1
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                refreshed = sampler_snapshot.refresh(spreadsheet, args.snapshot)
+                pool_changed = update_watch_state(state, args.snapshot, refreshed)
+                pool = len(state["features"])
+                if pool < args.min_pool:
+                    print(f"[{stamp}] pool {pool}/{args.min_pool} complete annotations, waiting")
+                else:
+                    overlap_ids, plan = plan_top_up(
+                        state["features"], expert_ids, state["existing"], args.per_expert,
+                        args.batch, args.seed, state["matrix"], args.overlap,
+                    )
+                    if plan and not args.dry_run:
+                        # re-read the assignments sheet right before writing, anything that landed
+                        # in the meantime is dropped instead of written twice
+                        refreshed = sampler_snapshot.refresh(spreadsheet, args.snapshot, sheets={"assignments"})
+                        update_watch_state(state, args.snapshot, refreshed)
+                        plan = {
+                            aid: [p for p in pids if (aid, p) not in state["existing"]]
+                            for aid, pids in plan.items()
+                        }
+                        plan = {aid: pids for aid, pids in plan.items() if pids}
+                    rows = sum(len(pids) for pids in plan.values())
+                    if not plan:
+                        note = "pool changed, " if pool_changed else ""
+                        print(f"[{stamp}] pool {pool}, {note}nothing to top up")
+                    elif args.dry_run:
+                        print(f"[{stamp}] pool {pool}, would write {rows} row(s): {plan}")
+                        state["existing"] |= {(aid, p) for aid, pids in plan.items() for p in pids}
+                    elif write_iaa_assignments(spreadsheet, plan, overlap_ids):
+                        print(f"[{stamp}] pool {pool}, wrote {rows} row(s): "
+                              f"{ {aid: len(pids) for aid, pids in plan.items()} }")
+                    else:
+                        print(f"[{stamp}] write failed, retrying next cycle")
+            except Exception as e:
+                print(f"[{stamp}] cycle failed: {e}")
+            if args.cycles and cycle >= args.cycles:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
 # MAIN ===========================
 
+def apply_plan(args):
+    # --per-expert / --overlap from the command line win, then the --plan file, then the defaults
+    plan = {}
+    if args.plan is not None:
+        try:
+            with open(args.plan, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"ERROR: could not read plan {args.plan}: {e}")
+            sys.exit(1)
+        print(f"Plan {args.plan} ({plan.get('created', '?')}, kappa width {plan.get('target_width')}): "
+              f"overlap {plan.get('overlap')}, per expert {plan.get('per_expert')}")
+    if args.overlap is None:
+        args.overlap = plan.get("overlap") or OVERLAP_COUNT
+    if args.per_expert is None:
+        args.per_expert = plan.get("per_expert") or PER_EXPERT
+    if args.per_expert < args.overlap:
+        print(f"ERROR: --per-expert {args.per_expert} is smaller than the overlap ({args.overlap})")
+        sys.exit(1)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate IAA stratified sample")
     parser.add_argument("--seed",       type=int,  default=42)
-    parser.add_argument("--per-expert", type=int,  default=25)
+    parser.add_argument("--per-expert", type=int,  default=None,
+                        help=f"passages per expert, overlap included (default {PER_EXPERT}, or the --plan's)")
+    parser.add_argument("--overlap",    type=int,  default=None,
+                        help=f"passages shared by all experts (default {OVERLAP_COUNT}, or the --plan's)")
+    parser.add_argument("--plan",       type=Path, default=None,
+                        help="sample size plan from plan_iaa.py, sets --per-expert/--overlap unless given")
     parser.add_argument("--dry-run",    action="store_true",
                         help="Print report without writing to Google Sheets")
+    parser.add_argument("--search",     action="store_true",
+                        help="multi-start randomised search, keeps the best scoring sample")
+    parser.add_argument("--restarts",   type=int,   default=2000, help="variants to try in --search")
+    parser.add_argument("--time-budget", type=float, default=120.0, help="seconds for --search")
+    parser.add_argument("--workers",    type=int,   default=os.cpu_count() or 1)
+    parser.add_argument("--jitter",     type=float, default=3.0,
+                        help="max priority noise per variant (priority scores run ~0-12)")
+    parser.add_argument("--variant",    type=int,   default=None,
+                        help="rebuild one search variant (as printed by --search) without searching")
+    parser.add_argument("--source",     choices=("sheets", "snapshot", "local"), default=None,
+                        help="where annotations/passages/assignments come from (default sheets, "
+                             "snapshot with --refresh)")
+    parser.add_argument("--refresh",    nargs="?", const="incremental", choices=("incremental", "full"),
+                        help="update the local snapshot from Google Sheets first (new rows only unless full)")
+    parser.add_argument("--snapshot",   type=Path, default=sampler_snapshot.SNAPSHOT_DB,
+                        help="sqlite snapshot used by --source snapshot")
+    parser.add_argument("--annotations", type=Path,
+                        default=ROOT / "data" / "annotations" / f"{sampler_snapshot.PRIMARY_SHEET}.json",
+                        help="JSON or JSONL primary annotation log for --source local")
+    parser.add_argument("--passages",   type=Path, default=None,
+                        help="passages file for --source local (default the app's local passages)")
+    parser.add_argument("--watch",      action="store_true",
+                        help="keep running and top up expert IAA sets as primary annotations come in")
+    parser.add_argument("--interval",   type=float, default=WATCH_INTERVAL, help="seconds between --watch cycles")
+    parser.add_argument("--batch",      type=int,   default=WATCH_BATCH,
+                        help="max new passages per expert per --watch cycle")
+    parser.add_argument("--min-pool",   type=int,   default=MINIMUM_POOL,
+                        help="complete annotations --watch waits for before assigning anything")
+    parser.add_argument("--cycles",     type=int,   default=0, help="stop --watch after N cycles (0 = never)")
     args = parser.parse_args()
+    apply_plan(args)
+    if args.source is None:
+        args.source = "snapshot" if args.refresh else "sheets"
+    if args.watch:
+        watch(args)
+        return
 
-    print("Connecting to Google Sheets...")
-    spreadsheet = _get_client()
-    print(f"  Connected: {spreadsheet.title}")
-
-    # 1. load primary annotations
-    print("\nLoading primary annotations...")
-    raw_annotations = _load_primary_annotations(spreadsheet)
-    print(f"  {len(raw_annotations)} raw records loaded")
+    # 1. load primary annotations (+ passage metadata and existing iaa rows, from the same source)
+    raw_annotations, passages_meta, existing_assignments, spreadsheet = load_inputs(args)
 
     #2. resolve latest per passage and filter to complete
     latest = resolve_latest(raw_annotations)
@@ -503,40 +1014,19 @@ def main():
         print(f"  Currently have {len(eligible)}. Annotate {needed} more passages first.")
         sys.exit(1)
 
-    #4. load passage metadata
-    print("\nLoading passage metadata...")
-    passages_meta = _load_passages_metadata(spreadsheet)
-    print(f"  {len(passages_meta)} passages loaded")
+    #4. passage metadata was loaded with the annotations
 
-    # 5. extract features
-    features_list = []
-    for pid, rec in eligible.items():
-        meta = passages_meta.get(pid, {})
-        feat = extract_features(rec, meta)
-        features_list.append(feat)
+    # 5. extract features, columnar then back to the dicts the passes below use
+    matrix, features_list = build_pool(eligible, passages_meta)
 
-    assign_wc_tertiles(features_list)
-    for f in features_list:
-        f["_priority"] = compute_priority_score(f)
-
-    #sort highest priority first, stable tie-break by passage_id
-    features_list.sort(key=lambda f: (-f["_priority"], f["passage_id"]))
-
-    # 6. load existing IAA assignments for re-run detection
-    print("\nChecking for existing IAA assignments...")
-    existing_assignments = read_iaa_assignments(spreadsheet)
-    print(f"  {len(existing_assignments)} existing IAA assignment(s) found")
+    # 6. existing IAA assignments (for re-run detection) were loaded with the annotations
 
     #7. get expert IDs excluding Test_001
-    expert_ids = [
-        a["annotator_id"]
-        for a in prod_config.PRODUCTION_ANNOTATORS
-        if a["role"] == "expert" and a["annotator_id"] != "Test_001"
-    ]
+    expert_ids = production_expert_ids()
     print(f"\nExperts: {expert_ids}")
 
     # 8. check capacity
-    unique_per_expert = args.per_expert - OVERLAP_COUNT
+    unique_per_expert = args.per_expert - args.overlap
     total_unique_needed = len(expert_ids) * unique_per_expert
 
     non_overlap_pool = [
@@ -544,54 +1034,79 @@ def main():
         if f["ann_type"] != "exclusion"  #overlap drawn from non-exclusion
     ]
 
-    if len(features_list) < total_unique_needed + OVERLAP_COUNT:
-        actual_unique = (len(features_list) - OVERLAP_COUNT) // len(expert_ids)
-        actual_per_expert = actual_unique + OVERLAP_COUNT
-        print(f"\nWARNING: Pool has {len(features_list)} passages but {total_unique_needed + OVERLAP_COUNT} needed.")
-        print(f"  Reducing to {actual_per_expert} passages per expert ({actual_unique} unique + {OVERLAP_COUNT} overlap).")
+    if len(features_list) < total_unique_needed + args.overlap:
+        actual_unique = (len(features_list) - args.overlap) // len(expert_ids)
+        actual_per_expert = actual_unique + args.overlap
+        print(f"\nWARNING: Pool has {len(features_list)} passages but {total_unique_needed + args.overlap} needed.")
+        print(f"  Reducing to {actual_per_expert} passages per expert ({actual_unique} unique + {args.overlap} overlap).")
         args.per_expert = actual_per_expert
 
     #9. sample overlap passages
-    existing_olap = {
-        pid for (aid, pid) in existing_assignments
-        if any(
-            (aid2, pid) in existing_assignments
-            for aid2 in expert_ids
-        )
-    }
     # overlap passages = those assigned to ALL experts
-    expert_assignment_sets = {
-        eid: {pid for (aid, pid) in existing_assignments if aid == eid}
-        for eid in expert_ids
-    }
-    existing_olap = set.intersection(*expert_assignment_sets.values()) if expert_assignment_sets else set()
+    assigned_sets = expert_assignment_sets(existing_assignments, expert_ids)
+    existing_olap = set.intersection(*assigned_sets.values()) if assigned_sets else set()
 
     print(f"\nExisting overlap passages: {len(existing_olap)}")
 
-    if len(existing_olap) >= OVERLAP_COUNT:
-        overlap_ids = list(existing_olap)[:OVERLAP_COUNT]
-        print(f"  Using existing overlap: {overlap_ids}")
+    if args.search or args.variant is not None:
+        #10. randomised variants, everything keyed on sorted ids so reruns see the same inputs
+        ctx = {
+            "features_list":        features_list,
+            "expert_ids":           expert_ids,
+            "existing_assignments": existing_assignments,
+            "existing_olap":        sorted(existing_olap),
+            "per_expert":           args.per_expert,
+            "overlap_count":        args.overlap,
+            "jitter":               args.jitter,
+        }
+        feat_by_pid = {f["passage_id"]: f for f in features_list}
+        if args.variant is not None:
+            best_k = args.variant
+        else:
+            print(f"\nSearching {args.restarts} variants on {args.workers} worker(s), "
+                  f"{args.time_budget:.0f}s budget, seed {args.seed}...")
+            start = time.perf_counter()
+            best_k, evaluated, complete = search_samples(
+                ctx, args.seed, args.restarts, args.time_budget, args.workers
+            )
+            print(f"  {evaluated} variants in {time.perf_counter() - start:.1f}s")
+            if not complete:
+                print("  WARNING: time budget ran out, a longer budget may pick a different winner")
+            base_overlap, base_assignments = run_variant(ctx, args.seed, 0)
+            base_score, base_parts = score_sample(base_assignments, base_overlap, feat_by_pid,
+                                                  args.per_expert - len(base_overlap))
+            print(f"  stable-tie greedy (variant 0) score: {base_score:.2f} {base_parts}")
+        overlap_ids, assignments = run_variant(ctx, args.seed, best_k)
+        score, parts = score_sample(assignments, overlap_ids, feat_by_pid, args.per_expert - len(overlap_ids))
+        print(f"  variant {best_k} score: {score:.2f} {parts}")
+        print(f"  reproduce with: --seed {args.seed} --variant {best_k}")
+        print(f"  Overlap: {overlap_ids}")
     else:
-        new_overlap = sample_overlap(features_list, existing_olap, seed=args.seed)
-        overlap_ids = list(existing_olap) + new_overlap
-        overlap_ids = overlap_ids[:OVERLAP_COUNT]
-        print(f"  Sampled overlap: {overlap_ids}")
-
-    #10. sample unique passages for each expert
-    print("\nSampling passages for each expert...")
-    assignments = sample_for_experts(
-        features_list=features_list,
-        expert_ids=expert_ids,
-        existing_assignments=existing_assignments,
-        overlap_ids=overlap_ids,
-        per_expert=args.per_expert,
-        seed=args.seed,
-    )
+        if len(existing_olap) >= args.overlap:
+            overlap_ids = list(existing_olap)[:args.overlap]
+            print(f"  Using existing overlap: {overlap_ids}")
+        else:
+            new_overlap = sample_overlap(features_list, existing_olap, seed=args.seed, count=args.overlap)
+            overlap_ids = list(existing_olap) + new_overlap
+            overlap_ids = overlap_ids[:args.overlap]
+            print(f"  Sampled overlap: {overlap_ids}")
+
+        #10. sample unique passages for each expert
+        print("\nSampling passages for each expert...")
+        assignments = sample_for_experts(
+            features_list=features_list,
+            expert_ids=expert_ids,
+            existing_assignments=existing_assignments,
+            overlap_ids=overlap_ids,
+            per_expert=args.per_expert,
+            seed=args.seed,
+            matrix=matrix,
+        )
     # mirror Christophs assignments to Test user so test user works outside IAA
     assignments["Test_001"] = list(assignments.get("Chris_005", []))
 
     # 11. report
-    print_iaa_report(assignments, overlap_ids, features_list)
+    print_iaa_report(assignments, overlap_ids, features_list, matrix)
 
     #count new assignments (exclude already in gsheets)
     new_rows = 0
@@ -612,6 +1127,16 @@ def main():
         print("\n[DRY RUN] Skipping write to Google Sheets.")
         print("Remove --dry-run to commit these assignments.")
     else:
+        if args.source != "sheets":
+            # the no duplicate guarantee needs the live assignments sheet, not the snapshot copy
+            if spreadsheet is None:
+                print("\nConnecting to Google Sheets...")
+                spreadsheet = _get_client()
+            sampler_snapshot.refresh(spreadsheet, args.snapshot, sheets={"assignments"})
+            if sampler_snapshot.read_iaa_assignments(args.snapshot) != existing_assignments:
+                print("\nERROR: IAA assignments in Google Sheets changed since this snapshot.")
+                print("  Re-run with --refresh so the sample is drawn against the current assignments.")
+                sys.exit(1)
         # only write NEW assignments
         new_assignments = {
             expert_id: [
@@ -624,6 +1149,8 @@ def main():
         success = write_iaa_assignments(spreadsheet, new_assignments, overlap_ids)
         if success:
             print(f"  Done. {new_rows} rows written.")
+            if args.source != "sheets":
+                sampler_snapshot.refresh(spreadsheet, args.snapshot, sheets={"assignments"})
             print("  Experts can now log in and see their passages.")
         else:
             print("  Write failed. Check error above.")
@@ -0,0 +1,173 @@
+#generates synthetic primary annotation logs + passage metadata for benchmarking the sampler
+# logs look like what the app writes: time ordered saves, some passages re-saved later (edited
+# categories), some saved half done first and finished later, a few left incomplete for good,
+# ~12% exclusions, 1-3 categories otherwise with a skew towards a few common ones, sources zipf-ish
+#python scripts/synth_data.py --sizes 1000 10000 100000 1000000  (--out data/synthetic --seed 7)
+# writes primary_rafuh_<n>.jsonl + passages_<n>.jsonl, readable by sampler_script --source local
+# everything is streamed so 1M passages doesnt need the log in memory
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+#project root on path
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.common import EXCLUSION_IDS, build_domain_map
+
+DEFAULT_OUT = ROOT / "data" / "synthetic"
+START_TIME = datetime(2026, 1, 5, 9, 0, 0)
+
+PHIL_CATEGORIES = sorted(build_domain_map())
+EXCLUSIONS = sorted(EXCLUSION_IDS)
+CONFIDENCES = ["high", "high", "medium", "medium", "low"]
+PRIORITIES = ["HIGH", "HIGH", "MEDIUM", "LOW"]
+
+# rates per annotated passage
+EXCLUSION_RATE = 0.12
+RESAVE_RATE = 0.08  # saved again later with edited categories
+DRAFT_RATE = 0.03  # first save incomplete, completed later
+ABANDON_RATE = 0.02  # incomplete and never finished
+
+
+def passage_id(i):
+    return f"SYN{i:07d}"
+
+
+def _source_weights(sources):
+    # zipf: a couple of outlets supply most passages, long tail of small ones
+    return [1.0 / (rank + 1) ** 1.1 for rank in range(sources)]
+
+
+def passage_metadata(n, seed=7, sources=40):
+    # yields {"id", "source", "word_count", "sentence_count", "score", "priority"} per passage
+    rng = random.Random(f"{seed}:passages")
+    names = [f"Source {i:02d}" for i in range(sources)]
+    weights = _source_weights(sources)
+    for i in range(n):
+        word_count = max(40, min(600, int(rng.lognormvariate(5.0, 0.35))))
+        yield {
+            "id":             passage_id(i),
+            "source":         rng.choices(names, weights)[0],
+            "word_count":     word_count,
+            "sentence_count": max(2, word_count // 22),
+            "score":          rng.randint(0, 12),
+            "priority":       rng.choice(PRIORITIES),
+        }
+
+
+def _categories(rng, sentence_count, complete=True):
+    if rng.random() < EXCLUSION_RATE:
+        return {rng.choice(EXCLUSIONS): {"confidence": None, "evidence": []}}
+    k = rng.choice([1, 1, 1, 2, 2, 3])
+    chosen = set()
+    while len(chosen) < k:
+        #expovariate rank so the first few categories are common and the tail is rare
+        chosen.add(PHIL_CATEGORIES[min(len(PHIL_CATEGORIES) - 1, int(rng.expovariate(0.35)))])
+    cats = {}
+    for cat in sorted(chosen):
+        evidence = sorted(rng.sample(range(sentence_count), rng.randint(1, min(3, sentence_count))))
+        cats[cat] = {"confidence": rng.choice(CONFIDENCES), "evidence": evidence}
+    if not complete:
+        cats[sorted(cats)[-1]]["confidence"] = None  #forgot the confidence
+    return cats
+
+
+def _edit(rng, cats, sentence_count):
+    # re-save: change one confidence, or swap in a different category
+    cats = json.loads(json.dumps(cats))
+    phil = [c for c in cats if c not in EXCLUSION_IDS]
+    if phil and rng.random() < 0.6:
+        cats[rng.choice(phil)]["confidence"] = rng.choice(CONFIDENCES)
+        return cats
+    return _categories(rng, sentence_count)
+
+
+def annotation_log(n, seed=7, annotator_id="primary_rafuh", sources=40):
+    # yields the append only log for n annotated passages in save order
+    # timestamps formatted like storage.save_annotation (utc isoformat + Z)
+    rng = random.Random(f"{seed}:log")
+    now = START_TIME
+    pending = []  #(due save number, tiebreak, passage id, categories, sentence_count)
+    saves = 0
+
+    def record(pid, cats, duration):
+        return {
+            "passage_id":               pid,
+            "annotator_id":             annotator_id,
+            "timestamp":                now.isoformat() + "Z",
+            "duration_seconds":         duration,
+            "explicit_philosophy_flag": rng.random() < 0.05,
+            "categories":               cats,
+            "notes":                    "" if rng.random() < 0.9 else "synthetic note",
+        }
+
+    for i, meta in enumerate(passage_metadata(n, seed, sources)):
+        # revisits that are due come out before the next new passage
+        while pending and pending[0][0] <= saves:
+            _, _, pid, cats, sentence_count = heapq.heappop(pending)
+            duration = rng.randint(10, 120)
+            now += timedelta(seconds=duration)
+            saves += 1
+            yield record(pid, cats, duration)
+
+        pid = meta["id"]
+        sentence_count = meta["sentence_count"]
+        roll = rng.random()
+        complete = roll >= DRAFT_RATE + ABANDON_RATE
+        cats = _categories(rng, sentence_count, complete=complete)
+        duration = max(5, int(rng.gauss(0.35 * meta["word_count"], 25)))
+        now += timedelta(seconds=duration + rng.randint(1, 30))
+        saves += 1
+        yield record(pid, cats, duration)
+
+        if roll < DRAFT_RATE:
+            finished = _categories(rng, sentence_count)
+            heapq.heappush(pending, (saves + rng.randint(1, 50), i, pid, finished, sentence_count))
+        elif complete and rng.random() < RESAVE_RATE:
+            edited = _edit(rng, cats, sentence_count)
+            heapq.heappush(pending, (saves + rng.randint(1, 500), i, pid, edited, sentence_count))
+
+    while pending:
+        _, _, pid, cats, _ = heapq.heappop(pending)
+        duration = rng.randint(10, 120)
+        now += timedelta(seconds=duration)
+        yield record(pid, cats, duration)
+
+
+def write_jsonl(path, rows):
+    count = 0
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    tmp.replace(path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic annotation logs and passage metadata")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="annotated passages per dataset")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sources", type=int, default=40)
+    args = parser.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for n in args.sizes:
+        start = time.perf_counter()
+        write_jsonl(args.out / f"passages_{n}.jsonl", passage_metadata(n, args.seed, args.sources))
+        saves = write_jsonl(args.out / f"primary_rafuh_{n}.jsonl", annotation_log(n, args.seed, sources=args.sources))
+        print(f"  {n:>8} passages, {saves:>8} saves  ({time.perf_counter() - start:.1f}s)")
+    print(f"Written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 #populate google sheets first time with data
 
+import argparse
+import hashlib
 import json
+import os
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from pathlib import Path
 import sys
@@ -9,12 +13,19 @@ import sys
 #parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 from data import prod_config
+from data.passage_index import IndexedPassages, is_current
+from data.storage import passages_meta
 
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/drive'
 ]
 
+PASSAGE_HEADERS = ['id', 'text', 'sentences', 'source', 'article_title', 'date',
+                   'word_count', 'article_url', 'score', 'priority']
+ANNOTATOR_HEADERS = ['entry_code', 'annotator_id', 'role', 'display_name']
+ASSIGNMENT_HEADERS = ['annotator_id', 'passage_id', 'set']
+
 
 def load_secrets():
     import toml
@@ -48,42 +59,62 @@ def create_or_clear_sheet(spreadsheet, title, headers):
     sheet.append_row(headers)
     return sheet
 
+def passage_row(passage):
+    # convert sentences list to JSON string
+    sentences_json = json.dumps(passage['sentences'])
+
+    return [
+        passage['id'],
+        passage['text'],
+        sentences_json,
+        passage.get('source', ''),
+        passage.get('article_title', ''),
+        passage.get('date', 'N/A'),
+        passage.get('word_count', ''),
+        passage.get('article_url', ''),
+        passage.get('score', ''),
+        passage.get('priority', '')
+    ]
+
+
+def annotator_rows(annotators):
+    return [
+        [a['entry_code'], a['annotator_id'], a['role'], a['display_name']]
+        for a in annotators
+    ]
+
+
+def assignment_rows(assignments_dict):
+    return [
+        [annotator_id, a['passage_id'], a.get('set', 'core')]
+        for annotator_id, assignments in assignments_dict.items()
+        for a in assignments
+    ]
+
+
 #sheet with all passages
 def setup_passages_sheet(spreadsheet, passages):
     print("\nsetting up passages sheet...")
 
-    headers = ['id', 'text', 'sentences', 'source', 'article_title', 'date',
-               'word_count', 'article_url', 'score', 'priority']
-
-    sheet = create_or_clear_sheet(spreadsheet, "passages", headers)
+    sheet = create_or_clear_sheet(spreadsheet, "passages", PASSAGE_HEADERS)
 
     print(f"  Uploading {len(passages)} passages...")
 
-    rows = []
-    for passage in passages:
-        # convert sentences list to JSON string
-        sentences_json = json.dumps(passage['sentences'])
-
-        row = [
-            passage['id'],
-            passage['text'],
-            sentences_json,
-            passage.get('source', ''),
-            passage.get('article_title', ''),
-            passage.get('date', 'N/A'),
-            passage.get('word_count', ''),
-            passage.get('article_url', ''),
-            passage.get('score', ''),
-            passage.get('priority', '')
-        ]
-        rows.append(row)
-
-    #batches of 500 bc rate limits
+    #batches of 500 bc rate limits, rows built per batch so only one batch is decoded at a time
     batch_size = 500
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i:i + batch_size]
-        sheet.append_rows(batch)
-        print(f"    Uploaded {min(i + batch_size, len(rows))}/{len(rows)} passages")
+    rows = []
+    uploaded = 0
+    for passage in passages.values():
+        rows.append(passage_row(passage))
+        if len(rows) == batch_size:
+            sheet.append_rows(rows)
+            uploaded += len(rows)
+            rows = []
+            print(f"    Uploaded {uploaded}/{len(passages)} passages")
+    if rows:
+        sheet.append_rows(rows)
+        uploaded += len(rows)
+        print(f"    Uploaded {uploaded}/{len(passages)} passages")
 
     print(f"  Uploaded {len(passages)} passages")
 
@@ -91,19 +122,9 @@ def setup_passages_sheet(spreadsheet, passages):
 def setup_annotators_sheet(spreadsheet, annotators):
     print("\n 2 setting up annotors sheet...")
 
-    headers = ['entry_code', 'annotator_id', 'role', 'display_name']
-    sheet = create_or_clear_sheet(spreadsheet, "annotators", headers)
-
-    rows = []
-    for annotator in annotators:
-        row = [
-            annotator['entry_code'],
-            annotator['annotator_id'],
-            annotator['role'],
-            annotator['display_name']
-        ]
-        rows.append(row)
+    sheet = create_or_clear_sheet(spreadsheet, "annotators", ANNOTATOR_HEADERS)
 
+    rows = annotator_rows(annotators)
     sheet.append_rows(rows)
     print(f"   Added {len(annotators)} annotators")
 
@@ -112,18 +133,9 @@ def setup_assignments_sheet(spreadsheet, assignments_dict):
 
     print("\n3 ffs let this just work killing myself ")
 
-    headers = ['annotator_id', 'passage_id', 'set']
-    sheet = create_or_clear_sheet(spreadsheet, "assignments", headers)
+    sheet = create_or_clear_sheet(spreadsheet, "assignments", ASSIGNMENT_HEADERS)
 
-    rows = []
-    for annotator_id, assignments in assignments_dict.items():
-        for assignment in assignments:
-            row = [
-                annotator_id,
-                assignment['passage_id'],
-                assignment.get('set', 'core')
-            ]
-            rows.append(row)
+    rows = assignment_rows(assignments_dict)
 
     batch_size = 500
     total = len(rows)
@@ -135,7 +147,293 @@ def setup_assignments_sheet(spreadsheet, assignments_dict):
     print(f"   Added {len(rows)} total assignments")
 
 
+# incremental: only append assignment rows for passages nobody has yet, rest of the sheet untouched
+def append_new_assignments(spreadsheet, passages, capacity):
+    print("\nAppending new assignments only...")
+    sheet = spreadsheet.worksheet("assignments")
+    existing = {}
+    for record in sheet.get_all_records():
+        existing.setdefault(str(record["annotator_id"]), []).append({
+            "passage_id": str(record["passage_id"]),
+            "set": record.get("set", "core"),
+        })
+
+    new = prod_config.generate_incremental_assignments(
+        list(passages), existing, ["primary_rafuh"], capacity=capacity, passages_meta=passages_meta(passages)
+    )
+    rows = assignment_rows(new)
+    if rows:
+        sheet.append_rows(rows)
+    print(f"   Appended {len(rows)} new assignments")
+
+
+# indexed passages.jsonl when convert_passages wrote one, else passages.json
+def passages_source():
+    data_dir = Path(__file__).parent / "data"
+    indexed_file = data_dir / "passages.jsonl"
+    return indexed_file if is_current(indexed_file) else data_dir / "passages.json"
+
+
+# {id: passage}, lazily decoded when it comes from the indexed file
+def load_passages_file():
+    source = passages_source()
+    print(f"\nLoading passages from data/{source.name}...")
+    if source.suffix == ".jsonl":
+        return IndexedPassages(source)
+    with open(source, 'r', encoding='utf-8') as f:
+        return {p['id']: p for p in json.load(f)}
+
+
+# SYNC MODE ===========================
+# diff local passages/annotators/assignments against what the sheets already hold and only write rows
+# that changed or are missing, as ranged batch_update calls instead of clear + 500 row appends
+# nothing is deleted unless --prune is given, assignment rows from the sampler (iaa) and bonus requests
+# only exist in the sheet
+# --prune deletes sheet only rows the local data owns: passages that arent local anymore (unless an iaa /
+# bonus row still points at them) and core assignments of the annotators prod_config assigns. needed
+# after re-ranking or dedup, otherwise the old core rows stay assigned next to the new ones
+# an interrupted run just diffs again, rows written before the failure now match and are skipped
+# the checkpoint remembers which sheets finished for which local data so those arent even re-read
+
+SYNC_CHECKPOINT = Path(__file__).parent / "data" / ".sheets_sync_checkpoint.json"
+SYNC_BATCH_ROWS = 1000  # rows per batch_update request
+
+
+def _cell(value):
+    # compare values the way sheets hands them back unformatted, numbers come back as int/float
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _digest(path=None, rows=None):
+    # fingerprint of the local data behind one sheet, file bytes for passages, row values otherwise
+    h = hashlib.sha1()
+    if path is not None:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    else:
+        h.update(json.dumps(rows, ensure_ascii=False, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_checkpoint(spreadsheet_id):
+    try:
+        with open(SYNC_CHECKPOINT, 'r', encoding='utf-8') as f:
+            return json.load(f).get(spreadsheet_id, {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoint(spreadsheet_id, done):
+    try:
+        with open(SYNC_CHECKPOINT, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        data = {}
+    data[spreadsheet_id] = done
+    tmp = SYNC_CHECKPOINT.with_suffix(".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, SYNC_CHECKPOINT)
+
+
+def _blocks(updates):
+    # [(row_number, values)] sorted by row -> [(first_row, [values, ...])] of contiguous rows
+    blocks = []
+    for row_num, values in updates:
+        if blocks and blocks[-1][0] + len(blocks[-1][1]) == row_num:
+            blocks[-1][1].append(values)
+        else:
+            blocks.append((row_num, [values]))
+    return blocks
+
+
+def write_rows(sheet, updates, batch_rows=SYNC_BATCH_ROWS):
+    # one batch_update per batch_rows rows, contiguous rows share one range
+    updates = sorted(updates, key=lambda u: u[0])
+    for i in range(0, len(updates), batch_rows):
+        chunk = updates[i:i + batch_rows]
+        data = [
+            {"range": f"A{first}:{rowcol_to_a1(first + len(values) - 1, len(values[0]))}", "values": values}
+            for first, values in _blocks(chunk)
+        ]
+        sheet.batch_update(data, value_input_option="RAW")
+        print(f"    Wrote {min(i + batch_rows, len(updates))}/{len(updates)} rows")
+
+
+def delete_rows(spreadsheet, sheet, row_nums, batch_rows=SYNC_BATCH_ROWS):
+    # deletes the given row numbers, bottom up so the row numbers still to go dont shift
+    blocks = _blocks((r, None) for r in sorted(row_nums))
+    requests = [
+        {"deleteDimension": {"range": {
+            "sheetId": sheet.id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": first - 1 + len(block),
+        }}}
+        for first, block in reversed(blocks)
+    ]
+    for i in range(0, len(requests), batch_rows):
+        spreadsheet.batch_update({"requests": requests[i:i + batch_rows]})
+    print(f"    Deleted {len(row_nums)} rows")
+
+
+def sync_sheet(spreadsheet, title, headers, key_cols, rows, batch_rows=SYNC_BATCH_ROWS, owned=None, prune=False):
+    # rows = iterable of local rows in header order, key_cols = column indexes identifying a row
+    # owned(values) -> is this sheet only row one the local data is responsible for, those get deleted
+    # with prune (otherwise just counted), every other sheet only row is always kept
+    # returns counts or None if the sheet has unexpected headers (left untouched)
+    try:
+        sheet = spreadsheet.worksheet(title)
+    except gspread.exceptions.WorksheetNotFound:
+        print(f"  Creating sheet '{title}'...")
+        sheet = spreadsheet.add_worksheet(title=title, rows=1000, cols=len(headers))
+
+    existing = sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    updates = []
+    if not existing or not any(existing[0]):
+        updates.append((1, list(headers)))
+        existing = existing or [[]]
+    elif [_cell(v) for v in existing[0][:len(headers)]] != headers:
+        print(f"  ERROR: '{title}' headers are {existing[0]}, expected {headers}, not touching it")
+        return None
+
+    width = len(headers)
+    on_sheet = {}  #key -> (row number, values)
+    repeats = {}   #key -> later row numbers with the same key, pruned along with the first
+    for row_num, values in enumerate(existing[1:], start=2):
+        values = [_cell(v) for v in values[:width]]
+        values += [''] * (width - len(values))
+        key = tuple(values[c] for c in key_cols)
+        if not any(key):
+            continue
+        if key in on_sheet:
+            repeats.setdefault(key, []).append(row_num)
+        else:
+            on_sheet[key] = (row_num, values)
+
+    counts = {"unchanged": 0, "updated": 0, "added": 0, "sheet_only": 0, "stale": 0, "pruned": 0}
+    next_row = len(existing) + 1
+    seen = set()
+    for row in rows:
+        values = [_cell(v) for v in row]
+        key = tuple(values[c] for c in key_cols)
+        if key in seen:
+            continue
+        seen.add(key)
+        current = on_sheet.get(key)
+        if current is None:
+            updates.append((next_row, row))
+            next_row += 1
+            counts["added"] += 1
+        elif current[1] != values:
+            updates.append((current[0], row))
+            counts["updated"] += 1
+        else:
+            counts["unchanged"] += 1
+    sheet_only = [key for key in on_sheet if key not in seen]
+    stale = [key for key in sheet_only if owned is not None and owned(on_sheet[key][1])]
+    counts["sheet_only"] = len(sheet_only) - len(stale)
+    counts["stale"] = len(stale)
+    stale = [r for key in stale for r in [on_sheet[key][0]] + repeats.get(key, [])]
+
+    if next_row - 1 > sheet.row_count:
+        sheet.add_rows(next_row - 1 - sheet.row_count)
+    if updates:
+        write_rows(sheet, updates, batch_rows)
+    if prune and stale:
+        # after the writes, appended rows sit below every existing row so deleting doesnt touch them
+        delete_rows(spreadsheet, sheet, stale, batch_rows)
+        counts["pruned"], counts["stale"] = counts["stale"], 0
+    print(f"  {title}: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged, {counts['pruned']} pruned, {counts['sheet_only']} only in sheet (kept)")
+    if counts["stale"]:
+        print(f"  WARNING: {counts['stale']} '{title}' rows are no longer in the local data but still in the sheet,"
+              f" re-run with --sync --prune to delete them")
+    return counts
+
+
+def kept_passage_ids(spreadsheet, owned_assignment):
+    # passages assignment rows still point at once the owned ones are pruned (iaa, bonus, ...)
+    try:
+        sheet = spreadsheet.worksheet("assignments")
+    except gspread.exceptions.WorksheetNotFound:
+        return set()
+    referenced = set()
+    for values in sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")[1:]:
+        values = [_cell(v) for v in values[:len(ASSIGNMENT_HEADERS)]]
+        values += [''] * (len(ASSIGNMENT_HEADERS) - len(values))
+        if not owned_assignment(values):
+            referenced.add(values[1])
+    return referenced
+
+
+def sync_all(spreadsheet, passages, annotators, assignments_dict, batch_rows=SYNC_BATCH_ROWS, prune=False):
+    done = load_checkpoint(spreadsheet.id)
+    annotator_data = annotator_rows(annotators)
+    assignment_data = assignment_rows(assignments_dict)
+
+    # the local config owns each (annotator, set) it generates rows for, eg primary_rafuh / core
+    owned_sets = {(aid, set_name) for aid, _, set_name in assignment_data
+                  if not set_name.startswith("iaa") and set_name != "bonus"}
+
+    def owned_assignment(values):
+        return (values[0], values[2]) in owned_sets
+
+    # only --prune judges passage rows (needs the whole assignments sheet), read the first time its needed
+    kept_passages = None
+
+    def owned_passage(values):
+        nonlocal kept_passages
+        if kept_passages is None:
+            kept_passages = kept_passage_ids(spreadsheet, owned_assignment) | {r[1] for r in assignment_data}
+        return values[0] not in kept_passages
+
+    plan = [
+        ("passages", PASSAGE_HEADERS, [0], _digest(path=passages_source()),
+         lambda: (passage_row(p) for p in passages.values()), owned_passage if prune else None),
+        ("annotators", ANNOTATOR_HEADERS, [1], _digest(rows=annotator_data), lambda: annotator_data, None),
+        ("assignments", ASSIGNMENT_HEADERS, [0, 1], _digest(rows=assignment_data), lambda: assignment_data,
+         owned_assignment),
+    ]
+    ok = True
+    for title, headers, key_cols, digest, rows, owned in plan:
+        print(f"\nSyncing '{title}'...")
+        # a plain sync can leave stale rows behind, so only a pruned sync lets --prune skip the sheet
+        pruned = digest + "+prune"
+        if done.get(title) == pruned or (not prune and done.get(title) == digest):
+            print(f"  unchanged since last sync, skipped")
+            continue
+        counts = sync_sheet(spreadsheet, title, headers, key_cols, rows(), batch_rows, owned, prune)
+        if counts is None:
+            ok = False
+            continue
+        # without an owned check the sheet only rows werent judged, so it doesnt count as pruned
+        clean = not counts["stale"] and (owned is not None or not counts["sheet_only"])
+        done[title] = pruned if prune or clean else digest
+        save_checkpoint(spreadsheet.id, done)
+    return ok
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Populate Google Sheets for the annotation tool")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only append assignments for passages not yet assigned, no sheets are cleared")
+    parser.add_argument("--capacity", type=int, default=2000,
+                        help="max assignments for the primary annotator in --incremental mode")
+    parser.add_argument("--sync", action="store_true",
+                        help="only write rows that differ from the sheets, resumable, deletes nothing unless "
+                             "--prune is given")
+    parser.add_argument("--batch-rows", type=int, default=SYNC_BATCH_ROWS,
+                        help="rows per batch_update request in --sync mode")
+    parser.add_argument("--force", action="store_true",
+                        help="in --sync mode ignore the checkpoint and diff every sheet")
+    parser.add_argument("--prune", action="store_true",
+                        help="in --sync mode also delete core assignments / passages no longer in the local "
+                             "data (iaa and bonus rows are kept), run it after re-ranking or dedup")
+    args = parser.parse_args()
+
     print("=" * 100)
     print("Google Sheets Setup for Annotation Tool")
     secrets = load_secrets()
@@ -152,22 +450,41 @@ def main():
         sys.exit(1)
 
     #load passages
-    print("\nLoading passages from data/passages.json...")
-    passages_file = Path(__file__).parent / "data" / "passages.json"
-    with open(passages_file, 'r', encoding='utf-8') as f:
-        passages = json.load(f)
+    passages = load_passages_file()
     print(f"   loaded {len(passages)} passages")
 
     # load annotators from config
     annotators = prod_config.PRODUCTION_ANNOTATORS
     print(f"   loaded {len(annotators)} annotators from config")
 
-    #generate assignments
-    passage_ids = [p['id'] for p in passages]
-    assignments_dict = prod_config.get_production_assignments(passage_ids)
+    if args.incremental:
+        try:
+            append_new_assignments(spreadsheet, passages, args.capacity)
+        except Exception as e:
+            print(f"\n ERROR during incremental update: {e}")
+            sys.exit(1)
+        return
+
+    #generate assignments, highest priority/score first
+    assignments_dict = prod_config.get_production_assignments(list(passages), passages_meta(passages))
     total_assignments = sum(len(v) for v in assignments_dict.values())
     print(f"   Generated {total_assignments} assignments")
 
+    if args.sync:
+        if args.force:
+            save_checkpoint(spreadsheet.id, {})
+        try:
+            ok = sync_all(spreadsheet, passages, annotators, assignments_dict, args.batch_rows, args.prune)
+        except Exception as e:
+            print(f"\n ERROR during sync: {e}")
+            print("  re-run the same command (--sync, plus --prune if given) to pick up where it stopped")
+            sys.exit(1)
+        if not ok:
+            sys.exit(1)
+        print(f"\nAll Good:")
+        print(f"  {spreadsheet.url}")
+        return
+
     # confirm before proceeding
     print("\n" + "=" * 50)
     print("good to populate sheet with:")